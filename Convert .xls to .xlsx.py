@@ -1,15 +1,47 @@
+import os
+import json
+import time
+import hashlib
+import xlrd
+import xlsxwriter
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Define source and target directories
-source_dir = Path(r'')
-target_dir = Path(r'')
+# Hashes of converted sources, kept in the target directory
+MANIFEST_NAME = '.convert_manifest.json'
 
-# Ensure the target directory exists
-target_dir.mkdir(parents=True, exist_ok=True)
 
-# Iterate over all .xls files in the source directory
-for file_path in source_dir.glob('*.xls'):
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def target_path(file_path, target_dir):
+    # Define the new file path with .xlsx extension
+    return target_dir / file_path.name.replace('.xls', '.xlsx')
+
+
+def write_target(new_file_path, write):
+    """
+    Call write(path) on a temporary file next to the target and move it into place only when it succeeds,
+    so a failed conversion never leaves a partial target that is_current would take as done.
+    """
+    temp_path = new_file_path.with_name(new_file_path.stem + '.tmp.xlsx')
+    try:
+        write(temp_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    os.replace(temp_path, new_file_path)
+    return new_file_path
+
+
+def read_merged(file_path):
     # Read all sheets from the Excel file
     sheets_dict = pd.read_excel(file_path, sheet_name=None)
 
@@ -24,12 +56,274 @@ for file_path in source_dir.glob('*.xls'):
         dfs.append(df)
 
     # Concatenate all DataFrames into a single DataFrame
-    merged_df = pd.concat(dfs, ignore_index=True)
+    return pd.concat(dfs, ignore_index=True)
 
-    # Define the new file path with .xlsx extension
-    new_file_path = target_dir / file_path.name.replace('.xls', '.xlsx')
+
+def write_streaming(columns, rows, new_file_path):
+    """
+    Write rows one by one with xlsxwriter in constant_memory mode, so only the current row
+    is held by the writer. pandas writes column by column, which constant_memory does not allow.
+    """
+    workbook = xlsxwriter.Workbook(str(new_file_path), {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    worksheet = workbook.add_worksheet('Sheet1')
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+
+    try:
+        worksheet.write_row(0, 0, [str(column) for column in columns], header_format)
+        for row_number, row in enumerate(rows, start=1):
+            worksheet.write_row(row_number, 0, row)
+    finally:
+        workbook.close()
+
+
+def row_cells(types, values, datemode):
+    """Convert one xlrd row to values for xlsxwriter: dates to datetime, error cells to blanks."""
+    cells = []
+    for cell_type, value in zip(types, values):
+        if cell_type == xlrd.XL_CELL_DATE:
+            value = xlrd.xldate_as_datetime(value, datemode)
+        elif cell_type == xlrd.XL_CELL_BOOLEAN:
+            value = bool(value)
+        elif cell_type == xlrd.XL_CELL_ERROR:
+            value = None
+        cells.append(value)
+    return cells
+
+
+def sheet_header(sheet, datemode):
+    """
+    Column names of a legacy sheet the way pandas makes them from its first row: dates as text,
+    whole numbers as int, blanks as 'Unnamed: n', and repeated names numbered 'name.1', 'name.2'.
+    """
+    names = []
+    seen = {}
+    for index, value in enumerate(row_cells(sheet.row_types(0), sheet.row_values(0), datemode)):
+        if isinstance(value, datetime):
+            value = str(value)
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif value in ('', None):
+            value = f'Unnamed: {index}'
+        if value in seen:
+            seen[value] += 1
+            value = f'{value}.{seen[value]}'
+        else:
+            seen[value] = 0
+        names.append(value)
+    return names
+
+
+def read_merged_rows(file_path):
+    """
+    The rows of read_merged without building DataFrames: first the merged header, then the rows of
+    every sheet placed under it by column name, as pd.concat does, with empty cells as None.
+
+    Only one legacy sheet is loaded at a time, so memory does not grow with the workbook. The headers
+    are collected in a first pass over the sheets because the merged header must be written first.
+    """
+    book = xlrd.open_workbook(str(file_path), on_demand=True)
+    try:
+        headers = []
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            headers.append(sheet_header(sheet, book.datemode) if sheet.nrows else [])
+            book.unload_sheet(sheet_index)
+        columns = list(dict.fromkeys(name for header in headers for name in header))
+        positions = {name: position for position, name in enumerate(columns)}
+        yield columns
+
+        for sheet_index, header in enumerate(headers):
+            if not header:
+                continue
+            sheet = book.sheet_by_index(sheet_index)
+            # Skip the header and drop the first 3 rows
+            for source_row in range(4, sheet.nrows):
+                row = [None] * len(columns)
+                cells = row_cells(sheet.row_types(source_row), sheet.row_values(source_row), book.datemode)
+                for name, value in zip(header, cells):
+                    row[positions[name]] = None if value == '' else value
+                yield row
+            book.unload_sheet(sheet_index)
+    finally:
+        book.release_resources()
+
+
+def convert_file_direct(file_path, target_dir, merge=True):
+    """
+    Convert without pandas: read the legacy workbook one sheet at a time with xlrd and copy rows
+    straight into an xlsxwriter workbook in constant_memory mode.
+
+    As in read_merged, the first row of each sheet is its header and the 3 rows after it are dropped.
+    With merge=True all sheets go one after another into a single sheet, with columns matched by header
+    name as pd.concat does (see read_merged_rows). With merge=False every sheet is copied to its own sheet.
+    """
+    new_file_path = target_path(file_path, target_dir)
+    if merge:
+        return write_target(new_file_path, lambda path: write_streaming_file(file_path, path))
+    return write_target(new_file_path, lambda path: copy_sheets(file_path, path))
+
+
+def write_streaming_file(file_path, new_file_path):
+    """Merge the sheets of the legacy workbook into new_file_path row by row (read_merged_rows, write_streaming)."""
+    merged_rows = read_merged_rows(file_path)
+    try:
+        write_streaming(next(merged_rows), merged_rows, new_file_path)
+    finally:
+        merged_rows.close()
+
+
+def copy_sheets(file_path, new_file_path):
+    """Copy every sheet of the legacy workbook to a sheet of its own, dropping the 3 rows after each header."""
+    book = xlrd.open_workbook(str(file_path), on_demand=True)
+    workbook = xlsxwriter.Workbook(str(new_file_path), {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+
+    try:
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            worksheet = workbook.add_worksheet(sheet.name)
+            if sheet.nrows:
+                header = row_cells(sheet.row_types(0), sheet.row_values(0), book.datemode)
+                # Dates in the header are written as text, the way pandas turns them into column names
+                header = [str(value) if isinstance(value, datetime) else value for value in header]
+                worksheet.write_row(0, 0, header, header_format)
+
+            # Skip the header and drop the first 3 rows
+            for row_number, source_row in enumerate(range(4, sheet.nrows), start=1):
+                worksheet.write_row(row_number, 0, row_cells(sheet.row_types(source_row),
+                                                             sheet.row_values(source_row), book.datemode))
+
+            # Only one legacy sheet is held in memory at a time
+            book.unload_sheet(sheet_index)
+    finally:
+        workbook.close()
+        book.release_resources()
+
+
+def check_options(streaming, engine, merge):
+    """Reject option combinations that convert_file cannot honour instead of silently ignoring one."""
+    if engine not in ('pandas', 'direct'):
+        raise ValueError(f"engine must be 'pandas' or 'direct', not {engine!r}")
+    if engine == 'direct' and streaming:
+        raise ValueError("engine='direct' always writes row by row, streaming applies to engine='pandas' only")
+    if engine == 'pandas' and not merge:
+        raise ValueError("engine='pandas' always merges the sheets, use engine='direct' for merge=False")
+
+
+def convert_file(file_path, target_dir, streaming=False, engine='pandas', merge=True):
+    """
+    Merge the sheets of a legacy workbook into one .xlsx sheet. With streaming=True the rows are read
+    one sheet at a time with xlrd and written row by row instead of going through a DataFrame.
+    engine='direct' copies rows without pandas and can also keep the sheets apart (merge=False).
+    """
+    check_options(streaming, engine, merge)
+    if engine == 'direct':
+        return convert_file_direct(file_path, target_dir, merge)
+
+    new_file_path = target_path(file_path, target_dir)
+    if streaming:
+        return write_target(new_file_path, lambda path: write_streaming_file(file_path, path))
 
     # Save the merged DataFrame to a new Excel file
-    merged_df.to_excel(new_file_path, index=False)
+    merged_df = read_merged(file_path)
+    return write_target(new_file_path, lambda path: merged_df.to_excel(path, index=False))
+
+
+def is_current(file_path, target_dir, manifest):
+    """
+    A target is current if it is newer than its source, or if the source was only touched:
+    its content hash is the one recorded when the target was written.
+    """
+    new_file_path = target_path(file_path, target_dir)
+    if not new_file_path.exists():
+        return False
+    if new_file_path.stat().st_mtime >= file_path.stat().st_mtime:
+        return True
+    return manifest.get(file_path.name) == file_hash(file_path)
+
+
+def convert_directory(source_dir, target_dir, workers=None, streaming=False, force=False, engine='pandas',
+                      merge=True):
+    """
+    Convert every .xls file in source_dir into target_dir with a pool of worker processes
+    (workers=1 converts in this process). Targets that are already current are skipped unless force=True.
+    engine='direct' copies rows without pandas (see convert_file_direct); streaming and merge are passed
+    to convert_file.
+    """
+    check_options(streaming, engine, merge)
+    source_dir = Path(source_dir)
+    target_dir = Path(target_dir)
+
+    # Ensure the target directory exists
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = target_dir / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+
+    pending = [file_path for file_path in sorted(source_dir.glob('*.xls'))
+               if force or not is_current(file_path, target_dir, manifest)]
+    print(f"Converting {len(pending)} file(s), skipping current ones")
+
+    def record(file_path, result):
+        # The same handling in this process and in the pool: a failed file is reported and the others go on
+        try:
+            print(f"Converted: {result()}")
+        except Exception as e:
+            print(f"Error converting file {file_path}: {e}")
+            return
+        manifest[file_path.name] = file_hash(file_path)
+
+    try:
+        if workers == 1:
+            for file_path in pending:
+                record(file_path, lambda: convert_file(file_path, target_dir, streaming, engine, merge))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(convert_file, file_path, target_dir, streaming, engine, merge): file_path
+                           for file_path in pending}
+                for future in as_completed(futures):
+                    record(futures[future], future.result)
+    finally:
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+
+
+def benchmark_convert(file_path, target_dir, repeat=3):
+    """Time the pandas conversion (plain and streaming write) against the direct row copy on one file."""
+    file_path = Path(file_path)
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    timings = {}
+    for name, convert in (('pandas', lambda: convert_file(file_path, target_dir)),
+                          ('pandas streaming', lambda: convert_file(file_path, target_dir, streaming=True)),
+                          ('direct', lambda: convert_file_direct(file_path, target_dir))):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            convert()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f"{name}: {best:.3f} s")
+    print(f"Direct copy speedup over pandas: {timings['pandas'] / timings['direct']:.1f}x")
+    return timings
+
+
+if __name__ == "__main__":
+    # Define source and target directories
+    source_dir = Path(r'')
+    target_dir = Path(r'')
+
+    # Convert all .xls files on every core, writing row by row to keep memory bounded
+    convert_directory(source_dir, target_dir, workers=os.cpu_count(), streaming=True)
+
+    # Plain format conversion can skip pandas altogether:
+    # convert_directory(source_dir, target_dir, workers=os.cpu_count(), engine='direct')
+    # benchmark_convert(source_dir / 'file.xls', target_dir)
 
-print("Processing complete.")
\ No newline at end of file
+    print("Processing complete.")
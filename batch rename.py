@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import fnmatch
+import argparse
+from datetime import datetime
+
+# Name of a file while it waits for its final name when renames form a cycle (a -> b, b -> a)
+TEMP_NAME = '.rename_tmp_{index}_{name}'
+# Journals are never renamed, so a journal left in the directory can still undo its run
+JOURNAL_PATTERN = 'rename_journal_*.jsonl'
+
+
+def strip_prefix(prefix):
+    """Rule of "rename prefix.py": remove prefix from the start of the name."""
+    def rule(name):
+        return name[len(prefix):] if name.startswith(prefix) else None
+    return rule
+
+
+def split_separator(separator='_', extension='.svg'):
+    """Rule of "rename separator.py": keep the part after the first separator (of files with the extension)."""
+    def rule(name):
+        if extension and not name.endswith(extension):
+            return None
+        parts = name.split(separator, 1)
+        return parts[1] if len(parts) == 2 else None
+    return rule
+
+
+def regex_rule(pattern, replacement, count=0):
+    """Replace matches of pattern in the name, as re.sub does."""
+    pattern = re.compile(pattern)
+
+    def rule(name):
+        new_name = pattern.sub(replacement, name, count=count)
+        return new_name if new_name != name else None
+    return rule
+
+
+def apply_rules(name, rules):
+    """Run the rules one after another; each sees the name left by the previous one. None if nothing changed."""
+    new_name = name
+    for rule in rules:
+        changed = rule(new_name)
+        if changed is not None:
+            new_name = changed
+    return new_name if new_name != name else None
+
+
+def scan(directory, recursive=False):
+    """
+    {directory: ([file names], [other entry names])} of the directory (and its subdirectories with
+    recursive=True), read with one os.scandir call per directory and no stat call per file.
+    """
+    listing = {}
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        files = []
+        others = []
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    files.append(entry.name)
+                else:
+                    others.append(entry.name)
+                    if recursive and entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+        listing[current] = (files, others)
+    return listing
+
+
+def plan_renames(directory, rules, recursive=False):
+    """
+    Work out every rename before touching anything.
+    Returns (moves, conflicts): moves is a list of (directory, old name, new name) that can be done safely,
+    conflicts a list of (directory, old name, new name, reason) that will be skipped.
+
+    A new name may be the old name of another file that is renamed too (chains like a -> b -> c and
+    cycles like a -> b -> a); execute_plan orders those. Names are compared with os.path.normcase,
+    so on Windows 'A.svg' and 'a.svg' collide. Journals of earlier runs keep their names.
+    """
+    moves = []
+    conflicts = []
+    for current, (files, others) in scan(directory, recursive).items():
+        renames = {}
+        for name in files:
+            if fnmatch.fnmatch(name, JOURNAL_PATTERN):
+                continue
+            new_name = apply_rules(name, rules)
+            if new_name is None:
+                continue
+            if not new_name or new_name in ('.', '..') or '/' in new_name or os.sep in new_name:
+                conflicts.append((current, name, new_name, "invalid new name"))
+                continue
+            renames[name] = new_name
+
+        # Names of files that stay and of directories are taken. A case-only rename keeps its own name free
+        taken = {os.path.normcase(name) for name in files if name not in renames}
+        taken.update(os.path.normcase(name) for name in others)
+        targets = {}
+        for name, new_name in renames.items():
+            targets.setdefault(os.path.normcase(new_name), []).append(name)
+
+        for key, sources in targets.items():
+            if len(sources) > 1:
+                conflicts.extend((current, name, renames[name], f"{len(sources)} files get this name")
+                                 for name in sources)
+            elif key in taken:
+                conflicts.append((current, sources[0], renames[sources[0]], "a file with this name exists"))
+            else:
+                moves.append((current, sources[0], renames[sources[0]]))
+
+    return drop_blocked(moves, conflicts), conflicts
+
+
+def drop_blocked(moves, conflicts):
+    """
+    A skipped rename keeps its file under the old name, which blocks any move onto that name.
+    Repeat until no more moves are blocked; each move is dropped at most once, so this stays O(n).
+    """
+    by_target = {(current, os.path.normcase(new_name)): (current, name, new_name)
+                 for current, name, new_name in moves}
+    dropped = set()
+    blocked = [(current, name) for current, name, _, _ in conflicts]
+    while blocked:
+        current, name = blocked.pop()
+        move = by_target.get((current, os.path.normcase(name)))
+        if move is None or move in dropped:
+            continue
+        dropped.add(move)
+        conflicts.append(move + ("its new name stays taken by a skipped file",))
+        blocked.append((move[0], move[1]))
+    return [move for move in moves if move not in dropped]
+
+
+def order_moves(moves):
+    """
+    Order the moves so every file is renamed only after the file holding its new name has moved away.
+    Chains are done from their end; in a cycle one file is first moved to a temporary name,
+    one that no file in the directory has and no move uses.
+    Returns the list of (directory, old name, new name) renames to perform, in O(n).
+    """
+    source_of = {(current, os.path.normcase(name)): (current, name, new_name) for current, name, new_name in moves}
+    targets = {(current, os.path.normcase(new_name)) for current, _, new_name in moves}
+    ordered = []
+    done = set()
+
+    def next_move(move):
+        return source_of.get((move[0], os.path.normcase(move[2])))
+
+    # Chains start at a file whose name nobody takes; the last move of a chain goes to a free name
+    for key, move in source_of.items():
+        if key in targets:
+            continue
+        chain = []
+        while move is not None and move not in done:
+            chain.append(move)
+            done.add(move)
+            move = next_move(move)
+        ordered.extend(reversed(chain))
+
+    # What is left are cycles
+    for index, move in enumerate(source_of.values()):
+        if move in done:
+            continue
+        current, name, new_name = move
+        # Other cycles use other indices modulo len(moves), so their temporary names never meet
+        temp_index = index
+        temp_name = TEMP_NAME.format(index=temp_index, name=name)
+        while (current, os.path.normcase(temp_name)) in source_of or \
+                (current, os.path.normcase(temp_name)) in targets or os.path.lexists(os.path.join(current, temp_name)):
+            temp_index += len(source_of)
+            temp_name = TEMP_NAME.format(index=temp_index, name=name)
+        ordered.append((current, name, temp_name))
+        done.add(move)
+
+        cycle = []
+        following = next_move(move)
+        while following is not None and following not in done:
+            cycle.append(following)
+            done.add(following)
+            following = next_move(following)
+        ordered.extend(reversed(cycle))
+        ordered.append((current, temp_name, new_name))
+    return ordered
+
+
+def execute_plan(moves, journal_path=None):
+    """
+    Rename the files in a safe order, appending every rename to the journal as it is made,
+    so undo_journal can revert even an interrupted run. Returns the number of renames made.
+    """
+    renames = order_moves(moves)
+    journal = open(journal_path, 'a', encoding='utf-8', buffering=1) if journal_path else None
+    try:
+        for current, name, new_name in renames:
+            old_path = os.path.join(current, name)
+            new_path = os.path.join(current, new_name)
+            os.rename(old_path, new_path)
+            if journal:
+                journal.write(json.dumps([old_path, new_path], ensure_ascii=False) + "\n")
+    finally:
+        if journal:
+            journal.close()
+    return len(renames)
+
+
+def undo_journal(journal_path):
+    """
+    Revert the renames recorded in the journal, last first, and remove the journal.
+    The journal is cut after every revert, so if the undo stops halfway (a file was moved away or its
+    old name was taken since) the journal keeps only the renames still to revert and running the undo
+    again resumes there. Renames found already reverted are skipped, and no existing file is overwritten.
+    """
+    renames = []
+    with open(journal_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                renames.append((offset, json.loads(line)))
+            offset += len(line)
+
+    reverted = 0
+    with open(journal_path, 'r+b') as journal:
+        for offset, (old_path, new_path) in reversed(renames):
+            if os.path.lexists(new_path) or not os.path.lexists(old_path):
+                # A case-only rename has its old name taken by the file itself
+                if os.path.lexists(old_path) and not os.path.samefile(old_path, new_path):
+                    raise FileExistsError(f"Cannot revert '{new_path}': '{old_path}' exists")
+                os.rename(new_path, old_path)
+                reverted += 1
+            journal.truncate(offset)
+    os.remove(journal_path)
+    print(f"Reverted {reverted} renames")
+
+
+def default_journal_path(directory):
+    """rename_journal_<directory name>_<time>.jsonl next to the directory, outside the files being renamed."""
+    directory = os.path.abspath(directory)
+    return os.path.join(os.path.dirname(directory),
+                        f"rename_journal_{os.path.basename(directory)}_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+
+
+def rename_files(directory, rules, recursive=False, dry_run=False, journal_path=None, show=20):
+    """
+    Plan the renames of the files in directory, report skipped ones, and carry the rest out
+    (or only show them with dry_run=True). The first `show` renames are printed.
+    """
+    moves, conflicts = plan_renames(directory, rules, recursive)
+
+    for current, name, new_name, reason in conflicts:
+        print(f"Skipping '{os.path.join(current, name)}' -> '{new_name}': {reason}")
+    for current, name, new_name in moves[:show]:
+        print(f"{'Would rename' if dry_run else 'Renaming'} '{os.path.join(current, name)}' to '{new_name}'")
+    if len(moves) > show:
+        print(f"... and {len(moves) - show} more")
+
+    if dry_run:
+        print(f"Dry run: {len(moves)} files to rename, {len(conflicts)} skipped")
+        return moves, conflicts
+
+    count = execute_plan(moves, journal_path)
+    print(f"Renamed {len(moves)} files ({count} renames), {len(conflicts)} skipped")
+    if journal_path:
+        print(f"Journal saved to {journal_path}, revert with --undo")
+    return moves, conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rename files in bulk: plan every rename first, "
+                                                 "skip collisions, and keep a journal for undo.")
+    parser.add_argument('directory', nargs='?', help="directory of the files to rename")
+    parser.add_argument('--prefix', help="remove this prefix from file names")
+    parser.add_argument('--separator', help="keep the part of the name after the first separator")
+    parser.add_argument('--extension', default='.svg',
+                        help="with --separator, only rename files with this extension (default: .svg, '' for all)")
+    parser.add_argument('--regex', nargs=2, metavar=('PATTERN', 'REPLACEMENT'), action='append', default=[],
+                        help="replace matches of PATTERN in file names")
+    parser.add_argument('-r', '--recursive', action='store_true', help="rename in subdirectories too")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="only show what would be renamed")
+    parser.add_argument('--journal', help="journal file to record the renames in "
+                                          "(default: rename_journal_<directory>_<time>.jsonl next to the directory)")
+    parser.add_argument('--undo', metavar='JOURNAL', help="revert the renames recorded in a journal")
+    args = parser.parse_args()
+
+    if args.undo:
+        undo_journal(args.undo)
+        return
+    if not args.directory:
+        parser.error("a directory is required")
+
+    rules = []
+    if args.prefix:
+        rules.append(strip_prefix(args.prefix))
+    if args.separator:
+        rules.append(split_separator(args.separator, args.extension))
+    rules.extend(regex_rule(pattern, replacement) for pattern, replacement in args.regex)
+    if not rules:
+        parser.error("give at least one of --prefix, --separator, --regex")
+
+    journal_path = args.journal or default_journal_path(args.directory)
+    rename_files(args.directory, rules, args.recursive, args.dry_run, journal_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,28 @@
 import os
+import importlib.util
 
-# Define the directory where the files are located
-directory = r''  # Replace with the actual path to your directory
+# The renaming is done by "batch rename.py": every rename is planned first, no file is overwritten,
+# and the journal next to the directory reverts the run with "batch rename.py --undo <journal>"
+spec = importlib.util.spec_from_file_location(
+    'batch_rename', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch rename.py'))
+batch_rename = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(batch_rename)
 
-# Define the prefix you want to remove from the file names
-prefix = "140621_"
 
-try:
-    # Iterate through all the files in the given directory
-    for filename in os.listdir(directory):
-        if filename.startswith(prefix):
-            # Construct the new file name by removing the prefix from the original file name
-            new_filename = filename[len(prefix):]
+def rename_files(directory, prefix):
+    """Remove prefix from the start of the file names."""
+    return batch_rename.rename_files(directory, [batch_rename.strip_prefix(prefix)],
+                                     journal_path=batch_rename.default_journal_path(directory))
 
-            # Construct the full original file path and the new file path
-            original_file_path = os.path.join(directory, filename)
-            new_file_path = os.path.join(directory, new_filename)
 
-            if os.path.exists(new_file_path):
-                # If a file already exists with the new name, handle that case specifically
-                print(f"File '{new_filename}' already exists. Skipping renaming for '{filename}'.")
-            else:
-                # Rename the file from the original path to the new path
-                os.rename(original_file_path, new_file_path)
-                print(f"Renamed '{filename}' to '{new_filename}'")
-except FileNotFoundError:
-    print(f"The directory '{directory}' does not exist.")
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    # Define the directory where the files are located
+    directory = r''  # Replace with the actual path to your directory
+
+    # Define the prefix you want to remove from the file names
+    prefix = "140621_"
+
+    try:
+        rename_files(directory, prefix)
+    except FileNotFoundError:
+        print(f"The directory '{directory}' does not exist.")
@@ -1,27 +1,18 @@
 import os
+import importlib.util
 
+# The renaming is done by "batch rename.py": every rename is planned first, no file is overwritten,
+# and the journal next to the directory reverts the run with "batch rename.py --undo <journal>"
+spec = importlib.util.spec_from_file_location(
+    'batch_rename', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch rename.py'))
+batch_rename = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(batch_rename)
 
-def rename_files(directory):
-    # Iterate over all files in the given directory
-    for filename in os.listdir(directory):
-        # Check if the file is an SVG file
-        if filename.endswith(".svg"):
-            # Split the filename by the first underscore character
-            parts = filename.split('_', 1)  # Split only once
-
-            if len(parts) == 2:
-                new_filename = parts[
-                    1]  # The part after the first underscore should be kept (including any underscores after the first one)
-                old_file_path = os.path.join(directory, filename)
-                new_file_path = os.path.join(directory, new_filename)
 
-                # Make sure not to overwrite any existing files unless it's the same file
-                if old_file_path != new_file_path:
-                    os.rename(old_file_path, new_file_path)
-                    print(f"Renamed file '{filename}' to '{new_filename}'")
-
-            else:
-                print(f"Filename '{filename}' does not contain an underscore or does not split correctly.")
+def rename_files(directory):
+    """Keep the part of every .svg file name after the first underscore."""
+    return batch_rename.rename_files(directory, [batch_rename.split_separator('_', '.svg')],
+                                     journal_path=batch_rename.default_journal_path(directory))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+import os
+import argparse
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.worksheet.cell_range import MultiCellRange
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MERGE_CELL_TAG = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}mergeCell'
+SHEET_TAG = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet'
+RELATIONSHIP_TAG = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+# Values are written as read: dates keep a date format, and text starting with '=' or 'http' stays text
+STREAMING_OPTIONS = {
+    'constant_memory': True,
+    'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    'strings_to_formulas': False,
+    'strings_to_urls': False,
+}
+
+
+def merged_ranges(sheet):
+    """Bounds (min_col, min_row, max_col, max_row) and top-left value of every merged range of the sheet."""
+    return [(merged_range.bounds, sheet.cell(row=merged_range.min_row, column=merged_range.min_col).value)
+            for merged_range in sheet.merged_cells.ranges]
+
+
+def split_merged_cells(sheet):
+    """Unmerge every merged range of the sheet and fill all of its cells with the top-left value."""
+    for merged_range in list(sheet.merged_cells.ranges):
+        value = sheet.cell(row=merged_range.min_row, column=merged_range.min_col).value
+
+        # unmerge_cells looks the range up in the list of merges, which is quadratic on sheets with
+        # tens of thousands of them; with only this range left in the list each lookup is constant
+        sheet.merged_cells = MultiCellRange([merged_range])
+        sheet.unmerge_cells(merged_range.coord)
+
+        # Unmerging removed the placeholder cells, so the range takes plain cells holding its value
+        for row in range(merged_range.min_row, merged_range.max_row + 1):
+            for column in range(merged_range.min_col, merged_range.max_col + 1):
+                sheet.cell(row=row, column=column, value=value)
+
+
+def sheet_to_dataframe(sheet):
+    """
+    DataFrame of the sheet with merged ranges filled, without changing the workbook.
+    The first row gives the column names, as in the notebook.
+    """
+    values = np.array(list(sheet.iter_rows(values_only=True)), dtype=object)
+    if values.size == 0:
+        return pd.DataFrame()
+
+    # One slice assignment per merged range
+    for (min_col, min_row, max_col, max_row), value in merged_ranges(sheet):
+        values[min_row - 1:max_row, min_col - 1:max_col] = value
+
+    # From row lists, so column types are inferred as for sheet.values
+    return pd.DataFrame(values[1:].tolist(), columns=values[0].tolist())
+
+
+def read_unmerged(file_path, sheet_names=None):
+    """Every sheet (or only sheet_names) of the workbook as a DataFrame with merged ranges filled."""
+    wb = load_workbook(file_path)
+    return {sheet.title: sheet_to_dataframe(sheet) for sheet in wb.worksheets
+            if sheet_names is None or sheet.title in sheet_names}
+
+
+def relationships(archive, part):
+    """Type and path inside the archive of every relationship of a package part ('' for the package), by id."""
+    directory, name = posixpath.split(part)
+    with archive.open(posixpath.join(directory, '_rels', f'{name}.rels')) as source:
+        root = ET.parse(source).getroot()
+    targets = {}
+    for relationship in root.iter(RELATIONSHIP_TAG):
+        target = relationship.get('Target')
+        # Targets are relative to the part's directory unless they start at the package root
+        target = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+        targets[relationship.get('Id')] = (relationship.get('Type'), target)
+    return targets
+
+
+def sheet_parts(archive):
+    """Path inside an .xlsx archive of the XML part of every worksheet, by sheet name."""
+    workbook_part = next(target for relationship_type, target in relationships(archive, '').values()
+                         if relationship_type.endswith('/officeDocument'))
+    targets = relationships(archive, workbook_part)
+    with archive.open(workbook_part) as source:
+        root = ET.parse(source).getroot()
+    return {sheet.get('name'): targets[sheet.get(RELATIONSHIP_ID)][1] for sheet in root.iter(SHEET_TAG)}
+
+
+def read_merge_index(archive, part):
+    """
+    Bounds of the merged ranges of a sheet, taken from the <mergeCells> element of its XML part,
+    which read-only openpyxl does not expose. The XML is parsed incrementally and every finished
+    element is detached from its parent, so the tree never holds more than the current row.
+    """
+    ranges = []
+    parents = []
+    with archive.open(part) as source:
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            if element.tag == MERGE_CELL_TAG:
+                ranges.append(range_boundaries(element.get('ref')))
+            if parents:
+                parents[-1].remove(element)
+    return ranges
+
+
+def iter_unmerged_rows(sheet, merge_index):
+    """
+    Rows of a read-only sheet as lists, with the merged ranges of merge_index filled on the fly.
+    Holds only the merge index, the values of the ranges covering the current row, and that row.
+    """
+    # Ranges by the row they start on; the top-left value is picked up when that row is read
+    starting = {}
+    width = 0
+    for bounds in merge_index:
+        starting.setdefault(bounds[1], []).append(bounds)
+        width = max(width, bounds[2])
+
+    active = []
+    for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+        row = list(row)
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+
+        for min_col, min_row, max_col, max_row in starting.pop(row_number, ()):
+            active.append((min_col, max_col, max_row, row[min_col - 1]))
+        if active:
+            active = [merged for merged in active if merged[2] >= row_number]
+            for min_col, max_col, _, value in active:
+                row[min_col - 1:max_col] = [value] * (max_col - min_col + 1)
+        yield row
+
+
+def read_unmerged_streaming(file_path, sheet_name=None):
+    """
+    DataFrame of one sheet (the first by default) with merged ranges filled, the same as
+    read_unmerged gives, but read in read-only mode for workbooks too large to load fully.
+    """
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        sheet = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        with zipfile.ZipFile(file_path) as archive:
+            merge_index = read_merge_index(archive, sheet_parts(archive)[sheet.title])
+        rows = iter_unmerged_rows(sheet, merge_index)
+        columns = next(rows, None)
+        if columns is None:
+            return pd.DataFrame()
+        return pd.DataFrame(list(rows), columns=columns)
+    finally:
+        wb.close()
+
+
+def write_unmerged_streaming(file_path, output_file_path):
+    """Copy every sheet with merged ranges filled, streaming from read-only openpyxl into xlsxwriter's
+    constant_memory mode, so neither side holds more than a row."""
+    wb = load_workbook(file_path, read_only=True)
+    archive = zipfile.ZipFile(file_path)
+    workbook = xlsxwriter.Workbook(output_file_path, STREAMING_OPTIONS)
+    try:
+        parts = sheet_parts(archive)
+        for sheet in wb.worksheets:
+            worksheet = workbook.add_worksheet(sheet.title)
+            rows = iter_unmerged_rows(sheet, read_merge_index(archive, parts[sheet.title]))
+            for row_number, row in enumerate(rows):
+                worksheet.write_row(row_number, 0, row)
+    finally:
+        workbook.close()
+        archive.close()
+        wb.close()
+
+
+def output_path(file_path, output_directory=None):
+    # "<name> mod.xlsx" next to the source, or in output_directory
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_directory or os.path.dirname(file_path), f"{base_name} mod.xlsx")
+
+
+def process_file(file_path, output_directory=None, mode='dataframe'):
+    """
+    Split merged cells on every sheet of one workbook and save it as "<name> mod.xlsx".
+    mode='dataframe' saves the filled values of each sheet (as the notebook did for one sheet);
+    mode='workbook' unmerges in place and saves the workbook with its formatting;
+    mode='stream' saves the filled values in read-only mode, for workbooks too large to load.
+    """
+    output_file_path = output_path(file_path, output_directory)
+    if mode == 'stream':
+        write_unmerged_streaming(file_path, output_file_path)
+    elif mode == 'workbook':
+        wb = load_workbook(file_path)
+        for sheet in wb.worksheets:
+            split_merged_cells(sheet)
+        wb.save(output_file_path)
+    else:
+        # Read before opening the writer, so a workbook that fails to load leaves no empty output behind
+        sheets = read_unmerged(file_path)
+        with pd.ExcelWriter(output_file_path) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return output_file_path
+
+
+def process_paths(paths, output_directory=None, mode='dataframe', workers=None):
+    """Process the given workbooks and every .xlsx file in the given directories with a pool of workers."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, file_name) for file_name in sorted(os.listdir(path))
+                         if file_name.endswith('.xlsx') and not file_name.endswith(' mod.xlsx'))
+        else:
+            files.append(path)
+
+    if output_directory:
+        os.makedirs(output_directory, exist_ok=True)
+
+    def report(file_path, result):
+        # The same handling in this process and in the pool: a failed file is reported and the others go on
+        try:
+            print(f"Saved: {result()}")
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+
+    if workers == 1:
+        for file_path in files:
+            report(file_path, lambda: process_file(file_path, output_directory, mode))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_file, file_path, output_directory, mode): file_path
+                   for file_path in files}
+        for future in as_completed(futures):
+            report(futures[future], future.result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split merged cells in Excel workbooks, filling every cell "
+                                                 "with the value of its merged range.")
+    parser.add_argument('paths', nargs='+', help=".xlsx files or directories of them")
+    parser.add_argument('-o', '--output-directory', help="where to save '<name> mod.xlsx' (default: next to the source)")
+    parser.add_argument('-m', '--mode', choices=['dataframe', 'workbook', 'stream'], default='dataframe',
+                        help="save filled values only, the unmerged workbook with formatting, "
+                             "or filled values streamed in read-only mode for very large workbooks")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    process_paths(args.paths, args.output_directory, args.mode, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,29 @@ import PyPDF2
 import re
 import tempfile
 import shutil
+import time
+import io
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject,
+                            IndirectObject, NameObject, NumberObject, StreamObject)
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # OSError: the cairo library itself is missing
+    cairosvg = None
+
+# SVG features cairosvg leaves out or draws differently from Inkscape (flowed text, HTML content,
+# most filter effects); files using them are converted with Inkscape
+CAIROSVG_UNSUPPORTED = re.compile(rb'<(?:svg:)?(?:flowRoot|foreignObject|feGaussianBlur|feTurbulence|'
+                                  rb'feColorMatrix|feComposite|feMorphology|feDisplacementMap|'
+                                  rb'feDiffuseLighting|feSpecularLighting|feConvolveMatrix|mesh|hatch)\b')
+
+# Cached pages beyond this total size, or not used for this long, are removed after a run
+CACHE_MAX_SIZE = 2 << 30
+CACHE_MAX_AGE_DAYS = 90
 
 
 def check_inkscape_path(inkscape_path):
@@ -18,39 +41,538 @@ def natural_sort_key(s):
     return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
 
 
-def main(svg_directory, output_pdf_filename, inkscape_path):
-    # Step 1: List all .svg files in the given directory
+def convert_spawn(jobs, inkscape_path):
+    """
+    Convert (svg_path, pdf_path) pairs with a separate Inkscape process per file.
+    Returns {svg_path: error message} for the files that failed.
+    """
+    errors = {}
+    for svg_path, pdf_path in jobs:
+        # Running Inkscape command to convert .svg files to .pdf
+        result = subprocess.run([inkscape_path, "--export-filename", pdf_path, svg_path],
+                                capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.exists(pdf_path):
+            errors[svg_path] = result.stderr.strip() or f"Inkscape exited with code {result.returncode}"
+    return errors
+
+
+def convert_shell(jobs, inkscape_path, timeout=None):
+    """
+    Convert (svg_path, pdf_path) pairs with one Inkscape process in shell mode, sending one line of
+    actions per file, so Inkscape starts once for the whole batch.
+    A file without a PDF afterwards (a bad file, or Inkscape stopping halfway) is retried on its own
+    with convert_spawn to get its error. Returns {svg_path: error message} for the files that failed.
+    """
+    if not jobs:
+        return {}
+
+    commands = "".join(f"file-open:{svg_path}; export-filename:{pdf_path}; export-do; file-close\n"
+                       for svg_path, pdf_path in jobs)
+    try:
+        subprocess.run([inkscape_path, "--shell"], input=commands + "quit\n",
+                       capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        pass
+
+    missing = [(svg_path, pdf_path) for svg_path, pdf_path in jobs if not os.path.exists(pdf_path)]
+    return convert_spawn(missing, inkscape_path)
+
+
+def convert_cairosvg(jobs, inkscape_path, fallback='shell'):
+    """
+    Convert (svg_path, pdf_path) pairs in this process with cairosvg, without starting Inkscape.
+    Files cairosvg can't render faithfully (see CAIROSVG_UNSUPPORTED) or fails on are converted with
+    the Inkscape `fallback` backend, as are all files when cairosvg is not installed. Without an
+    Inkscape path those files are reported as failed. Returns {svg_path: error message} for the files that failed.
+    """
+    if cairosvg is None:
+        if not inkscape_path:
+            return {svg_path: "cairosvg is not installed and no Inkscape path was given" for svg_path, _ in jobs}
+        return BACKENDS[fallback](jobs, inkscape_path)
+
+    remaining = []
+    for svg_path, pdf_path in jobs:
+        with open(svg_path, 'rb') as f:
+            svg = f.read()
+        if CAIROSVG_UNSUPPORTED.search(svg):
+            remaining.append((svg_path, pdf_path))
+            continue
+        try:
+            # url= lets relative links (images, fonts) resolve next to the file
+            cairosvg.svg2pdf(bytestring=svg, url=svg_path, write_to=pdf_path)
+        except Exception:
+            remaining.append((svg_path, pdf_path))
+
+    if remaining and not inkscape_path:
+        return {svg_path: "cairosvg can't convert it and no Inkscape path was given" for svg_path, _ in remaining}
+    return BACKENDS[fallback](remaining, inkscape_path) if remaining else {}
+
+
+# Converters of a batch of files: Inkscape run by the backends, or cairosvg in this process.
+# Each takes (jobs, inkscape_path) and returns {svg_path: error message}
+BACKENDS = {'shell': convert_shell, 'spawn': convert_spawn, 'cairosvg': convert_cairosvg}
+
+
+def convert_parallel(jobs, inkscape_path, backend='shell', workers=1):
+    """
+    Split the jobs between `workers` converters running at the same time (each a backend run,
+    i.e. its own Inkscape process in shell mode, or a cairosvg worker process).
+    Returns {svg_path: error message}.
+    """
+    convert = BACKENDS[backend]
+    if workers <= 1 or len(jobs) < 2:
+        return convert(jobs, inkscape_path)
+
+    # Every worker takes every n-th file, so large and small pages spread evenly
+    chunks = [jobs[i::workers] for i in range(min(workers, len(jobs)))]
+    # Threads only wait for Inkscape, but cairosvg renders in Python and holds the GIL,
+    # so it needs processes to run in parallel
+    pool = ProcessPoolExecutor if backend == 'cairosvg' else ThreadPoolExecutor
+    errors = {}
+    with pool(max_workers=len(chunks)) as executor:
+        for chunk_errors in executor.map(convert, chunks, [inkscape_path] * len(chunks)):
+            errors.update(chunk_errors)
+    return errors
+
+
+def converter_settings(svg_path, backend, inkscape_path):
+    """
+    Settings that decide how the page of an SVG file comes out: the converter that renders it and
+    its version. The Inkscape backends run the same Inkscape, so they share cached pages.
+    """
+    if backend == 'cairosvg' and cairosvg is not None:
+        with open(svg_path, 'rb') as f:
+            if not CAIROSVG_UNSUPPORTED.search(f.read()):
+                return {'converter': f"cairosvg {cairosvg.__version__}"}
+    return {'converter': 'inkscape', 'inkscape_path': inkscape_path}
+
+
+def prune_cache(cache_dir, keep=(), max_size=CACHE_MAX_SIZE, max_age_days=CACHE_MAX_AGE_DAYS):
+    """
+    Remove cached PDFs not used for max_age_days, then the least recently used ones until the cache
+    is at most max_size bytes. The paths in keep (the pages of the current run) are never removed.
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.pdf') and entry.is_file() and os.path.abspath(entry.path) not in keep:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries) + sum(os.path.getsize(path) for path in keep
+                                                       if os.path.exists(path))
+
+    oldest = time.time() - max_age_days * 86400 if max_age_days is not None else None
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if (oldest is None or mtime >= oldest) and (max_size is None or total <= max_size):
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    if removed:
+        print(f"Removed {removed} old page(s) from the cache")
+    return removed
+
+
+def cache_key(svg_path, settings):
+    """Hash of the SVG content and the converter settings, naming the cached PDF."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    with open(svg_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Page attributes that may be set on a node of the page tree instead of the page
+INHERITED_PAGE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+class StreamingPdfMerger:
+    """
+    Merge PDF files page by page, writing every copied object to the output as soon as it is read,
+    so memory holds one source file at a time plus the table of object offsets.
+
+    Objects that are the same in every detail (fonts, images, ...) are written once and shared by all
+    pages. A state file next to the output (output + '.merge.json') records which object belongs to
+    which source, so with incremental=True only new or changed source files are appended to the
+    existing PDF as an incremental update, and untouched pages are left where they are.
+
+    The output only changes when the merge succeeds: a new PDF is written to output + '.tmp' and moved
+    over the output by close(), and an incremental update is cut off the file again by abort().
+    """
+
+    def __init__(self, output_pdf_filename, incremental=False):
+        self.output_pdf_filename = output_pdf_filename
+        self.state_filename = output_pdf_filename + '.merge.json'
+        self.state = self.load_state() if incremental else None
+
+        if self.state:
+            self.temp_filename = None
+            self.stream = open(output_pdf_filename, 'r+b')
+            self.stream.seek(0, io.SEEK_END)
+            self.next_number = self.state['size']
+            self.catalog_number = self.state['root']
+            self.pages_number = self.state['pages']
+            # fingerprint -> object number of the shared objects already in the file
+            self.shared = self.state['shared']
+        else:
+            self.temp_filename = output_pdf_filename + '.tmp'
+            self.stream = open(self.temp_filename, 'wb')
+            self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+            self.next_number = 1
+            self.catalog_number = self.new_number()
+            self.pages_number = self.new_number()
+            self.shared = {}
+
+        self.offsets = {}
+        self.kids = []
+        self.sources = {}
+        self.order = []
+
+    def load_state(self):
+        """State of the previous merge, or None if it is missing or the PDF was changed since."""
+        try:
+            with open(self.state_filename, encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self.output_pdf_filename) or \
+                os.path.getsize(self.output_pdf_filename) != state['file_size']:
+            return None
+        return state
+
+    def new_number(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def write_object(self, number, obj):
+        self.offsets[number] = self.stream.tell()
+        self.stream.write(f"{number} 0 obj\n".encode('ascii'))
+        obj.write_to_stream(self.stream, None)
+        self.stream.write(b"\nendobj\n")
+
+    def fingerprint(self, reference, memo, stack):
+        """
+        Hash of an indirect object with everything it refers to, or None for objects
+        in a reference cycle (e.g. annotations pointing back to their page), which are never shared.
+        """
+        key = (reference.idnum, reference.generation)
+        if key in memo:
+            return memo[key]
+        if key in stack:
+            return None
+
+        stack.add(key)
+        digest = hashlib.sha256()
+
+        def feed(obj):
+            if isinstance(obj, IndirectObject):
+                target = self.fingerprint(obj, memo, stack)
+                if target is None:
+                    return False
+                digest.update(b"R" + target.encode('ascii'))
+            elif isinstance(obj, DictionaryObject):
+                digest.update(b"<<")
+                for name in sorted(obj.keys()):
+                    digest.update(name.encode('utf-8'))
+                    if not feed(dict.__getitem__(obj, name)):
+                        return False
+                digest.update(b">>")
+                if isinstance(obj, StreamObject):
+                    digest.update(self.stream_data(obj))
+            elif isinstance(obj, ArrayObject):
+                digest.update(b"[")
+                for item in obj:
+                    if not feed(item):
+                        return False
+                digest.update(b"]")
+            else:
+                buffer = io.BytesIO()
+                obj.write_to_stream(buffer, None)
+                digest.update(buffer.getvalue() + b" ")
+            return True
+
+        result = digest.hexdigest() if feed(reference.get_object()) else None
+        stack.discard(key)
+        memo[key] = result
+        return result
+
+    @staticmethod
+    def stream_data(obj):
+        # Encoded streams are copied as they are, without decoding and encoding them again
+        return obj._data if isinstance(obj, EncodedStreamObject) else obj.get_data()
+
+    def clone(self, obj, mapping, memo, queue):
+        """Copy a source object, renumbering the objects it refers to and queueing those not written yet."""
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in mapping:
+                fingerprint = self.fingerprint(obj, memo, set())
+                if fingerprint is not None and fingerprint in self.shared:
+                    mapping[key] = self.shared[fingerprint]
+                else:
+                    mapping[key] = self.new_number()
+                    if fingerprint is not None:
+                        self.shared[fingerprint] = mapping[key]
+                    queue.append((mapping[key], obj.get_object()))
+            return IndirectObject(mapping[key], 0, None)
+
+        if isinstance(obj, StreamObject):
+            copy = EncodedStreamObject() if isinstance(obj, EncodedStreamObject) else DecodedStreamObject()
+            copy._data = self.stream_data(obj)
+        elif isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+        elif isinstance(obj, ArrayObject):
+            return ArrayObject(self.clone(item, mapping, memo, queue) for item in obj)
+        else:
+            return obj
+
+        for name, value in obj.items():
+            copy[name] = self.clone(value, mapping, memo, queue)
+        return copy
+
+    def append(self, pdf_file):
+        """Append all pages of a PDF file (only recording them if the previous merge has the same file)."""
+        with open(pdf_file, 'rb') as f:
+            source = hashlib.sha256(f.read()).hexdigest()
+        self.order.append(source)
+        if source in self.sources:
+            self.kids.extend(self.sources[source])
+            return
+        if self.state and source in self.state['sources']:
+            self.sources[source] = self.state['sources'][source]
+            self.kids.extend(self.sources[source])
+            return
+
+        reader = PyPDF2.PdfReader(pdf_file)
+        mapping = {}
+        memo = {}
+        page_numbers = []
+        for page in reader.pages:
+            page_number = self.new_number()
+            if page.indirect_reference is not None:
+                mapping[(page.indirect_reference.idnum, page.indirect_reference.generation)] = page_number
+
+            queue = deque()
+            page_copy = DictionaryObject()
+            for name, value in self.page_attributes(page).items():
+                page_copy[name] = self.clone(value, mapping, memo, queue)
+            page_copy[NameObject('/Parent')] = IndirectObject(self.pages_number, 0, None)
+            self.write_object(page_number, page_copy)
+
+            while queue:
+                number, obj = queue.popleft()
+                self.write_object(number, self.clone_direct(obj, mapping, memo, queue))
+            page_numbers.append(page_number)
+
+        self.sources[source] = page_numbers
+        self.kids.extend(page_numbers)
+
+    @staticmethod
+    def page_attributes(page):
+        """Entries of the page without /Parent, with the attributes it inherits from the page tree."""
+        attributes = {name: value for name, value in page.items() if name != '/Parent'}
+        parent = page.get('/Parent')
+        while parent is not None:
+            parent = parent.get_object()
+            for name in INHERITED_PAGE_ATTRIBUTES:
+                if name not in attributes and name in parent:
+                    attributes[NameObject(name)] = dict.__getitem__(parent, name)
+            parent = parent.get('/Parent')
+        return attributes
+
+    def clone_direct(self, obj, mapping, memo, queue):
+        # A queued object is written under its own number, so it is copied itself, not referenced
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            return self.clone(obj, mapping, memo, queue)
+        return obj
+
+    def write_xref(self, previous=None):
+        """Write the cross-reference table of the objects written in this run, and the trailer."""
+        xref_offset = self.stream.tell()
+        self.stream.write(b"xref\n")
+
+        # Runs of consecutive object numbers, one subsection each, starting with the free object 0
+        # (an incremental update only lists the objects it writes)
+        groups = [[0]]
+        for number in sorted(self.offsets):
+            if groups[-1][-1] == number - 1:
+                groups[-1].append(number)
+            else:
+                groups.append([number])
+        for group in groups:
+            self.stream.write(f"{group[0]} {len(group)}\n".encode('ascii'))
+            for number in group:
+                entry = "0000000000 65535 f" if number == 0 else f"{self.offsets[number]:010d} 00000 n"
+                self.stream.write(f"{entry} \n".encode('ascii'))
+
+        trailer = f"trailer\n<< /Size {self.next_number} /Root {self.catalog_number} 0 R"
+        if previous is not None:
+            trailer += f" /Prev {previous}"
+        self.stream.write(f"{trailer} >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+        return xref_offset
+
+    def abort(self):
+        """Drop what this run has written, leaving the previous output and state as they were."""
+        if self.temp_filename is None:
+            self.stream.truncate(self.state['file_size'])
+            self.stream.close()
+        else:
+            self.stream.close()
+            os.remove(self.temp_filename)
+
+    def close(self):
+        """Finish the PDF, put it in place of the output and save the state of this merge."""
+        if self.state and self.state['order'] == self.order:
+            self.stream.close()
+            print("Merged PDF is up to date")
+            return
+
+        try:
+            pages = DictionaryObject({
+                NameObject('/Type'): NameObject('/Pages'),
+                NameObject('/Kids'): ArrayObject(IndirectObject(kid, 0, None) for kid in self.kids),
+                NameObject('/Count'): NumberObject(len(self.kids)),
+            })
+            self.write_object(self.pages_number, pages)
+
+            if self.state:
+                startxref = self.write_xref(previous=self.state['startxref'])
+            else:
+                catalog = DictionaryObject({
+                    NameObject('/Type'): NameObject('/Catalog'),
+                    NameObject('/Pages'): IndirectObject(self.pages_number, 0, None),
+                })
+                self.write_object(self.catalog_number, catalog)
+                startxref = self.write_xref()
+
+            # Pages of sources no longer used stay in the file but are not referenced any more
+            sources = dict(self.state['sources']) if self.state else {}
+            sources.update(self.sources)
+            state = {
+                'size': self.next_number,
+                'root': self.catalog_number,
+                'pages': self.pages_number,
+                'startxref': startxref,
+                'file_size': self.stream.tell(),
+                'order': self.order,
+                'sources': {source: sources[source] for source in self.order},
+                'shared': self.shared,
+            }
+            self.stream.flush()
+            os.fsync(self.stream.fileno())
+        except BaseException:
+            self.abort()
+            raise
+        self.stream.close()
+        if self.temp_filename is not None:
+            os.replace(self.temp_filename, self.output_pdf_filename)
+
+        # The state is replaced whole too; if the run stops before this, the state no longer matches
+        # the size of the PDF and the next incremental run writes a new file
+        temp_state_filename = self.state_filename + '.tmp'
+        with open(temp_state_filename, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_state_filename, self.state_filename)
+
+
+def merge_pdfs(pdf_files, output_pdf_filename, incremental=False):
+    """Merge the PDF files in order with StreamingPdfMerger; on any error the previous output is kept."""
+    merger = StreamingPdfMerger(output_pdf_filename, incremental)
+    try:
+        for pdf_file in pdf_files:
+            merger.append(pdf_file)
+    except BaseException:
+        merger.abort()
+        raise
+    merger.close()
+
+
+def list_svg_files(svg_directory):
+    # List all .svg files in the given directory
     svg_files = [f for f in os.listdir(svg_directory) if f.endswith('.svg')]
 
     # Ensuring that the files are sorted based on the numeric part of their names ("1.svg", "2.svg", "10.svg", "22.svg", "201.svg")
     svg_files.sort(key=natural_sort_key)
+    return svg_files
+
+
+def main(svg_directory, output_pdf_filename, inkscape_path, backend='shell', workers=1, cache_dir=None,
+         merger='streaming', incremental=False, cache_max_size=CACHE_MAX_SIZE,
+         cache_max_age_days=CACHE_MAX_AGE_DAYS):
+    """
+    Convert every .svg file of the directory and merge the pages in natural order.
+    backend picks the converter from BACKENDS ('cairosvg' renders without Inkscape and hands the files
+    it can't render to Inkscape); workers converters run at the same time. With cache_dir the PDFs are
+    kept there under the hash of the SVG content and converter settings, so a re-run only converts
+    the SVGs that changed, and
+    pages beyond cache_max_size bytes or unused for cache_max_age_days are removed afterwards.
+    merger='streaming' merges with StreamingPdfMerger (incremental=True appends only changed pages to the
+    previous output); merger='pypdf2' uses PyPDF2.PdfMerger, which holds the whole document in memory.
+    """
+    # Step 1: List all .svg files in the given directory, in natural order
+    svg_files = list_svg_files(svg_directory)
 
     # Temporary directory to store the temporary .pdf files
     temp_dir = tempfile.mkdtemp()
 
-    pdf_files = []
-
     try:
-        # Step 2: Iterate through sorted .svg files and convert them to .pdf using Inkscape
+        # Step 2: Find where each page's .pdf goes: the cache, or the temporary directory
+        pdf_files = []
+        jobs = []
+        jobs_seen = set()
         for svg_file in svg_files:
-            base_name = os.path.splitext(svg_file)[0]  # Get the part without the extension (e.g., "1" from "1.svg")
             svg_path = os.path.join(svg_directory, svg_file)
-            pdf_path = os.path.join(temp_dir, f"{base_name}.pdf")
+            if cache_dir:
+                key = cache_key(svg_path, converter_settings(svg_path, backend, inkscape_path))
+                pdf_path = os.path.join(cache_dir, f"{key}.pdf")
+                if os.path.exists(pdf_path):
+                    # Pages in use are the most recently used for prune_cache
+                    os.utime(pdf_path)
+                # Identical pages are converted once
+                temp_pdf_path = os.path.join(temp_dir, f"{key}.pdf")
+                if not os.path.exists(pdf_path) and temp_pdf_path not in jobs_seen:
+                    jobs.append((svg_path, temp_pdf_path))
+                    jobs_seen.add(temp_pdf_path)
+            else:
+                base_name = os.path.splitext(svg_file)[0]  # Get the part without the extension (e.g., "1" from "1.svg")
+                pdf_path = os.path.join(temp_dir, f"{base_name}.pdf")
+                jobs.append((svg_path, pdf_path))
+            pdf_files.append(pdf_path)
 
-            # Running Inkscape command to convert .svg files to .pdf
-            subprocess.run([inkscape_path, "--export-filename", pdf_path, svg_path], check=True)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            print(f"{len(jobs)} of {len(svg_files)} pages to convert, the rest found in the cache")
 
-            # Append pdf path to the list for later merging
-            pdf_files.append(pdf_path)
+        # Step 3: Convert the .svg files to .pdf using Inkscape
+        errors = convert_parallel(jobs, inkscape_path, backend, workers)
 
-        # Step 3: Merging temporary .pdf files into a single .pdf file using PyPDF2
-        pdf_merger = PyPDF2.PdfMerger()
-        for pdf_file in pdf_files:
-            pdf_merger.append(pdf_file)
+        # Finished PDFs are moved into the cache whole, so an interrupted run never leaves a broken entry
+        if cache_dir:
+            for svg_path, temp_pdf_path in jobs:
+                if svg_path not in errors:
+                    os.replace(temp_pdf_path, os.path.join(cache_dir, os.path.basename(temp_pdf_path)))
+
+        if errors:
+            for svg_path, error in errors.items():
+                print(f"Failed to convert {svg_path}: {error}")
+            raise RuntimeError(f"{len(errors)} of {len(jobs)} .svg files could not be converted")
+
+        # Step 4: Merging .pdf files into a single .pdf file, writing pages as they are read
+        if merger == 'streaming':
+            merge_pdfs(pdf_files, output_pdf_filename, incremental)
+        else:
+            pdf_merger = PyPDF2.PdfMerger()
+            for pdf_file in pdf_files:
+                pdf_merger.append(pdf_file)
 
-        # Step 4: Write the merged .pdf file to the specified output file path
-        pdf_merger.write(output_pdf_filename)
-        pdf_merger.close()
+            # Step 5: Write the merged .pdf file to the specified output file path
+            pdf_merger.write(output_pdf_filename)
+            pdf_merger.close()
+
+        if cache_dir:
+            prune_cache(cache_dir, pdf_files, cache_max_size, cache_max_age_days)
 
     finally:
         # Clean up the temporary directory if needed
@@ -59,11 +581,42 @@ def main(svg_directory, output_pdf_filename, inkscape_path):
     print(f"Merged all .svg files into a single PDF file: {output_pdf_filename}")
 
 
+def benchmark_backends(svg_directory, inkscape_path, limit=20):
+    """
+    Time converting the first `limit` files with a process per file, one shell-mode process
+    and, when it is installed, cairosvg.
+    """
+    svg_files = list_svg_files(svg_directory)[:limit]
+    timings = {}
+    for backend in ('spawn', 'shell') + (('cairosvg',) if cairosvg is not None else ()):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            jobs = [(os.path.join(svg_directory, svg_file),
+                     os.path.join(temp_dir, f"{os.path.splitext(svg_file)[0]}.pdf")) for svg_file in svg_files]
+            start = time.perf_counter()
+            errors = BACKENDS[backend](jobs, inkscape_path)
+            timings[backend] = time.perf_counter() - start
+        finally:
+            shutil.rmtree(temp_dir)
+        print(f"{backend}: {timings[backend]:.2f} s for {len(jobs)} files "
+              f"({timings[backend] / max(len(jobs), 1):.3f} s per file, {len(errors)} failed)")
+    return timings
+
+
 if __name__ == "__main__":
     svg_directory = r''  # You can change this to your specific SVG files directory
     output_pdf_filename = r''  # You can change this to your desired output PDF filename
     inkscape_path = r''  # Full path to the Inkscape executable
+    # 'cairosvg' renders simple schematics in milliseconds without Inkscape, with Inkscape for the rest
+    backend = 'shell'
+
+    # cairosvg can do without Inkscape (the files it can't render then fail), the other backends can't
+    if inkscape_path or backend != 'cairosvg':
+        check_inkscape_path(inkscape_path)
 
-    check_inkscape_path(inkscape_path)
+    # Convert on every core, keep the pages for the next run and only append the changed ones to the output
+    main(svg_directory, output_pdf_filename, inkscape_path, backend=backend, workers=os.cpu_count(),
+         cache_dir=os.path.join(svg_directory, '.pdf_cache'), incremental=True)
 
-    main(svg_directory, output_pdf_filename, inkscape_path)
+    # Compare the per-file, the single-process and the cairosvg backends
+    # benchmark_backends(svg_directory, inkscape_path)
@@ -0,0 +1,159 @@
+import json
+
+import pytest
+
+from conftest import load_script
+
+rename = load_script('batch rename.py', 'batch_rename')
+
+
+def make_files(directory, names):
+    """Files whose content is their original name, so renames can be followed."""
+    for name in names:
+        (directory / name).write_text(name, encoding='utf-8')
+
+
+def contents(directory):
+    """{name: original name} of the files in the directory."""
+    return {path.name: path.read_text(encoding='utf-8') for path in directory.iterdir() if path.is_file()}
+
+
+def test_rules_apply_one_after_another():
+    rules = [rename.strip_prefix('scan_'), rename.split_separator('_', '.svg'), rename.regex_rule(r'(\d+)', r'p\1')]
+
+    assert rename.apply_rules('scan_a_12.svg', rules) == 'p12.svg'
+    assert rename.apply_rules('b_3.svg', rules) == 'p3.svg'
+    assert rename.apply_rules('scan_7.png', rules) == 'p7.png'
+    assert rename.apply_rules('plain.txt', rules) is None
+
+
+def test_chain_is_renamed_from_its_end(tmp_path):
+    make_files(tmp_path, ['1.svg', '2.svg', '3.svg'])
+    rules = [rename.regex_rule(r'^(\d)', lambda match: str(int(match.group(1)) + 1))]
+
+    moves, conflicts = rename.rename_files(tmp_path, rules)
+
+    assert len(moves) == 3 and not conflicts
+    assert contents(tmp_path) == {'2.svg': '1.svg', '3.svg': '2.svg', '4.svg': '3.svg'}
+
+
+def test_cycle_uses_a_free_temporary_name(tmp_path):
+    make_files(tmp_path, ['a.svg', 'b.svg'])
+    # A leftover of an earlier run under the name the cycle would use first
+    for index in range(2):
+        make_files(tmp_path, [rename.TEMP_NAME.format(index=index, name='a.svg'),
+                              rename.TEMP_NAME.format(index=index, name='b.svg')])
+    before = contents(tmp_path)
+    rules = [rename.regex_rule(r'^[ab]', lambda match: 'b' if match.group() == 'a' else 'a')]
+
+    moves, conflicts = rename.rename_files(tmp_path, rules)
+
+    assert len(moves) == 2 and not conflicts
+    after = contents(tmp_path)
+    assert after['a.svg'] == 'b.svg' and after['b.svg'] == 'a.svg'
+    assert {name: after[name] for name in before if name.startswith('.')} == \
+        {name: content for name, content in before.items() if name.startswith('.')}
+    assert len(after) == len(before)
+
+
+def test_conflicts_block_the_moves_onto_their_names(tmp_path):
+    # c.txt stays, so b.txt -> c.txt is skipped, which keeps b.txt and blocks a.txt -> b.txt
+    make_files(tmp_path, ['a.txt', 'b.txt', 'c.txt', 'x1.txt', 'x2.txt', 'd.txt'])
+    renames = {'a.txt': 'b.txt', 'b.txt': 'c.txt', 'x1.txt': 'x.txt', 'x2.txt': 'x.txt', 'd.txt': 'e.txt'}
+
+    moves, conflicts = rename.plan_renames(tmp_path, [lambda name: renames.get(name) if name != 'c.txt' else None])
+
+    assert moves == [(tmp_path, 'd.txt', 'e.txt')]
+    reasons = {name: reason for _, name, _, reason in conflicts}
+    assert reasons == {
+        'b.txt': "a file with this name exists",
+        'a.txt': "its new name stays taken by a skipped file",
+        'x1.txt': "2 files get this name",
+        'x2.txt': "2 files get this name",
+    }
+
+
+def test_drop_blocked_follows_chains():
+    moves = [('d', 'a', 'b'), ('d', 'b', 'c'), ('d', 'e', 'f')]
+    conflicts = [('d', 'c', 'x', "a file with this name exists")]
+
+    assert rename.drop_blocked(moves, conflicts) == [('d', 'e', 'f')]
+    assert [conflict[:3] for conflict in conflicts[1:]] == [('d', 'b', 'c'), ('d', 'a', 'b')]
+
+
+def test_undo_reverts_the_journal(tmp_path):
+    make_files(tmp_path, ['a.svg', 'b.svg', 'c.svg'])
+    before = contents(tmp_path)
+    journal_path = tmp_path.parent / f'{tmp_path.name}.jsonl'
+    rules = [rename.regex_rule(r'^[ab]', lambda match: 'b' if match.group() == 'a' else 'a'),
+             rename.regex_rule(r'^c', 'd')]
+
+    rename.rename_files(tmp_path, rules, journal_path=journal_path)
+    renames = [json.loads(line) for line in journal_path.read_text(encoding='utf-8').splitlines()]
+    assert len(renames) == 4
+
+    rename.undo_journal(journal_path)
+
+    assert contents(tmp_path) == before
+    assert not journal_path.exists()
+
+
+def test_undo_resumes_after_a_failure(tmp_path):
+    make_files(tmp_path, ['1.svg', '2.svg', '3.svg'])
+    before = contents(tmp_path)
+    journal_path = tmp_path.parent / f'{tmp_path.name}.jsonl'
+    rename.rename_files(tmp_path, [rename.regex_rule(r'^(\d)', lambda match: str(int(match.group(1)) + 1))],
+                        journal_path=journal_path)
+
+    # The file of the last rename to revert was moved away: the undo stops there
+    (tmp_path / '4.svg').rename(tmp_path / 'moved.svg')
+    with pytest.raises(FileNotFoundError):
+        rename.undo_journal(journal_path)
+    assert len(journal_path.read_text(encoding='utf-8').splitlines()) == 1
+
+    (tmp_path / 'moved.svg').rename(tmp_path / '4.svg')
+    rename.undo_journal(journal_path)
+
+    assert contents(tmp_path) == before
+    assert not journal_path.exists()
+
+
+def test_undo_does_not_overwrite_a_new_file(tmp_path):
+    make_files(tmp_path, ['a.svg'])
+    journal_path = tmp_path.parent / f'{tmp_path.name}.jsonl'
+    rename.rename_files(tmp_path, [rename.regex_rule('^a', 'b')], journal_path=journal_path)
+    make_files(tmp_path, ['a.svg'])
+
+    with pytest.raises(FileExistsError):
+        rename.undo_journal(journal_path)
+
+    assert contents(tmp_path) == {'a.svg': 'a.svg', 'b.svg': 'a.svg'}
+    assert journal_path.exists()
+
+
+def test_journals_are_not_renamed(tmp_path):
+    make_files(tmp_path, ['a.svg', 'rename_journal_old.jsonl'])
+    journal_path = tmp_path / 'rename_journal_new.jsonl'
+
+    rename.rename_files(tmp_path, [rename.regex_rule('^', 'x_')], journal_path=journal_path)
+    rename.rename_files(tmp_path, [rename.regex_rule('^', 'y_')])
+
+    assert set(contents(tmp_path)) == {'y_x_a.svg', 'rename_journal_old.jsonl', 'rename_journal_new.jsonl'}
+    assert rename.default_journal_path(tmp_path).startswith(str(tmp_path.parent / f'rename_journal_{tmp_path.name}_'))
+
+
+@pytest.mark.parametrize('script, arguments, names, renamed', [
+    ('rename separator.py', (), ['1_a.svg', '2_a.svg', 'b.svg'], {'1_a.svg', '2_a.svg', 'b.svg'}),
+    ('rename separator.py', (), ['1_a.svg', '2_b.svg'], {'a.svg', 'b.svg'}),
+    ('rename prefix.py', ('140621_',), ['140621_a.svg', 'a.svg'], {'140621_a.svg', 'a.svg'}),
+])
+def test_old_scripts_use_the_engine(tmp_path, script, arguments, names, renamed):
+    directory = tmp_path / 'files'
+    directory.mkdir()
+    make_files(directory, names)
+
+    load_script(script, script.replace(' ', '_')).rename_files(directory, *arguments)
+
+    # Colliding names are skipped instead of overwriting a file, and the journal stays outside
+    assert set(contents(directory)) == renamed
+    assert list(tmp_path.glob('rename_journal_files_*.jsonl'))
@@ -0,0 +1,140 @@
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+convert = load_script('Convert .xls to .xlsx.py', 'convert_xls')
+
+
+def write_xls(path, sheets):
+    """A legacy workbook with one sheet per (name, header, rows), each with 3 filler rows after its header."""
+    xlwt = pytest.importorskip('xlwt')
+    book = xlwt.Workbook()
+    date_style = xlwt.easyxf(num_format_str='DD.MM.YYYY HH:MM')
+    for name, header, rows in sheets:
+        sheet = book.add_sheet(name)
+        for column, value in enumerate(header):
+            sheet.write(0, column, value)
+        for row_number, row in enumerate([['filler']] * 3 + rows, start=1):
+            for column, value in enumerate(row):
+                if isinstance(value, datetime):
+                    sheet.write(row_number, column, value, date_style)
+                elif value is not None:
+                    sheet.write(row_number, column, value)
+    book.save(str(path))
+
+
+def test_streaming_matches_the_dataframe_path(tmp_path):
+    source = tmp_path / 'source.xls'
+    write_xls(source, [
+        ('first', ['Date', 'Value', 'Note'], [
+            [datetime(2024, 1, 2, 8, 30), 1.5, 'a'],
+            [datetime(2024, 1, 3), 2, None],
+        ]),
+        ('second', ['Value', 'Date', 'Extra'], [
+            [3.25, datetime(2024, 2, 1), 7],
+            [None, datetime(2024, 2, 2), 8],
+        ]),
+    ])
+    plain_dir = tmp_path / 'plain'
+    streaming_dir = tmp_path / 'streaming'
+    plain_dir.mkdir()
+    streaming_dir.mkdir()
+
+    plain = pd.read_excel(convert.convert_file(source, plain_dir))
+    streamed = pd.read_excel(convert.convert_file(source, streaming_dir, streaming=True))
+
+    assert streamed.columns.tolist() == ['Date', 'Value', 'Note', 'Extra']
+    pd.testing.assert_frame_equal(streamed, plain, check_dtype=False)
+
+
+def test_failed_file_does_not_stop_the_run(tmp_path, monkeypatch):
+    source_dir = tmp_path / 'source'
+    target_dir = tmp_path / 'target'
+    source_dir.mkdir()
+    for name in ('bad', 'good'):
+        (source_dir / f'{name}.xls').write_bytes(b'')
+
+    def convert_file(file_path, target_dir, streaming=False, engine='pandas', merge=True):
+        if file_path.stem == 'bad':
+            raise ValueError('broken workbook')
+        new_file_path = convert.target_path(file_path, target_dir)
+        new_file_path.write_bytes(b'')
+        return new_file_path
+
+    monkeypatch.setattr(convert, 'convert_file', convert_file)
+    convert.convert_directory(source_dir, target_dir, workers=1)
+
+    assert (target_dir / 'good.xlsx').exists()
+    manifest = (target_dir / convert.MANIFEST_NAME).read_text(encoding='utf-8')
+    assert 'good.xls' in manifest and 'bad.xls' not in manifest
+
+
+def test_direct_engine_keeps_sheets_apart(tmp_path):
+    source = tmp_path / 'source.xls'
+    write_xls(source, [('first', ['Value'], [[1], [2]]), ('second', ['Value'], [[3]])])
+    target_dir = tmp_path / 'target'
+
+    convert.convert_directory(tmp_path, target_dir, workers=1, engine='direct', merge=False)
+
+    sheets = pd.read_excel(target_dir / 'source.xlsx', sheet_name=None)
+    assert {name: df['Value'].tolist() for name, df in sheets.items()} == {'first': [1, 2], 'second': [3]}
+
+
+@pytest.mark.parametrize('options', [{'engine': 'direct', 'streaming': True}, {'engine': 'pandas', 'merge': False}])
+def test_unsupported_options_raise(tmp_path, options):
+    with pytest.raises(ValueError):
+        convert.convert_directory(tmp_path, tmp_path / 'target', workers=1, **options)
+
+
+@pytest.mark.parametrize('options', [{'streaming': True}, {}, {'engine': 'direct'}])
+def test_failed_conversion_leaves_no_target(tmp_path, monkeypatch, options):
+    source_dir = tmp_path / 'source'
+    target_dir = tmp_path / 'target'
+    source_dir.mkdir()
+    write_xls(source_dir / 'source.xls', [('first', ['Value'], [[1], [2], [3]])])
+    row_cells = convert.row_cells
+    calls = []
+
+    def failing_row_cells(types, values, datemode):
+        calls.append(values)
+        if len(calls) == 4:
+            raise ValueError('broken row')
+        return row_cells(types, values, datemode)
+
+    if options:
+        monkeypatch.setattr(convert, 'row_cells', failing_row_cells)
+    else:
+        def failing_to_excel(df, path, **kwargs):
+            Path(path).write_bytes(b'partial')
+            raise OSError('disk full')
+
+        monkeypatch.setattr(pd.DataFrame, 'to_excel', failing_to_excel)
+    convert.convert_directory(source_dir, target_dir, workers=1, **options)
+
+    assert [path.name for path in target_dir.iterdir()] == [convert.MANIFEST_NAME]
+
+    monkeypatch.undo()
+    convert.convert_directory(source_dir, target_dir, workers=1, **options)
+    assert pd.read_excel(target_dir / 'source.xlsx')['Value'].tolist() == [1, 2, 3]
+
+
+def test_direct_merge_matches_columns_by_name(tmp_path):
+    source = tmp_path / 'source.xls'
+    write_xls(source, [
+        ('a', ['Date', 'Value'], [[datetime(2024, 1, 1), 1]]),
+        ('b', ['Value', 'Date'], [[2, datetime(2024, 1, 2)]]),
+    ])
+    plain_dir = tmp_path / 'plain'
+    direct_dir = tmp_path / 'direct'
+    plain_dir.mkdir()
+    direct_dir.mkdir()
+
+    plain = pd.read_excel(convert.convert_file(source, plain_dir))
+    direct = pd.read_excel(convert.convert_file(source, direct_dir, engine='direct'))
+
+    assert direct['Value'].tolist() == [1, 2]
+    pd.testing.assert_frame_equal(direct, plain, check_dtype=False)
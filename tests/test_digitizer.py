@@ -0,0 +1,338 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from conftest import load_script
+
+digitizer = load_script('Оцифровщик характеристик (Plot Digitizer) v1.0.py', 'digitizer')
+
+
+@pytest.fixture
+def raster_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(digitizer.tempfile, 'tempdir', str(tmp_path))
+    return tmp_path / 'digitizer_cache'
+
+
+def write_image(path, color, size=(40, 30)):
+    Image.new('RGB', size, color).save(path)
+    return str(path)
+
+
+def test_open_raster_keeps_the_cache_bounded(tmp_path, raster_cache, monkeypatch):
+    # Each cached 40 x 30 RGB image takes 3600 bytes plus the .npy header, so two fit
+    monkeypatch.setattr(digitizer, 'RASTER_CACHE_MAX_SIZE', 10_000)
+    paths = [write_image(tmp_path / f'{number}.png', (number * 50, 0, 0)) for number in range(3)]
+
+    for path in paths[:2]:
+        digitizer.open_raster(path)
+    for cache_path in raster_cache.iterdir():
+        os.utime(cache_path, (0, 0))
+    # Using the first image again makes the second the least recently used
+    digitizer.open_raster(paths[0])
+    digitizer.open_raster(paths[2])
+
+    cached = sorted(int(np.load(cache_path)[0, 0, 0]) for cache_path in raster_cache.iterdir())
+    assert cached == [0, 100]
+
+
+def test_image_limit_is_raised_only_while_opening(tmp_path):
+    path = write_image(tmp_path / 'image.png', (255, 255, 255))
+    default_limit = Image.MAX_IMAGE_PIXELS
+
+    with digitizer.open_image_file(path) as image:
+        assert image.size == (40, 30)
+
+    assert Image.MAX_IMAGE_PIXELS == default_limit < digitizer.IMAGE_MAX_PIXELS
+
+
+def test_trace_curve_follows_a_line_both_ways_from_the_seed():
+    pixels = np.full((100, 200, 3), 255, dtype=np.uint8)
+    columns = np.arange(10, 190)
+    rows = np.round(80 - columns * 0.3).astype(int)
+    pixels[rows, columns] = (255, 0, 0)
+
+    x, y = digitizer.trace_curve(pixels, (255, 0, 0), 0, 199, seed=(100, 50))
+
+    assert x.tolist() == columns.tolist()
+    assert y.tolist() == rows.tolist()
+
+
+def project(matrix, points):
+    """Pixels of points mapped by a 3x3 homogeneous matrix."""
+    x, y = digitizer.Calibration.apply(matrix, points[:, 0], points[:, 1])
+    return np.column_stack([x, y])
+
+
+def test_axis_clicks_within_jitter_are_snapped():
+    # A straight image with the clicks 2 pixels off the axis lines
+    calibration = digitizer.Calibration.from_axis_points(
+        [(100, 500), (900, 502), (101, 500), (99, 100)], [0, 10], [0, 4])
+
+    x, y = calibration.to_data([100, 900, 100], [300, 300, 100])
+    assert x.tolist() == [0, 10, 0]
+    assert y.tolist() == [2, 2, 4]
+
+
+def test_rotated_axes_are_followed():
+    # The same axes rotated by 1 degree about X1; the far end of the X axis is 14 pixels off its row
+    angle = np.radians(1)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    origin = np.array([100, 500])
+    clicks = (np.array([(100, 500), (900, 500), (100, 500), (100, 100)]) - origin) @ rotation.T + origin
+    calibration = digitizer.Calibration.from_axis_points(clicks, [0, 10], [0, 4])
+
+    point = (np.array([500, 300]) - origin) @ rotation.T + origin
+    x, y = calibration.to_data(*point)
+    assert (x, y) == pytest.approx((5, 2))
+
+
+@pytest.mark.parametrize('projective', [False, True])
+def test_fit_recovers_the_transform(projective):
+    if projective:
+        matrix = np.array([[0.02, 0.003, -3], [-0.001, -0.015, 9], [2e-5, 1e-5, 1]])
+    else:
+        matrix = np.array([[0.02, 0.003, -3], [-0.001, -0.015, 9], [0, 0, 1]])
+    pixels = np.array([(50, 60), (900, 80), (870, 700), (60, 650), (450, 380), (300, 150)], dtype=float)
+    values = project(matrix, pixels)
+
+    calibration = digitizer.Calibration.fit(pixels, values, projective=projective)
+
+    np.testing.assert_allclose(calibration.matrix, matrix, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(np.column_stack(calibration.to_pixels(*values.T)), pixels, atol=1e-9)
+
+
+def test_fit_rejects_points_on_a_line():
+    pixels = np.array([(0, 0), (10, 10), (20, 20), (30, 30)], dtype=float)
+    with pytest.raises(ValueError):
+        digitizer.Calibration.fit(pixels, pixels, projective=True)
+    with pytest.raises(ValueError):
+        digitizer.Calibration.fit(pixels, pixels)
+
+
+@pytest.mark.parametrize('x_log, y_log', [(False, False), (True, False), (False, True), (True, True)])
+def test_data_and_pixels_round_trip(x_log, y_log):
+    calibration = digitizer.Calibration.from_axis_points(
+        [(100, 500), (900, 500), (100, 500), (100, 100)], [1, 1000], [0.1, 100], x_log, y_log)
+    pixel_x = np.array([100, 250.5, 640, 900])
+    pixel_y = np.array([500, 420, 133.25, 100])
+
+    x, y = calibration.to_data(pixel_x, pixel_y)
+    axis_x = np.log10(x) if x_log else x
+    axis_y = np.log10(y) if y_log else y
+    back_x, back_y = calibration.to_pixels(axis_x, axis_y)
+
+    np.testing.assert_allclose(back_x, pixel_x, atol=1e-3)
+    np.testing.assert_allclose(back_y, pixel_y, atol=1e-3)
+    assert (x[0], x[-1]) == pytest.approx((1, 1000))
+    assert (y[0], y[-1]) == pytest.approx((0.1, 100))
+    if x_log:
+        # Halfway along a log axis is the geometric mean of its ends
+        assert calibration.to_data(500, 500)[0] == pytest.approx(np.sqrt(1000))
+
+
+def noisy_points(count=40, seed=0, coefficients=(1, 0.5, -0.1)):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 10, count)
+    y = np.polyval(coefficients[::-1], x) + rng.normal(0, 0.05, count)
+    return x, y
+
+
+def direct_cv_degree(x, y, fit):
+    """Degree chosen by CurveFit.select_degree, worked out by refitting np.polyfit on every training set."""
+    folds = np.arange(len(x)) % digitizer.FIT_FOLDS
+    errors = {}
+    for degree in range(fit['min_degree'], fit['max_degree'] + 1):
+        errors[degree] = 0.0
+        for fold in range(digitizer.FIT_FOLDS):
+            train = folds != fold
+            coefficients = np.polyfit(x[train], y[train], degree)
+            errors[degree] += ((np.polyval(coefficients, x[~train]) - y[~train]) ** 2).sum()
+    least = min(errors.values())
+    return min(degree for degree, error in errors.items() if error <= least * (1 + digitizer.FIT_CV_TOLERANCE))
+
+
+def incremental_fit(fit, x, y, extra=10):
+    """CurveFit fed in pieces, with extra points added and removed again at the end."""
+    curve_fit = digitizer.CurveFit(fit, (0, 10), (-5, 5))
+    for piece in np.array_split(np.arange(len(x)), 3):
+        curve_fit.extend(x[piece], y[piece])
+    rng = np.random.default_rng(1)
+    curve_fit.extend(rng.uniform(0, 10, extra), rng.uniform(-5, 5, extra))
+    curve_fit.remove(extra)
+    return curve_fit
+
+
+@pytest.mark.parametrize('degree', [1, 3, 7])
+def test_fixed_degree_matches_polyfit(degree):
+    x, y = noisy_points()
+    curve_fit = incremental_fit({**digitizer.FIT_SETTINGS, 'degree': degree}, x, y)
+
+    x_curve, y_curve = curve_fit.curve(50)
+
+    np.testing.assert_allclose(y_curve, np.polyval(np.polyfit(x, y, degree), x_curve), rtol=1e-7, atol=1e-9)
+    assert curve_fit.degree == degree
+
+
+@pytest.mark.parametrize('seed, coefficients', [(0, (1, 0.5, -0.1)), (1, (1, 0.5, -0.1, 0.02)),
+                                                (2, (0, 1)), (3, (2, -1, 0.3, -0.05, 0.002))])
+def test_cross_validation_matches_direct_refits(seed, coefficients):
+    fit = {**digitizer.FIT_SETTINGS, 'min_degree': 1}
+    x, y = noisy_points(seed=seed, coefficients=coefficients)
+    curve_fit = incremental_fit(fit, x, y)
+
+    x_curve, y_curve = curve_fit.curve(50)
+
+    degree = direct_cv_degree(x, y, fit)
+    assert curve_fit.degree == degree
+    np.testing.assert_allclose(y_curve, np.polyval(np.polyfit(x, y, degree), x_curve), rtol=1e-7, atol=1e-9)
+
+
+@pytest.mark.parametrize('changes', [{'degree': -1}, {'min_degree': 4, 'max_degree': 3}, {'method': 'cubic'}])
+def test_invalid_fit_settings_raise(changes):
+    with pytest.raises(ValueError):
+        digitizer.CurveFit({**digitizer.FIT_SETTINGS, **changes}, (0, 10), (-5, 5))
+
+
+def test_spline_matches_least_squares_on_its_knots():
+    fit = {**digitizer.FIT_SETTINGS, 'method': 'spline', 'knots': 4}
+    rng = np.random.default_rng(2)
+    x = np.sort(rng.uniform(0, 10, 60))
+    y = np.sin(x) + rng.normal(0, 0.05, len(x))
+    curve_fit = incremental_fit(fit, x, y)
+
+    x_curve, y_curve = curve_fit.curve(50)
+
+    # The same space of cubic splines, built in the units of X: knots evenly inside the X range
+    knots = np.linspace(0, 10, fit['knots'] + 2)[1:-1]
+
+    def basis(values):
+        return np.column_stack([np.vander(values, 4), np.maximum(values[:, None] - knots, 0) ** 3])
+
+    coefficients = np.linalg.lstsq(basis(x), y, rcond=None)[0]
+    np.testing.assert_allclose(y_curve, basis(x_curve) @ coefficients, rtol=1e-7, atol=1e-9)
+
+
+def test_pchip_matches_scipy():
+    x = np.array([0, 1, 2.5, 3, 5])
+    y = np.array([0, 2, 2.2, 4, 3])
+
+    # scipy.interpolate.PchipInterpolator(x, y) at the same samples
+    samples = np.array([0.5, 1.7, 2.75, 4, 5])
+    expected = [1.3101474926, 2.0898733548, 3.1190140845, 3.875, 3.0]
+    np.testing.assert_allclose(digitizer.pchip(x, y, samples), expected, atol=1e-9)
+
+
+def test_pchip_fit_goes_through_mean_of_repeated_x():
+    fit = {**digitizer.FIT_SETTINGS, 'method': 'pchip', 'points': 5}
+    curve_fit = digitizer.CurveFit(fit, (0, 4), (0, 10))
+    curve_fit.extend([0, 1, 1, 2, 3, 4], [0, 1, 3, 5, 5, 6])
+
+    x_curve, y_curve = curve_fit.curve(5)
+
+    assert x_curve.tolist() == [0, 1, 2, 3, 4]
+    np.testing.assert_allclose(y_curve, [0, 2, 5, 5, 6])
+
+
+# Axes of the synthetic images: X 0..10 over pixel columns 20..180, Y 0..5 over rows 180..20
+AXIS_POINTS = [(20, 180), (180, 180), (20, 180), (20, 20)]
+
+
+def line_project(**changes):
+    """A project with one auto-traced red curve, as save_project writes it."""
+    return {
+        'image_path': 'graph.png',
+        'axis_points': AXIS_POINTS,
+        'calibration': digitizer.Calibration.from_axis_points(AXIS_POINTS, [0, 10], [0, 5]),
+        'data_points': [(60.0, 160.0), (140.0, 120.0)],
+        'traces': [{'points': [0, 0], 'color': [255.0, 0.0, 0.0], 'seed': [100.0, 140.0], 'tolerance': 60}],
+        'fit': {**digitizer.FIT_SETTINGS, 'degree': 1},
+        **changes,
+    }
+
+
+def write_line_image(path):
+    """A red line y = x / 4 in axis values, one pixel wide, on white."""
+    pixels = np.full((200, 200, 3), 255, dtype=np.uint8)
+    columns = np.arange(20, 181)
+    pixels[np.round(180 - (columns - 20) / 2).astype(int), columns] = (255, 0, 0)
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+
+def test_project_round_trip(tmp_path):
+    project_path = tmp_path / 'project.json'
+    saved = line_project()
+
+    digitizer.write_project(project_path, saved)
+    loaded = digitizer.read_project(project_path)
+
+    np.testing.assert_allclose(loaded['calibration'].matrix, saved['calibration'].matrix)
+    assert loaded['calibration'].columns == (20, 180)
+    assert loaded['axis_points'] == AXIS_POINTS
+    assert loaded['data_points'] == saved['data_points']
+    assert loaded['traces'] == saved['traces']
+    assert loaded['fit'] == saved['fit']
+
+
+def test_legacy_project_is_read_as_an_aligned_calibration(tmp_path):
+    project_path = tmp_path / 'project.json'
+    project_path.write_text(json.dumps({
+        'axis_points': AXIS_POINTS,
+        'x_axis_xp': [20, 180], 'x_axis_fp': [0, 10],
+        'y_axis_xp': [180, 20], 'y_axis_fp': [0, 5],
+    }), encoding='utf-8')
+
+    project = digitizer.read_project(project_path)
+
+    x, y = project['calibration'].to_data([20, 100, 180], [180, 100, 20])
+    assert x.tolist() == pytest.approx([0, 5, 10])
+    assert y.tolist() == pytest.approx([0, 2.5, 5])
+    assert project['traces'] == [] and project['fit'] == digitizer.FIT_SETTINGS
+
+    project_path.write_text(json.dumps({'axis_points': AXIS_POINTS[:2]}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        digitizer.read_project(project_path)
+
+
+def test_digitize_image_traces_the_project_curves(tmp_path):
+    image_path = write_line_image(tmp_path / 'graph.png')
+
+    datasets = digitizer.digitize_image(image_path, line_project())
+
+    assert len(datasets) == 1
+    dataset = datasets[0]
+    x = dataset['График 1 X'].dropna().to_numpy()
+    y = dataset['График 1 Y'].dropna().to_numpy()
+    assert x[0] == pytest.approx(0) and x[-1] == pytest.approx(10) and len(x) == 161
+    # Rows are whole pixels, 1/32 of a Y unit
+    np.testing.assert_allclose(y, x / 4, atol=1 / 64)
+    curve_x = dataset['График 1 Интерп. X'].to_numpy()
+    np.testing.assert_allclose(dataset['График 1 Интерп. Y'], curve_x / 4, atol=0.01)
+
+
+def test_batch_digitize_writes_a_sheet_per_image(tmp_path):
+    project_path = tmp_path / 'project.json'
+    digitizer.write_project(project_path, line_project())
+    images = tmp_path / 'images'
+    images.mkdir()
+    write_line_image(images / 'first.png')
+    write_line_image(images / 'second.PNG')
+    write_image(images / 'blank.png', (255, 255, 255), size=(200, 200))
+    (images / 'notes.txt').write_text('not an image', encoding='utf-8')
+    output_path = tmp_path / 'result.xlsx'
+
+    digitizer.batch_digitize(project_path, [str(images)], output_path, workers=1)
+
+    sheets = pd.read_excel(output_path, sheet_name=None)
+    # Sorted by file name; the blank image has no curve and gets no sheet
+    assert list(sheets) == ['first', 'second']
+    for sheet in sheets.values():
+        np.testing.assert_allclose(sheet['График 1 Y'].dropna(), sheet['График 1 X'].dropna() / 4, atol=1 / 32)
+
+    digitizer.write_project(project_path, line_project(traces=[]))
+    with pytest.raises(ValueError):
+        digitizer.batch_digitize(project_path, [str(images)], output_path, workers=1)
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+kipia = load_script('Извлечение данные из выгрузки КИПИА АксЗФ.py', 'kipia')
+
+
+def write_dump(path, rows):
+    """A historian dump as the scripts read it: index column, ';' separated, comma decimals."""
+    lines = [';Tag;Date;Value']
+    lines += [f'{number};{tag};{date};{value}' for number, (tag, date, value) in enumerate(rows)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def test_stream_averages_survives_text_in_a_later_chunk(tmp_path):
+    csv_path = tmp_path / 'teg.csv'
+    write_dump(csv_path, [
+        ('A', '01.01.2024 00:00', '1,5'),
+        ('A', '01.01.2024 01:00', '2,5'),
+        ('B', '01.01.2024 00:00', '10'),
+        ('B', '01.01.2024 01:00', 'Bad'),
+        ('A', '2024-01-01 02:00', '3'),
+        ('B', '01.01.2024 02:00', '20,5'),
+    ])
+
+    result = kipia.stream_averages(csv_path, tmp_path / 'average.xlsx', chunksize=2)
+
+    assert result.loc['A', 'Value count'] == 3
+    assert result.loc['A', 'Value mean'] == pytest.approx(7 / 3)
+    assert result.loc['B', 'Value count'] == 2
+    assert result.loc['B', 'Value mean'] == pytest.approx(15.25)
+
+
+def test_minmax_indices_skips_a_gap():
+    values = np.sin(np.linspace(0, 20, 1000))
+    values[400:600] = np.nan
+
+    selected = kipia.minmax_indices(values, 40)
+
+    assert selected[0] == 0 and selected[-1] == len(values) - 1
+    assert not np.isnan(values[selected]).any()
+    assert np.nanargmax(values) in selected
+    assert np.nanargmin(values) in selected
+
+
+def test_write_tag_workbook_rejects_unknown_full_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dfft = pd.DataFrame({'Tag': ['A'] * 3, 'Date': ['01.01.2024'] * 3, 'Value': [1.0, 2.0, 3.0]})
+
+    with pytest.raises(ValueError, match='full_data'):
+        kipia.write_tag_workbook('A', dfft, full_data='json')
+    assert not list(tmp_path.iterdir())
+
+
+def test_tag_series_filters_dates_across_months(tmp_path):
+    csv_path = tmp_path / 'teg.csv'
+    db_path = tmp_path / 'teg.sqlite'
+    write_dump(csv_path, [
+        ('A', '28.01.2024 00:00', '1'),
+        ('A', '02.02.2024 00:00', '2'),
+        ('A', '15.02.2024 12:00', '3'),
+        ('A', '03.03.2024 00:00', '4'),
+        ('A', '', '5'),
+        ('B', '02.02.2024 00:00', '6'),
+    ])
+
+    kipia.ingest_csv(csv_path, db_path)
+    dfft = kipia.tag_series(db_path, 'A', start='01.02.2024', end='2024-02-29')
+
+    assert dfft['Value'].tolist() == [2, 3]
+    assert dfft['Date'].tolist() == [pd.Timestamp(2024, 2, 2), pd.Timestamp(2024, 2, 15, 12)]
+    assert kipia.tag_series(db_path, 'A')['Value'].tolist() == [1, 2, 3, 4]
+
+    aggregate = kipia.tag_aggregate(db_path, start='01.02.2024', end='01.03.2024')
+    assert aggregate['Value count'].to_dict() == {'A': 2, 'B': 1}
+
+
+def test_ingest_keeps_dates_in_mixed_layouts(tmp_path):
+    csv_path = tmp_path / 'teg.csv'
+    db_path = tmp_path / 'teg.sqlite'
+    write_dump(csv_path, [
+        ('A', '01.02.2024 00:00:00', '1'),
+        ('A', '03.02.2024', '2'),
+        ('A', '04.02.2024 01:00', '3'),
+        ('A', '2024-02-05 02:00', '4'),
+        ('A', 'yesterday', '5'),
+    ])
+
+    kipia.ingest_csv(csv_path, db_path)
+
+    dfft = kipia.tag_series(db_path, 'A')
+    assert dfft['Date'].tolist() == [pd.Timestamp(2024, 2, 1), pd.Timestamp(2024, 2, 3),
+                                     pd.Timestamp(2024, 2, 4, 1), pd.Timestamp(2024, 2, 5, 2)]
+
+
+def test_end_date_without_time_includes_the_day(tmp_path):
+    csv_path = tmp_path / 'teg.csv'
+    db_path = tmp_path / 'teg.sqlite'
+    write_dump(csv_path, [('A', '29.02.2024 00:00', '1'), ('A', '29.02.2024 23:30', '2'),
+                          ('A', '01.03.2024 00:00', '3')])
+    kipia.ingest_csv(csv_path, db_path)
+
+    assert kipia.tag_series(db_path, 'A', end='29.02.2024')['Value'].tolist() == [1, 2]
+    assert kipia.tag_series(db_path, 'A', end='29.02.2024 12:00')['Value'].tolist() == [1]
+    assert kipia.tag_aggregate(db_path, end='2024-02-29')['Value count'].to_dict() == {'A': 2}
+
+
+def test_bad_date_is_reported_as_given():
+    with pytest.raises(ValueError, match="'31.02.2024'"):
+        kipia.stored_date('31.02.2024')
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+consumption = load_script('Фосфорит выделение параметров потребления.py', 'phosphorite_consumption')
+
+
+def raw_sheet(rows):
+    """A sheet as pd.read_excel(header=None) gives it: label and value cells, NaN where empty."""
+    width = max(len(row) for row in rows)
+    return pd.DataFrame([row + [np.nan] * (width - len(row)) for row in rows])
+
+
+def test_phase_averages_read_the_value_after_each_label():
+    df = raw_sheet([
+        ['Ia', '10,5', 'Ib', 11, 'Ic', '12,5'],
+        ['Ubc', 6.1, 'Uca', np.nan, '6,2', 'Uab', '6,3'],
+        ['Ia', 1, 'Ib', 2],
+        ['Ia', 1, 'Ib', 2, 'Ic'],
+    ])
+
+    averages = consumption.phase_averages(df)
+
+    rows, value_columns, average = averages['I']
+    assert rows.tolist() == [0]
+    assert value_columns.tolist() == [[1, 3, 5]]
+    assert average == pytest.approx([34 / 3])
+
+    # An empty cell between a label and its value is skipped, as in the row string
+    rows, value_columns, average = averages['U']
+    assert rows.tolist() == [1]
+    assert value_columns.tolist() == [[1, 4, 6]]
+    assert average == pytest.approx([6.2])
+
+
+def test_process_excel_replaces_phase_values_with_their_mean(tmp_path):
+    source = tmp_path / 'export.xlsx'
+    raw_sheet([
+        ['Ia', '10,5', 'Ib', 11, 'Ic', '12,5'],
+        ['Ia', 1, 'Ib', 2, 'Ic'],
+        ['Ubc', 6, 'Uca', 7, 'Uab', 8],
+    ]).to_excel(source, header=False, index=False)
+
+    consumption.process_excel(str(source))
+
+    result = pd.read_excel(tmp_path / 'processed_export.xlsx')
+    cells = result.to_numpy(dtype=object).tolist()
+    assert [cells[0][column] for column in (1, 3, 5)] == pytest.approx([34 / 3] * 3)
+    # A row missing a phase is left as it was
+    assert cells[1][:5] == ['Ia', 1, 'Ib', 2, 'Ic']
+    assert [cells[2][column] for column in (1, 3, 5)] == [7] * 3
+
+
+# I = 9, 10, 11 and U = 6, 6, 6.3 with cosf 0.8, worked out by hand
+EXPECTED_STATISTICS = {
+    'I_mean': 10, 'I_min': 9, 'I_max': 11, 'I_imbalance': 10,
+    'U_mean': 6.1, 'U_min': 6, 'U_max': 6.3, 'U_imbalance': 0.2 / 6.1 * 100,
+    'P': 3 ** 0.5 * 6.1 * 10 * 0.8, 'Q': 3 ** 0.5 * 6.1 * 10 * 0.6, 'cosf': 0.8,
+}
+
+
+def assert_statistics(row, expected):
+    for column, value in expected.items():
+        assert row[column] == pytest.approx(value), column
+
+
+def test_phase_statistics_of_the_long_format():
+    def measurements(object_name, values):
+        return [{'object_name': object_name, 'time_of_measurement': '2024-01-01 10:00',
+                 'parameter_type': parameter, 'value': value} for parameter, value in values]
+
+    df = pd.DataFrame(
+        # Repeated parameters of one type are averaged: Ia is 9
+        measurements('РПТ 1', [('Ia', 8), ('Ia', 10), ('Ib', 10), ('Ic', 11),
+                               ('Ubc', 6), ('Uca', 6), ('Uab', 6.3), ('cos', 0.8)])
+        # Measured P and Q give cosf
+        + measurements('РПТ 2', [('Ia', 5), ('Ib', 5), ('Ic', 5), ('P', 3), ('Q', 4)])
+    )
+
+    result = consumption.phase_statistics(df)
+
+    assert list(result.index.get_level_values('object_name')) == ['РПТ 1', 'РПТ 2']
+    assert_statistics(result.iloc[0], EXPECTED_STATISTICS)
+    assert_statistics(result.iloc[1], {'I_mean': 5, 'I_imbalance': 0, 'P': 3, 'Q': 4, 'cosf': 0.6})
+    assert np.isnan(result.iloc[1]['U_mean'])
+
+
+def test_phase_statistics_of_the_raw_layout():
+    df = raw_sheet([
+        ['Ia', 9, 'Ib', '10', 'Ic', '11', 'cosf', '0,8'],
+        ['Ubc', 6, 'Uca', 6, 'Uab', '6,3'],
+        ['Ia', 9, 'Ib', '10', 'Ic', '11', 'Ubc', 6, 'Uca', 6, 'Uab', '6,3', 'cosf', '0,8'],
+    ])
+
+    result = consumption.phase_statistics(df)
+
+    assert list(result.index) == [0, 1, 2]
+    assert_statistics(result.iloc[2], EXPECTED_STATISTICS)
+    # Without a voltage in the row P cannot be derived
+    assert result.iloc[0]['I_mean'] == pytest.approx(10)
+    assert np.isnan(result.iloc[0]['U_mean']) and np.isnan(result.iloc[0]['P'])
+    assert result.iloc[1]['U_max'] == pytest.approx(6.3)
+    assert np.isnan(result.iloc[1]['cosf'])
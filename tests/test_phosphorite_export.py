@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+
+from conftest import load_script
+
+export = load_script('Фосфорит обработка выгрузки .py', 'phosphorite_export')
+
+
+def write_export(path, rows):
+    wb = Workbook()
+    sheet = wb.active
+    for row in rows:
+        sheet.append(row)
+    wb.save(path)
+
+
+def legacy_result(file_path):
+    # The legacy parser keeps values as comma-decimal strings
+    result = export.parse_excel_legacy(file_path)
+    return result.assign(value=pd.to_numeric(result['value'].str.replace(',', '.', regex=False), errors='coerce'))
+
+
+def test_parsers_agree_on_cell_types(tmp_path):
+    file_path = tmp_path / 'export.xlsx'
+    write_export(file_path, [
+        ['Ввод-1'],
+        ['Время', '01.02.2024 10:00:00.000'],
+        ['Ток', 'фазы', 'A', 12.5, 'А'],                    # float
+        ['Напряжение', 'фазное', 'Ua', 230, 'В'],            # int in a column with fractions
+        ['Мощность', 'активная', 'P', 1000.0, 'кВт'],        # integral float
+        ['cosf', 'общий', None, 0.95],                       # gap in the middle
+        ['Счетчик', 'импульсов', 'N', 'NA', 7, 'шт'],       # NA string, int-only column
+        ['Дата', 'поверки', datetime(2024, 1, 2, 3, 4, 5), 3, 'г'],
+        ['Ввод-2'],
+        ['Время', '02.02.2024 11:30:00.500'],
+        ['Флаг', 'готовности', True, 1, 'ед'],
+        ['Частота', 'сети', 'F', 50.01, 'Гц'],
+        [None],
+    ])
+
+    expected = legacy_result(file_path)
+    result = export.parse_excel(file_path)
+    assert len(result) == 8
+    pd.testing.assert_frame_equal(expected, result, check_dtype=False)
+
+
+def test_parsers_agree_before_first_object(tmp_path):
+    file_path = tmp_path / 'export.xlsx'
+    write_export(file_path, [
+        ['Ток', 'фазы', 'A', 1, 'А'],
+        ['Ток', 'фазы', 'B', 2, 'А'],
+        ['Ввод-1'],
+        ['Ток', 'фазы', 'C', 3.25, 'А'],
+    ])
+
+    pd.testing.assert_frame_equal(legacy_result(file_path), export.parse_excel(file_path), check_dtype=False)
+
+
+def test_failed_file_does_not_stop_the_run(tmp_path, monkeypatch):
+    input_directory = tmp_path / 'in'
+    input_directory.mkdir()
+    for name in ('a.xlsx', 'b.xlsx'):
+        write_export(input_directory / name, [['Ввод-1'], ['Ток', 'фазы', 'A', 1.5, 'А']])
+
+    process_file = export.process_file
+
+    def failing(file_path, *args):
+        if file_path.endswith('a.xlsx'):
+            raise OSError("disk full")
+        return process_file(file_path, *args)
+
+    monkeypatch.setattr(export, 'process_file', failing)
+    export.process_directory(str(input_directory), str(tmp_path / 'out'), workers=1)
+
+    assert list(export.load_manifest(str(tmp_path / 'out'))) == ['b.xlsx']
+    assert (tmp_path / 'out' / 'parsed_b.xlsx').exists()
+
+
+def test_deleted_input_leaves_the_dataset(tmp_path):
+    input_directory = tmp_path / 'in'
+    output_directory = tmp_path / 'out'
+    input_directory.mkdir()
+    write_export(input_directory / 'a.xlsx', [['Ввод-1'], ['Ток', 'фазы', 'A', 1.5, 'А']])
+    write_export(input_directory / 'b.xlsx', [['Ввод-2'], ['Ток', 'фазы', 'B', 2.5, 'А']])
+    export.process_directory(str(input_directory), str(output_directory), output_format='csv', consolidate=True)
+    assert sorted(export.load_dataset(str(output_directory), 'csv')['source_file']) == ['a.xlsx', 'b.xlsx']
+
+    (input_directory / 'a.xlsx').unlink()
+    (input_directory / 'b.xlsx').rename(input_directory / 'c.xlsx')
+    export.process_directory(str(input_directory), str(output_directory), output_format='csv', consolidate=True)
+
+    assert list(export.load_dataset(str(output_directory), 'csv')['source_file']) == ['c.xlsx']
+    assert list(export.load_manifest(str(output_directory))) == ['c.xlsx']
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from conftest import load_script
+
+split = load_script('split_merged_cells.py', 'split_merged_cells')
+
+
+def write_merged_workbook(path):
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = 'Data'
+    sheet.append(['Group', 'Value'])
+    sheet.append(['A', 1])
+    sheet.append([None, 2])
+    sheet.merge_cells('A2:A3')
+    wb.save(path)
+
+
+def test_failed_file_does_not_stop_the_run(tmp_path):
+    write_merged_workbook(tmp_path / 'good.xlsx')
+    (tmp_path / 'bad.xlsx').write_bytes(b'not a workbook')
+
+    split.process_paths([str(tmp_path)], workers=1)
+
+    assert (tmp_path / 'good mod.xlsx').exists()
+    assert not (tmp_path / 'bad mod.xlsx').exists()
+
+
+def write_typed_workbook(path):
+    wb = openpyxl.Workbook()
+    first = wb.active
+    first.title = 'First'
+    first.append(['Group', 'When', 'Text'])
+    first.append(['A', datetime(2024, 1, 2), '=1+1'])
+    first.append([None, datetime(2024, 1, 3, 12, 30), 'http://example.com'])
+    first.append(['B', None, 'plain'])
+    first.merge_cells('A2:A3')
+    first.merge_cells('B4:C4')
+    # Text that only looks like a formula
+    first['C2'].data_type = 's'
+    second = wb.create_sheet('Second')
+    second.append(['Name', 'Value'])
+    second.append(['x', 1.5])
+    second.append([None, 2])
+    second.merge_cells('A2:A3')
+    wb.save(path)
+
+
+def test_streaming_keeps_values_as_read(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    output = tmp_path / 'output.xlsx'
+    write_typed_workbook(source)
+
+    split.write_unmerged_streaming(source, output)
+
+    sheet = openpyxl.load_workbook(output)['First']
+    assert [[cell.value for cell in row] for row in sheet.iter_rows()] == [
+        ['Group', 'When', 'Text'],
+        ['A', datetime(2024, 1, 2), '=1+1'],
+        ['A', datetime(2024, 1, 3, 12, 30), 'http://example.com'],
+        ['B', None, None],
+    ]
+    assert sheet['B2'].is_date
+    assert sheet['C2'].data_type == 's'
+    assert not sheet['C3'].hyperlink
+
+
+def test_streaming_reads_the_same_as_loading(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    write_typed_workbook(source)
+
+    loaded = split.read_unmerged(source)
+    for sheet_name, df in loaded.items():
+        pd.testing.assert_frame_equal(split.read_unmerged_streaming(source, sheet_name), df)
+
+
+def test_workbook_mode_fills_the_unmerged_cells(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    write_typed_workbook(source)
+
+    output = split.process_file(str(source), mode='workbook')
+
+    wb = openpyxl.load_workbook(output)
+    first = wb['First']
+    assert not first.merged_cells.ranges
+    assert [first['A2'].value, first['A3'].value] == ['A', 'A']
+    assert [first['B4'].value, first['C4'].value] == [None, None]
+    assert first['C3'].value == 'http://example.com'
+    second = wb['Second']
+    assert not second.merged_cells.ranges
+    assert [row[0] for row in second.iter_rows(values_only=True)] == ['Name', 'x', 'x']
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+import PyPDF2
+import pytest
+
+from conftest import load_script
+
+svg_to_pdf = load_script('svg to pdf.py', 'svg_to_pdf')
+
+
+def write_pdf(path, *sizes):
+    """A PDF with one blank page of every (width, height)."""
+    writer = PyPDF2.PdfWriter()
+    for width, height in sizes:
+        writer.add_blank_page(width, height)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return str(path)
+
+
+def page_sizes(path):
+    reader = PyPDF2.PdfReader(str(path))
+    return [(float(page.mediabox.width), float(page.mediabox.height)) for page in reader.pages]
+
+
+def test_incremental_merge_reopens(tmp_path):
+    first = write_pdf(tmp_path / 'first.pdf', (100, 200), (110, 210))
+    second = write_pdf(tmp_path / 'second.pdf', (120, 220))
+    output = str(tmp_path / 'merged.pdf')
+
+    svg_to_pdf.merge_pdfs([first, second], output)
+    assert page_sizes(output) == [(100, 200), (110, 210), (120, 220)]
+    size = (tmp_path / 'merged.pdf').stat().st_size
+
+    second = write_pdf(tmp_path / 'second.pdf', (130, 230), (140, 240))
+    third = write_pdf(tmp_path / 'third.pdf', (150, 250))
+    svg_to_pdf.merge_pdfs([third, first, second], output, incremental=True)
+
+    # The first merge is kept as it was and the update is appended after it
+    assert (tmp_path / 'merged.pdf').stat().st_size > size
+    assert page_sizes(output) == [(150, 250), (100, 200), (110, 210), (130, 230), (140, 240)]
+    assert not (tmp_path / 'merged.pdf.tmp').exists()
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_failed_merge_keeps_the_previous_output(tmp_path, incremental):
+    first = write_pdf(tmp_path / 'first.pdf', (100, 200))
+    output = str(tmp_path / 'merged.pdf')
+    svg_to_pdf.merge_pdfs([first], output)
+    merged = (tmp_path / 'merged.pdf').read_bytes()
+    state = json.loads((tmp_path / 'merged.pdf.merge.json').read_text(encoding='utf-8'))
+
+    broken = tmp_path / 'broken.pdf'
+    broken.write_bytes(b'%PDF-1.7\nnot really a PDF')
+    second = write_pdf(tmp_path / 'second.pdf', (120, 220))
+    with pytest.raises(Exception):
+        svg_to_pdf.merge_pdfs([first, second, str(broken)], output, incremental=incremental)
+
+    assert (tmp_path / 'merged.pdf').read_bytes() == merged
+    assert json.loads((tmp_path / 'merged.pdf.merge.json').read_text(encoding='utf-8')) == state
+    assert not (tmp_path / 'merged.pdf.tmp').exists()
+
+    svg_to_pdf.merge_pdfs([first, second], output, incremental=incremental)
+    assert page_sizes(output) == [(100, 200), (120, 220)]
+
+
+def test_inkscape_backends_share_cached_pages(tmp_path):
+    svg_path = tmp_path / 'page.svg'
+    svg_path.write_text('<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"/>', encoding='utf-8')
+
+    keys = {backend: svg_to_pdf.cache_key(svg_path, svg_to_pdf.converter_settings(svg_path, backend, 'inkscape'))
+            for backend in ('shell', 'spawn')}
+    assert keys['shell'] == keys['spawn']
+    other = svg_to_pdf.cache_key(svg_path, svg_to_pdf.converter_settings(svg_path, 'shell', 'other/inkscape'))
+    assert other != keys['shell']
+
+
+def test_prune_cache_removes_old_and_least_recently_used_pages(tmp_path):
+    now = time.time()
+    ages = {'old': 100, 'used_long_ago': 30, 'used_lately': 10, 'used_now': 0, 'current': 200}
+    for name, days in ages.items():
+        path = tmp_path / f'{name}.pdf'
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (now - days * 86400, now - days * 86400))
+
+    removed = svg_to_pdf.prune_cache(tmp_path, keep=[str(tmp_path / 'current.pdf')], max_size=300,
+                                     max_age_days=60)
+
+    assert removed == 2
+    assert sorted(path.stem for path in tmp_path.iterdir()) == ['current', 'used_lately', 'used_now']
+
+
+def test_parallel_cairosvg_runs_in_processes(tmp_path, monkeypatch):
+    jobs = [(str(tmp_path / f'{number}.svg'), str(tmp_path / f'{number}.pdf')) for number in range(4)]
+
+    def convert(chunk, inkscape_path):
+        return {svg_path: os.getpid() for svg_path, _ in chunk}
+
+    # Without cairosvg every file goes to the Inkscape fallback, which reports the worker it ran in
+    monkeypatch.setattr(svg_to_pdf, 'cairosvg', None)
+    monkeypatch.setitem(svg_to_pdf.BACKENDS, 'shell', convert)
+    errors = svg_to_pdf.convert_parallel(jobs, 'inkscape', backend='cairosvg', workers=2)
+
+    assert sorted(errors) == sorted(svg_path for svg_path, _ in jobs)
+    assert os.getpid() not in errors.values()
+
+
+def test_cairosvg_without_inkscape_reports_every_file(tmp_path, monkeypatch):
+    jobs = [(str(tmp_path / f'{number}.svg'), str(tmp_path / f'{number}.pdf')) for number in range(3)]
+    monkeypatch.setattr(svg_to_pdf, 'cairosvg', None)
+
+    errors = svg_to_pdf.convert_parallel(jobs, '', backend='cairosvg', workers=2)
+
+    assert sorted(errors) == sorted(svg_path for svg_path, _ in jobs)
+    assert all('no Inkscape path' in error for error in errors.values())
@@ -1,31 +1,212 @@
+import os
+import sqlite3
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import xlsxwriter
-df=pd.read_csv(r'teg.csv', index_col=0, sep=';',decimal=',')
-print(df.info())
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-dft = df['Tag'].unique()
+# How the historian dump is read
+CSV_OPTIONS = {'index_col': 0, 'sep': ';', 'decimal': ','}
 
-average_values = df.groupby('Tag').mean()
-result_df = pd.DataFrame(average_values)
-print(result_df)
 
-# Save the average values to a single Excel file
-excel_filename = 'average.xlsx'
-writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
-result_df.to_excel(writer, sheet_name='Average Values')
-writer.close()
-print(f"Excel file created: {excel_filename}")
+def save_averages(df, excel_filename='average.xlsx'):
+    average_values = df.groupby('Tag').mean()
+    write_averages(average_values, excel_filename)
 
-# Create an Excel file for each tag and insert a chart
-for tag in dft:
-    dfft = df.loc[df['Tag'] == tag]
-    dfft = dfft.sort_values(by='Date')
+
+def write_averages(average_values, excel_filename='average.xlsx', statistics=None):
+    result_df = pd.DataFrame(average_values)
+    print(result_df)
+
+    # Save the average values to a single Excel file
+    writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
+    result_df.to_excel(writer, sheet_name='Average Values')
+    if statistics is not None:
+        statistics.to_excel(writer, sheet_name='Statistics')
+    writer.close()
+    print(f"Excel file created: {excel_filename}")
+
+
+def chunk_statistics(chunk, columns):
+    """Per-tag count, sum, min, max and sum of squared deviations (m2) of one chunk."""
+    grouped = chunk.groupby('Tag')[columns]
+    count = grouped.count()
+    return {
+        'count': count,
+        'sum': grouped.sum(),
+        'min': grouped.min(),
+        'max': grouped.max(),
+        'm2': grouped.var(ddof=0) * count,
+    }
+
+
+def merge_statistics(a, b):
+    """Combine the accumulators of two chunks (Chan et al. parallel variance update)."""
+    tags = a['count'].index.union(b['count'].index)
+    count_a, count_b = (stats['count'].reindex(tags, fill_value=0) for stats in (a, b))
+    sum_a, sum_b = (stats['sum'].reindex(tags, fill_value=0) for stats in (a, b))
+    m2_a, m2_b = (stats['m2'].reindex(tags).fillna(0) for stats in (a, b))
+    count = count_a + count_b
+
+    delta = sum_b / count_b - sum_a / count_a
+    correction = (delta ** 2 * count_a * count_b / count).where((count_a > 0) & (count_b > 0), 0)
+    return {
+        'count': count,
+        'sum': sum_a + sum_b,
+        'min': pd.concat([a['min'], b['min']]).groupby(level=0).min().reindex(tags),
+        'max': pd.concat([a['max'], b['max']]).groupby(level=0).max().reindex(tags),
+        'm2': m2_a + m2_b + correction,
+    }
+
+
+def coerce_numeric(column):
+    """
+    A column that should hold numbers as float: text left by a stray value in the chunk (a status word,
+    a comma decimal the parser gave up on) is converted where it can be and becomes NaN where not.
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype(float)
+    return pd.to_numeric(column.astype(str).str.replace(',', '.', regex=False), errors='coerce')
+
+
+def stream_averages(csv_path, excel_filename='average.xlsx', chunksize=1_000_000, dtype=None, statistics=False):
+    """
+    Per-tag averages of a CSV too large for memory, read in chunks of chunksize rows.
+
+    Memory depends on the number of tags, not rows: each chunk only updates per-tag count, sum, min,
+    max and a running variance. dtype maps column names to types; by default it is inferred from the
+    first chunk. Only numeric columns are averaged; they are coerced to float in every chunk, so a
+    value that is not a number further down the file counts as a gap instead of stopping the run.
+    Writes the same 'Average Values' sheet as save_averages, plus a 'Statistics' sheet with
+    statistics=True, and returns the statistics.
+    """
+    if dtype is None:
+        first_chunk = pd.read_csv(csv_path, nrows=chunksize, **CSV_OPTIONS)
+        # Numbers as float, so a gap further down the file does not break an integer column
+        dtype = {column: float if pd.api.types.is_numeric_dtype(column_type) else column_type
+                 for column, column_type in first_chunk.dtypes.items()}
+        dtype['Tag'] = str
+    columns = [column for column, column_type in dtype.items()
+               if column != 'Tag' and pd.api.types.is_numeric_dtype(column_type)]
+
+    # Only the other columns are pinned when reading, the numeric ones are coerced chunk by chunk
+    read_dtype = {column: column_type for column, column_type in dtype.items() if column not in columns}
+    accumulated = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=read_dtype, **CSV_OPTIONS):
+        for column in columns:
+            chunk[column] = coerce_numeric(chunk[column])
+        stats = chunk_statistics(chunk, columns)
+        accumulated = stats if accumulated is None else merge_statistics(accumulated, stats)
+
+    if accumulated is None:
+        raise ValueError(f"No rows in {csv_path}")
+
+    count = accumulated['count']
+    average_values = accumulated['sum'] / count
+    result = pd.concat({
+        'count': count,
+        'sum': accumulated['sum'],
+        'min': accumulated['min'],
+        'max': accumulated['max'],
+        'mean': average_values,
+        'var': accumulated['m2'] / (count - 1).where(count > 1, np.nan),
+    }, axis=1)
+    # Columns like "Value mean", grouped by the source column
+    result.columns = [f'{column} {statistic}' for statistic, column in result.columns]
+    result = result[[f'{column} {statistic}' for column in columns
+                     for statistic in ('count', 'sum', 'min', 'max', 'mean', 'var')]]
+
+    write_averages(average_values, excel_filename, result if statistics else None)
+    return result
+
+
+def lttb_indices(values, n_out):
+    """
+    Positions of the points kept by largest-triangle-three-buckets downsampling to n_out points.
+    Points are taken as evenly spaced, the way a line chart draws them.
+    """
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Gaps must not decide which points are kept
+    y = pd.Series(values, dtype=float).ffill().bfill().fillna(0).to_numpy()
+
+    # The first and last points are always kept, the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = (edges[bucket + 1] + edges[bucket + 2] - 1) / 2
+            next_y = y[edges[bucket + 1]:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = n - 1, y[n - 1]
+
+        # Keep the point forming the largest triangle with the previous kept point and the next bucket's mean
+        x = np.arange(start, end)
+        area = np.abs((previous - next_x) * (y[start:end] - y[previous]) - (previous - x) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(values, n_out):
+    """Positions of the minimum and maximum of each of n_out / 2 buckets, plus the first and last points."""
+    n = len(values)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    # Gaps are left out before grouping, a bucket that is all gap then simply has no extremes
+    y = pd.Series(values, dtype=float)
+    bucket = pd.Series(np.arange(n) * ((n_out - 2) // 2) // n)
+    present = y.notna()
+    grouped = y[present].groupby(bucket[present])
+    selected = np.concatenate([[0, n - 1], grouped.idxmin(), grouped.idxmax()])
+    return np.unique(selected.astype(int))
+
+
+DOWNSAMPLING = {'lttb': lttb_indices, 'minmax': minmax_indices}
+FULL_DATA = ('sheet', 'parquet', 'csv')
+
+
+def write_tag_workbook(tag, dfft, chart_points=None, method='lttb', full_data='sheet'):
+    """
+    Create an Excel file for one tag, with its rows already sorted by date, and insert a chart.
+
+    With chart_points the chart shows only that many points, chosen by method ('lttb' or 'minmax')
+    so peaks stay visible. The full data then stays on the sheet and the chart reads the reduced
+    rows from a separate 'График' sheet (full_data='sheet'), or the full data goes to a
+    f'{tag}.parquet' or f'{tag}.csv' file and the sheet holds only the reduced rows
+    (full_data='parquet' or 'csv').
+    """
+    if full_data not in FULL_DATA:
+        raise ValueError(f"full_data must be one of {', '.join(FULL_DATA)}, not {full_data!r}")
+
+    chart_data = dfft
+    if chart_points and len(dfft) > chart_points:
+        # Value column of the chart, right after the index on the sheet
+        chart_data = dfft.iloc[DOWNSAMPLING[method](dfft.iloc[:, 1].to_numpy(), chart_points)]
 
     # Create an Excel writer
     excel_filename = f'{tag}.xlsx'
     writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
-    dfft.to_excel(writer, sheet_name='Потребление')
+    chart_sheet = 'Потребление'
+    if full_data == 'sheet':
+        dfft.to_excel(writer, sheet_name='Потребление')
+        if chart_data is not dfft:
+            chart_sheet = 'График'
+            chart_data.to_excel(writer, sheet_name=chart_sheet)
+    else:
+        chart_data.to_excel(writer, sheet_name='Потребление')
+        if full_data == 'parquet':
+            dfft.to_parquet(f'{tag}.parquet')
+        elif full_data == 'csv':
+            dfft.to_csv(f'{tag}.csv', sep=';', decimal=',')
 
     # Access the workbook and worksheet
     workbook = writer.book
@@ -37,8 +218,8 @@ for tag in dft:
     # Configure the series of the chart
     chart.add_series({
         'name': f'Tag {tag}',
-        'categories': ['Потребление', 1, 0, len(dfft), 0],  # Date column
-        'values': ['Потребление', 1, 2, len(dfft), 2],      # Value column
+        'categories': [chart_sheet, 1, 0, len(chart_data), 0],  # Date column
+        'values': [chart_sheet, 1, 2, len(chart_data), 2],      # Value column
     })
 
     # Set the chart title and axes names
@@ -54,6 +235,203 @@ for tag in dft:
 
     # Save the Excel file
     writer.close()
+    return excel_filename
+
+
+def export_tags(df, workers=None, chart_points=None, method='lttb', full_data='sheet'):
+    """
+    Write one workbook per tag. The data is sorted once by tag and date and split with a single groupby,
+    then the workbooks are written by a pool of worker processes (workers=1 writes them in this process).
+    chart_points, method and full_data are passed to write_tag_workbook.
+    """
+    write = partial(write_tag_workbook, chart_points=chart_points, method=method, full_data=full_data)
+
+    # A stable sort keeps rows with equal dates in file order
+    df = df.sort_values(['Tag', 'Date'], kind='mergesort')
+    groups = df.groupby('Tag', sort=False)
+
+    if workers == 1:
+        for tag, dfft in groups:
+            print(f"Excel file created: {write(tag, dfft)}")
+        return
+
+    tags, frames = zip(*groups) if len(groups) else ((), ())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for excel_filename in executor.map(write, tags, frames, chunksize=8):
+            print(f"Excel file created: {excel_filename}")
+
+
+def quote(name):
+    """Quote a column name for SQL."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_type(column, dtype):
+    if column in ('Tag', 'Date'):
+        return 'TEXT'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+# Dates are stored as ISO-8601 text, which sorts and compares in time order
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def parse_dates(values):
+    """
+    Dates as in the dump (dd.mm.yyyy) or already ISO as timestamps, NaT where a value does not parse.
+    Most values share the layout of the first one and are parsed in one pass; values in another layout
+    (without seconds, without time) are then parsed one by one.
+    """
+    text = pd.Series(values).astype('str')
+    iso = text.str.match(r'\d{4}-', na=False)
+    dates = pd.Series(pd.NaT, index=text.index, dtype='datetime64[us]')
+    for selected, dayfirst in ((iso, False), (~iso, True)):
+        parsed = pd.to_datetime(text[selected], dayfirst=dayfirst, errors='coerce')
+        other = parsed.isna() & text[selected].notna()
+        if other.any():
+            parsed[other] = pd.to_datetime(text[selected][other], dayfirst=dayfirst, format='mixed', errors='coerce')
+        dates[selected] = parsed
+    return dates
+
+
+def stored_date(value, end=False):
+    """
+    A start or end date (text in either layout, or a datetime) in the form stored in the database.
+    With end=True a date without a time of day means the end of that day, so the whole day is included.
+    """
+    if isinstance(value, str):
+        text = value
+        value = parse_dates([text])[0]
+        if pd.isna(value):
+            raise ValueError(f"Not a date: {text!r}")
+        if end and ':' not in text:
+            value += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return pd.Timestamp(value).strftime(DATE_FORMAT)
+
+
+def ingest_csv(csv_path, db_path='teg.sqlite', chunksize=1_000_000):
+    """
+    Load the CSV into a SQLite table 'measurements' keyed and clustered by (Tag, Date), chunk by chunk.
+    Rows already in the database for the same tag and date are replaced, so re-ingesting a dump
+    (or a newer one overlapping it) does not create duplicates. Dates are stored as ISO-8601 text;
+    rows without a tag or with a date that does not parse cannot be keyed and are skipped.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = 0
+        skipped = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, **CSV_OPTIONS):
+            chunk = chunk.reset_index()
+            dates = parse_dates(chunk['Date'])
+            keyed = dates.notna() & chunk['Tag'].notna()
+            skipped += int((~keyed).sum())
+            chunk = chunk[keyed].copy()
+            chunk['Date'] = dates[keyed].dt.strftime(DATE_FORMAT)
+            if rows == 0:
+                column_types = ', '.join(f"{quote(column)} {sql_type(column, dtype)}"
+                                         for column, dtype in chunk.dtypes.items())
+                connection.execute(f"CREATE TABLE IF NOT EXISTS measurements ({column_types}, "
+                                   f"PRIMARY KEY (Tag, Date)) WITHOUT ROWID")
+
+            columns = ', '.join(quote(column) for column in chunk.columns)
+            placeholders = ', '.join('?' * len(chunk.columns))
+            records = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+            with connection:
+                connection.executemany(f"INSERT OR REPLACE INTO measurements ({columns}) VALUES ({placeholders})",
+                                       records)
+            rows += len(chunk)
+            print(f"Ingested {rows} rows")
+        if skipped:
+            print(f"Skipped {skipped} rows without a tag or a valid date")
+    finally:
+        connection.close()
+
+
+def tag_series(db_path, tag, start=None, end=None):
+    """
+    Rows of one tag sorted by date, optionally limited to start <= Date <= end, in the same layout
+    as read from the CSV but with Date as datetime. start and end may be dd.mm.yyyy or ISO text or datetimes;
+    an end given as text without a time includes the whole of that day.
+    """
+    query = "SELECT * FROM measurements WHERE Tag = ?"
+    params = [tag]
+    if start is not None:
+        query += " AND Date >= ?"
+        params.append(stored_date(start))
+    if end is not None:
+        query += " AND Date <= ?"
+        params.append(stored_date(end, end=True))
+    query += " ORDER BY Date"
+
+    connection = sqlite3.connect(db_path)
+    try:
+        dfft = pd.read_sql_query(query, connection, params=params)
+    finally:
+        connection.close()
+    dfft['Date'] = pd.to_datetime(dfft['Date'])
+    # The first CSV column was the index
+    return dfft.set_index(dfft.columns[0])
+
+
+def tag_aggregate(db_path, tags=None, start=None, end=None):
+    """
+    Count, mean, min and max of every numeric column per tag, optionally for some tags and a date range
+    (start and end as in tag_series).
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        # Numeric columns except the first one, which is the row index of the CSV
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(measurements)")
+                   if row[2] in ('INTEGER', 'REAL') and row[0] > 0]
+        aggregates = ', '.join(f"{function}({quote(column)}) AS {quote(f'{column} {name}')}"
+                               for column in columns
+                               for function, name in (('COUNT', 'count'), ('AVG', 'mean'), ('MIN', 'min'),
+                                                      ('MAX', 'max')))
+        conditions = []
+        params = []
+        if tags is not None:
+            tags = [tags] if isinstance(tags, str) else list(tags)
+            conditions.append(f"Tag IN ({', '.join('?' * len(tags))})")
+            params.extend(tags)
+        if start is not None:
+            conditions.append("Date >= ?")
+            params.append(stored_date(start))
+        if end is not None:
+            conditions.append("Date <= ?")
+            params.append(stored_date(end, end=True))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        return pd.read_sql_query(f"SELECT Tag, {aggregates} FROM measurements{where} GROUP BY Tag ORDER BY Tag",
+                                 connection, params=params, index_col='Tag')
+    finally:
+        connection.close()
+
+
+def export_tag(db_path, tag, start=None, end=None, **chart_options):
+    """Write the workbook with chart for a single tag straight from the database."""
+    excel_filename = write_tag_workbook(tag, tag_series(db_path, tag, start, end), **chart_options)
     print(f"Excel file created: {excel_filename}")
+    return excel_filename
+
+
+if __name__ == "__main__":
+    # For dumps bigger than RAM only the averages can be computed, chunk by chunk:
+    # stream_averages(r'teg.csv')
+
+    # Or load the dump into a database once and query single tags afterwards:
+    # ingest_csv(r'teg.csv', 'teg.sqlite')
+    # export_tag('teg.sqlite', 'tag name', chart_points=2000)
+
+    df=pd.read_csv(r'teg.csv', **CSV_OPTIONS)
+    print(df.info())
+
+    save_averages(df)
+
+    # Create an Excel file for each tag and insert a chart of at most 2000 points
+    export_tags(df, workers=os.cpu_count(), chart_points=2000)
 
-print("Done!")
+    print("Done!")
@@ -1,15 +1,25 @@
 import sys
 import os
+import re
+import json
+import math
+import hashlib
+import argparse
+import tempfile
+import time
+import multiprocessing
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 from PIL import Image, ImageDraw, ImageTk
 import matplotlib
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Set matplotlib backend before other imports
 matplotlib.use('TkAgg')
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.transforms import Bbox
 import matplotlib.pyplot as plt
 
 
@@ -20,6 +30,826 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
+# Magnifier: side of the shown square, pixels of the image around the cursor, and the shortest time
+# between redraws (one display frame), so a burst of mouse moves costs one update
+SCOPE_SIZE = 200
+SCOPE_RADIUS = 50
+SCOPE_FRAME_MS = 16
+
+# Images with more pixels open in large-image mode: decoded once into a memory-mapped cache and shown as
+# a downsampled overview plus the visible part at screen resolution
+LARGE_IMAGE_PIXELS = 50_000_000
+OVERVIEW_SIZE = 2048
+RASTER_STRIP_ROWS = 512
+ZOOM_STEP = 1.25
+
+# Plant diagram scans are over Pillow's decompression bomb limit (about 179 megapixels); the limit is
+# raised to this only while an image is opened by open_image_file
+IMAGE_MAX_PIXELS = 1_000_000_000
+
+# Decoded large images kept in the temporary directory; the least recently used go beyond this size
+RASTER_CACHE_MAX_SIZE = 4 << 30
+
+
+def open_image_file(image_path):
+    """Image.open with the decompression bomb limit raised to IMAGE_MAX_PIXELS for this call only."""
+    default_limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        return Image.open(image_path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = default_limit
+
+
+def prune_raster_cache(cache_dir, keep):
+    """
+    Remove the least recently used cache files until the cache is at most RASTER_CACHE_MAX_SIZE bytes,
+    never the file keep. Unfinished files left by a closed app count once they are a day old.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.path == keep or not entry.is_file():
+            continue
+        stat = entry.stat()
+        if entry.name.endswith('.npy') or (entry.name.endswith('.part') and stat.st_mtime < time.time() - 86400):
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= RASTER_CACHE_MAX_SIZE:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Still mapped by another window (Windows does not delete open files)
+            continue
+        total -= size
+
+
+def open_raster(image_path):
+    """
+    Full-resolution RGB pixels of the image as a read-only memory-mapped array (rows, columns, 3).
+    The image is decoded once into a cache file in the temporary directory, keyed by its path, size and
+    modification time; later calls only map that file, and pages are read from disk as they are used.
+    The cache is kept under RASTER_CACHE_MAX_SIZE by dropping the files used least recently.
+    """
+    stat = os.stat(image_path)
+    key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    cache_dir = os.path.join(tempfile.gettempdir(), 'digitizer_cache')
+    cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+
+    if os.path.exists(cache_path):
+        # Marks the file as recently used for prune_raster_cache
+        os.utime(cache_path)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = cache_path + '.part'
+        with open_image_file(image_path) as image:
+            raster = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8,
+                                               shape=(image.height, image.width, 3))
+            # Converted to RGB in strips, so there is never a second full copy in memory
+            for top in range(0, image.height, RASTER_STRIP_ROWS):
+                strip = image.crop((0, top, image.width, min(image.height, top + RASTER_STRIP_ROWS)))
+                raster[top:top + strip.height] = np.asarray(strip.convert('RGB'))
+            raster.flush()
+            del raster
+        # A cache file is complete or absent, even if the app is closed while decoding
+        os.replace(temp_path, cache_path)
+        prune_raster_cache(cache_dir, cache_path)
+
+    return np.load(cache_path, mmap_mode='r')
+
+
+# Auto-trace: largest RGB distance from the curve colour, and columns of the image processed at a time
+TRACE_TOLERANCE = 60
+TRACE_CHUNK_COLUMNS = 512
+# A run this many times taller than the recent ones (and over TRACE_LINE_RUN pixels) is
+# a vertical line crossing the curve (an axis, a grid line), and its column is skipped
+TRACE_RUN_GROWTH = 8
+TRACE_LINE_RUN = 20
+# Columns back used for the slope that predicts the next point, so the trace goes straight through
+# the places where it meets a horizontal line of the same colour
+TRACE_SLOPE_COLUMNS = 10
+
+
+def color_runs(pixels, color, tolerance=TRACE_TOLERANCE):
+    """
+    Vertical runs of pixels within tolerance of color, for every column of pixels at once.
+    Returns arrays (column, first row, last row) of the runs, ordered by column and row.
+    """
+    difference = pixels.astype(np.int32) - np.asarray(color, dtype=np.int32)
+    mask = np.einsum('ijk,ijk->ij', difference, difference) <= tolerance ** 2
+
+    # Runs start where the mask turns on down a column and end where it turns off
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype=np.int8)
+    padded[1:-1] = mask
+    edges = np.diff(padded, axis=0).T
+    columns, first_rows = np.nonzero(edges == 1)
+    _, end_rows = np.nonzero(edges == -1)
+    return columns, first_rows, end_rows - 1
+
+
+def curve_color(pixels, x, y):
+    """
+    Colour of the curve clicked at (x, y): of the 3x3 pixels under the click, the one most unlike
+    the background around it (the median of a wider window), so a click on an antialiased edge still
+    picks the curve's own colour.
+    """
+    window = pixels[max(0, y - 7):y + 8, max(0, x - 7):x + 8].reshape(-1, 3).astype(float)
+    background = np.median(window, axis=0)
+    candidates = pixels[max(0, y - 1):y + 2, max(0, x - 1):x + 2].reshape(-1, 3).astype(float)
+    return candidates[np.argmax(((candidates - background) ** 2).sum(axis=1))]
+
+
+def trace_curve(pixels, color, first_column, last_column, seed=None, tolerance=TRACE_TOLERANCE):
+    """
+    Trace a curve drawn in color between two pixel columns (the calibrated X range).
+
+    Colour matching is vectorized over blocks of columns. In each column the run of matching pixels
+    closest to the point predicted from the previous ones is taken, so crossing curves, grid lines or
+    labels of the same colour do not pull the trace away; the trace starts at seed (x, y), the click
+    on the curve, and goes both ways from it. The point of a column is the centre of its run; columns
+    where a vertical line of the same colour crosses the curve are skipped.
+    Returns arrays of x and y in image pixels.
+    """
+    first_column = max(0, int(first_column))
+    last_column = min(pixels.shape[1] - 1, int(last_column))
+
+    runs = [[], [], []]
+    for start in range(first_column, last_column + 1, TRACE_CHUNK_COLUMNS):
+        stop = min(last_column + 1, start + TRACE_CHUNK_COLUMNS)
+        columns, first_rows, last_rows = color_runs(pixels[:, start:stop], color, tolerance)
+        runs[0].append(columns + start)
+        runs[1].append(first_rows)
+        runs[2].append(last_rows)
+    columns, first_rows, last_rows = (np.concatenate(values) for values in runs)
+    if not len(columns):
+        return np.array([]), np.array([])
+
+    # Runs of each column are runs[bounds[i]:bounds[i + 1]]
+    bounds = np.searchsorted(columns, np.arange(first_column, last_column + 2))
+    if seed is None:
+        seed = (columns[0], (first_rows[0] + last_rows[0]) / 2)
+    seed_column = min(max(int(round(seed[0])), first_column), last_column)
+
+    points = {}
+    for order in (range(seed_column, last_column + 1), range(seed_column - 1, first_column - 1, -1)):
+        recent = [(seed_column, seed[1])]
+        recent_lengths = []
+        for column in order:
+            start, stop = bounds[column - first_column], bounds[column - first_column + 1]
+            if start == stop:
+                continue
+
+            # Continue the line through the last point and the one TRACE_SLOPE_COLUMNS points back
+            prev_column, prev_row = recent[-1]
+            first_recent_column, first_recent_row = recent[0]
+            predicted = prev_row
+            if prev_column != first_recent_column:
+                predicted += (prev_row - first_recent_row) / (prev_column - first_recent_column) * (column - prev_column)
+
+            # Distance from the prediction to each run; 0 when the run covers it (steep parts)
+            distance = (np.maximum(first_rows[start:stop] - predicted, 0) +
+                        np.maximum(predicted - last_rows[start:stop], 0))
+            nearest = start + int(np.argmin(distance))
+            length = last_rows[nearest] - first_rows[nearest] + 1
+            if recent_lengths and length > TRACE_LINE_RUN and length > TRACE_RUN_GROWTH * np.median(recent_lengths):
+                continue
+
+            row = (first_rows[nearest] + last_rows[nearest]) / 2
+            points[column] = row
+            recent = recent[-TRACE_SLOPE_COLUMNS:] + [(column, row)]
+            recent_lengths = recent_lengths[-TRACE_SLOPE_COLUMNS:] + [length]
+
+    x = np.array(sorted(points), dtype=float)
+    return x, np.array([points[column] for column in sorted(points)], dtype=float)
+
+
+def raster_overview(raster, max_size=OVERVIEW_SIZE):
+    """Every step-th pixel of the raster, so the longest side is at most max_size. Returns (overview, step)."""
+    step = max(1, math.ceil(max(raster.shape[:2]) / max_size))
+    return np.ascontiguousarray(raster[::step, ::step]), step
+
+
+# An axis whose two clicks are off the same pixel row (or column) by at most this many pixels is taken
+# as exactly on it: click jitter on a straight image, not a rotated scan. On a rotated scan the offset
+# grows with the length of the axis, so long axes are followed even at small angles
+CALIBRATION_SNAP_PIXELS = 3
+
+
+class Calibration:
+    """
+    Transform from image pixels to axis values, as a 3x3 matrix in homogeneous coordinates: affine for
+    straight, rotated or skewed images, projective for photographs taken at an angle. On a logarithmic
+    axis the matrix gives log10 of the value. Converts whole arrays of points in one call.
+    `columns` is the pixel range of the X axis, the part of the image auto-trace looks at.
+    """
+
+    def __init__(self, matrix, x_log=False, y_log=False, columns=None):
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.x_log = x_log
+        self.y_log = y_log
+        self.columns = columns
+
+    @staticmethod
+    def axis_values(values, log, label):
+        values = np.asarray(values, dtype=float)
+        if not log:
+            return values
+        if np.any(values <= 0):
+            raise ValueError(f"на логарифмической оси {label} значения должны быть больше 0")
+        return np.log10(values)
+
+    @classmethod
+    def from_axis_points(cls, axis_points, x_values, y_values, x_log=False, y_log=False):
+        """
+        Affine calibration from the 4 axis clicks X1, X2, Y1, Y2 and the values at them. Lines of equal X
+        run along the Y axis (Y1 to Y2) and lines of equal Y along the X axis, so rotated or skewed axes
+        are followed; axes off the pixel grid by at most CALIBRATION_SNAP_PIXELS are taken as aligned with it.
+        """
+        x1, x2, y1, y2 = np.asarray(axis_points, dtype=float)
+        x_values = cls.axis_values(x_values, x_log, 'X')
+        y_values = cls.axis_values(y_values, y_log, 'Y')
+
+        x_direction = x2 - x1
+        y_direction = y2 - y1
+        if abs(x_direction[1]) <= CALIBRATION_SNAP_PIXELS < abs(x_direction[0]):
+            x_direction[1] = 0
+        if abs(y_direction[0]) <= CALIBRATION_SNAP_PIXELS < abs(y_direction[1]):
+            y_direction[0] = 0
+        basis = np.column_stack([x_direction, y_direction])
+        # Sine of the angle between the axes; the axes are taken as set by mistake below about 6 degrees
+        if abs(np.linalg.det(basis)) < 0.1 * np.linalg.norm(x_direction) * np.linalg.norm(y_direction):
+            raise ValueError("точки X1, X2 и Y1, Y2 должны задавать две непараллельные оси")
+
+        # Rows of the inverse give the fractions of X1->X2 and Y1->Y2 in a pixel offset
+        along_x, along_y = np.linalg.inv(basis)
+        x_scale = x_values[1] - x_values[0]
+        y_scale = y_values[1] - y_values[0]
+        matrix = [[*(x_scale * along_x), x_values[0] - x_scale * along_x @ x1],
+                  [*(y_scale * along_y), y_values[0] - y_scale * along_y @ y1],
+                  [0, 0, 1]]
+        return cls(matrix, x_log, y_log, (min(x1[0], x2[0]), max(x1[0], x2[0])))
+
+    @classmethod
+    def aligned(cls, x_axis_xp, x_axis_fp, y_axis_xp, y_axis_fp):
+        """Calibration with X depending only on the pixel column and Y only on the row, as in older projects."""
+        return cls.from_axis_points([(x_axis_xp[0], 0), (x_axis_xp[1], 0), (0, y_axis_xp[0]), (0, y_axis_xp[1])],
+                                    x_axis_fp, y_axis_fp)
+
+    @classmethod
+    def fit(cls, pixels, values, projective=False, x_log=False, y_log=False):
+        """
+        Least-squares calibration from reference points with both values known (grid corners, say):
+        affine from 3 or more, projective from 4 or more (normalized direct linear transform).
+        """
+        pixels = np.asarray(pixels, dtype=float)
+        values = np.asarray(values, dtype=float)
+        values = np.column_stack([cls.axis_values(values[:, 0], x_log, 'X'),
+                                  cls.axis_values(values[:, 1], y_log, 'Y')])
+        needed = 4 if projective else 3
+        if len(pixels) < needed:
+            raise ValueError(f"нужно как минимум {needed} опорные точки")
+
+        # Both sides centred and scaled to unit size, so pixel and axis units of any magnitude solve alike
+        def normalization(points):
+            centre = points.mean(axis=0)
+            scale = np.sqrt(2) / max(np.sqrt(((points - centre) ** 2).sum(axis=1)).mean(), 1e-12)
+            return np.array([[scale, 0, -scale * centre[0]], [0, scale, -scale * centre[1]], [0, 0, 1]])
+
+        pixel_norm = normalization(pixels)
+        value_norm = normalization(values)
+        u, v, _ = pixel_norm @ np.column_stack([pixels, np.ones(len(pixels))]).T
+        x, y, _ = value_norm @ np.column_stack([values, np.ones(len(values))]).T
+
+        if projective:
+            zeros = np.zeros(len(u))
+            ones = np.ones(len(u))
+            system = np.vstack([np.column_stack([u, v, ones, zeros, zeros, zeros, -x * u, -x * v, -x]),
+                                np.column_stack([zeros, zeros, zeros, u, v, ones, -y * u, -y * v, -y])])
+            _, singular, vt = np.linalg.svd(system)
+            # The points fix the transform only if the system has rank 8 (no 3 of 4 points on a line)
+            if singular[7] < 1e-9 * singular[0]:
+                raise ValueError("опорные точки не должны лежать на одной прямой")
+            matrix = vt[-1].reshape(3, 3)
+            singular = np.linalg.svd(matrix, compute_uv=False)
+            if singular[2] < 1e-6 * singular[0]:
+                raise ValueError("опорные точки не должны лежать на одной прямой")
+        else:
+            design = np.column_stack([u, v, np.ones(len(u))])
+            if np.linalg.matrix_rank(design) < 3:
+                raise ValueError("опорные точки не должны лежать на одной прямой")
+            solution = np.linalg.lstsq(design, np.column_stack([x, y]), rcond=None)[0]
+            matrix = np.vstack([solution.T, [0, 0, 1]])
+
+        matrix = np.linalg.inv(value_norm) @ matrix @ pixel_norm
+        return cls(matrix / matrix[2, 2], x_log, y_log, (pixels[:, 0].min(), pixels[:, 0].max()))
+
+    @staticmethod
+    def apply(matrix, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        (a, b, c), (d, e, f), (g, h, i) = matrix
+        w = g * x + h * y + i
+        return (a * x + b * y + c) / w, (d * x + e * y + f) / w
+
+    def to_axis(self, pixel_x, pixel_y):
+        """Positions along the axes of points given in pixels: the values, or log10 of them on log axes."""
+        return self.apply(self.matrix, pixel_x, pixel_y)
+
+    def to_pixels(self, axis_x, axis_y):
+        """Pixels of points given as positions along the axes, the inverse of to_axis."""
+        return self.apply(np.linalg.inv(self.matrix), axis_x, axis_y)
+
+    def axis_to_data(self, axis_x, axis_y):
+        with np.errstate(over='ignore'):
+            return (10 ** np.asarray(axis_x) if self.x_log else np.asarray(axis_x),
+                    10 ** np.asarray(axis_y) if self.y_log else np.asarray(axis_y))
+
+    def to_data(self, pixel_x, pixel_y):
+        """Axis values of points given as arrays (or scalars) of pixel coordinates."""
+        x, y = self.to_axis(pixel_x, pixel_y)
+        # Linear values are rounded to 5 decimals against float noise in the workbook
+        x = 10 ** x if self.x_log else np.round(x, 5) + 0.0
+        y = 10 ** y if self.y_log else np.round(y, 5) + 0.0
+        return x, y
+
+    def ranges(self, points):
+        """((min, max) of X, (min, max) of Y) along the axes of the points given in pixels."""
+        pixels = np.asarray(points, dtype=float).reshape(-1, 2)
+        x, y = self.to_axis(pixels[:, 0], pixels[:, 1])
+        return (x.min(), x.max()), (y.min(), y.max())
+
+    def to_dict(self):
+        return {'matrix': self.matrix.tolist(), 'x_log': self.x_log, 'y_log': self.y_log,
+                'columns': [float(column) for column in self.columns]}
+
+    @classmethod
+    def from_dict(cls, calibration):
+        return cls(calibration['matrix'], calibration.get('x_log', False), calibration.get('y_log', False),
+                   tuple(calibration['columns']))
+
+
+# Fit of each digitized curve: method ('poly', 'spline' or 'pchip'), range of the polynomial degree
+# (degree None picks it by cross-validation), interior knots of the spline and points of the smooth curve
+FIT_SETTINGS = {'method': 'poly', 'min_degree': 2, 'max_degree': 5, 'degree': None, 'knots': 8, 'points': 100}
+FIT_METHODS = {'poly': 'Полином', 'spline': 'Сплайн', 'pchip': 'PCHIP'}
+# Cross-validation folds; point i is in fold i % FIT_FOLDS. The lowest degree with held-out error within
+# FIT_CV_TOLERANCE of the least is taken, so noise does not buy extra wiggles
+FIT_FOLDS = 5
+FIT_CV_TOLERANCE = 0.02
+# Points of the preview curve drawn over the image
+PREVIEW_POINTS = 200
+DATA_SHEET = 'Данные'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def check_fit(fit):
+    """ValueError if the fit settings (as in FIT_SETTINGS) cannot be fitted, e.g. from a hand-edited project."""
+    if fit['method'] not in FIT_METHODS:
+        raise ValueError(f"неизвестный метод аппроксимации: {fit['method']}")
+    if not 0 <= fit['min_degree'] <= fit['max_degree']:
+        raise ValueError("степени полинома должны быть 0 <= min_degree <= max_degree")
+    if fit['degree'] is not None and fit['degree'] < 0:
+        raise ValueError("степень полинома должна быть не меньше 0")
+    if fit['knots'] < 0 or fit['points'] < 2:
+        raise ValueError("нужно не меньше 0 узлов сплайна и 2 точек кривой")
+
+
+def pchip(x, y, samples):
+    """
+    Monotone piecewise cubic Hermite interpolation through (x, y), x strictly increasing, at samples:
+    slopes by Fritsch-Carlson with the end conditions of scipy's PchipInterpolator, so the curve
+    does not overshoot between points.
+    """
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    slopes = np.full(len(x), delta[0])
+    if len(x) > 2:
+        # Inside: weighted harmonic mean of the secants on both sides, 0 where the data turns
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+        slopes[1:-1] = np.where(delta[:-1] * delta[1:] > 0, inside, 0)
+
+        def end_slope(h0, h1, delta0, delta1):
+            slope = ((2 * h0 + h1) * delta0 - h0 * delta1) / (h0 + h1)
+            if np.sign(slope) != np.sign(delta0):
+                return 0.0
+            if np.sign(delta0) != np.sign(delta1) and abs(slope) > abs(3 * delta0):
+                return 3 * delta0
+            return slope
+
+        slopes[0] = end_slope(h[0], h[1], delta[0], delta[1])
+        slopes[-1] = end_slope(h[-1], h[-2], delta[-1], delta[-2])
+
+    i = np.clip(np.searchsorted(x, samples) - 1, 0, len(x) - 2)
+    s = (samples - x[i]) / h[i]
+    return (y[i] * (2 * s ** 3 - 3 * s ** 2 + 1) + h[i] * slopes[i] * (s ** 3 - 2 * s ** 2 + s) +
+            y[i + 1] * (3 * s ** 2 - 2 * s ** 3) + h[i] * slopes[i + 1] * (s ** 3 - s ** 2))
+
+
+class CurveFit:
+    """
+    Fit of one curve, kept up to date as points are added and removed at the end (as data_points changes).
+    Points are positions along the axes (Calibration.to_axis), scaled to about [-1, 1] over the calibrated
+    ranges so the sums stay well conditioned.
+
+    Polynomial and spline fits are least squares kept as sums over the points of each cross-validation
+    fold: the normal matrix of the basis, its right side and the sum of y^2. A point is added or removed
+    in O(basis^2), whatever the number of points. The polynomial basis holds every degree up to
+    max_degree, so each degree is solved from the leading block of the same sums, and its
+    cross-validation error comes from the sums of the held-out fold without going over the points;
+    a fixed degree above max_degree widens the basis to it.
+    The spline is a cubic regression spline with knots evenly over the calibrated X range.
+    PCHIP goes through the points (the mean Y where X repeats) and is recomputed from them.
+    """
+
+    def __init__(self, fit, x_range, y_range):
+        check_fit(fit)
+        self.fit = fit
+        self.x_centre, self.x_scale = (x_range[0] + x_range[1]) / 2, max((x_range[1] - x_range[0]) / 2, 1e-12)
+        self.y_centre, self.y_scale = (y_range[0] + y_range[1]) / 2, max((y_range[1] - y_range[0]) / 2, 1e-12)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+        self.knots = np.linspace(-1, 1, fit['knots'] + 2)[1:-1]
+        self.basis_degree = max(fit['max_degree'], fit['degree'] or 0)
+        size = 4 + len(self.knots) if fit['method'] == 'spline' else self.basis_degree + 1
+        self.normal = np.zeros((FIT_FOLDS, size, size))
+        self.right = np.zeros((FIT_FOLDS, size))
+        self.squares = np.zeros(FIT_FOLDS)
+        self.counts = np.zeros(FIT_FOLDS, dtype=int)
+        self.degree = None
+
+    def basis(self, t):
+        if self.fit['method'] == 'spline':
+            # Truncated power basis: a cubic, plus a cubic piece starting at each knot
+            return np.column_stack([np.vander(t, 4, increasing=True), np.maximum(t[:, None] - self.knots, 0) ** 3])
+        return np.vander(t, self.basis_degree + 1, increasing=True)
+
+    def accumulate(self, first, x, y, sign):
+        """Add (sign 1) or subtract (sign -1) the points at indices first... to the sums of their folds."""
+        folds = (first + np.arange(len(x))) % FIT_FOLDS
+        valid = np.isfinite(x) & np.isfinite(y)
+        if self.fit['method'] == 'pchip' or not valid.any():
+            return
+        t = (x[valid] - self.x_centre) / self.x_scale
+        u = (y[valid] - self.y_centre) / self.y_scale
+        folds = folds[valid]
+        terms = self.basis(t)
+        for fold in range(FIT_FOLDS):
+            selected = folds == fold
+            fold_terms = terms[selected]
+            self.normal[fold] += sign * fold_terms.T @ fold_terms
+            self.right[fold] += sign * fold_terms.T @ u[selected]
+            self.squares[fold] += sign * u[selected] @ u[selected]
+            self.counts[fold] += sign * int(selected.sum())
+
+    def extend(self, x, y):
+        """Add points at the end."""
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        self.accumulate(len(self.x), x, y, 1)
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, y])
+
+    def remove(self, count):
+        """Remove the last count points."""
+        first = len(self.x) - count
+        self.accumulate(first, self.x[first:], self.y[first:], -1)
+        self.x = self.x[:first]
+        self.y = self.y[:first]
+        if not first:
+            # Nothing left: start from exact zeros rather than what rounding left of the sums
+            self.normal[:] = 0
+            self.right[:] = 0
+            self.squares[:] = 0
+            self.counts[:] = 0
+
+    @staticmethod
+    def solve(normal, right):
+        # Least squares on the normal equations also handles fewer points than coefficients
+        return np.linalg.lstsq(normal, right, rcond=None)[0]
+
+    def select_degree(self):
+        """
+        The fixed degree, or the lowest of min_degree..max_degree with about the least error on held-out folds.
+        Degrees that some training set has too few points for are not tried; if none can be, the degree
+        is the highest the points allow, but at least min_degree, as before cross-validation.
+        """
+        count = self.counts.sum()
+        if self.fit['degree'] is not None:
+            return self.fit['degree']
+        normal = self.normal.sum(axis=0)
+        right = self.right.sum(axis=0)
+
+        errors = {}
+        for degree in range(self.fit['min_degree'], self.fit['max_degree'] + 1):
+            size = degree + 1
+            if count - self.counts.max() <= degree:
+                break
+            error = 0.0
+            for fold in np.flatnonzero(self.counts):
+                fold_normal = self.normal[fold, :size, :size]
+                fold_right = self.right[fold, :size]
+                coefficients = self.solve(normal[:size, :size] - fold_normal, right[:size] - fold_right)
+                # Sum of squared residuals of the held-out points, from their sums alone
+                error += (self.squares[fold] - 2 * coefficients @ fold_right +
+                          coefficients @ fold_normal @ coefficients)
+            errors[degree] = error
+        if not errors:
+            return max(self.fit['min_degree'], min(self.fit['max_degree'], count - 1))
+        least = min(errors.values())
+        return min(degree for degree, error in errors.items() if error <= least * (1 + FIT_CV_TOLERANCE))
+
+    def curve(self, points):
+        """
+        (x, y) of the fitted curve at `points` points evenly across the X range of the points, along the axes.
+        None with fewer than 2 distinct X.
+        """
+        valid = np.isfinite(self.x) & np.isfinite(self.y)
+        x, y = self.x[valid], self.y[valid]
+        if len(x) < 2 or x.min() == x.max():
+            return None
+        x_curve = np.linspace(x.min(), x.max(), points)
+        t = (x_curve - self.x_centre) / self.x_scale
+
+        method = self.fit['method']
+        if method == 'pchip':
+            unique_x, inverse = np.unique(x, return_inverse=True)
+            mean_y = np.bincount(inverse, weights=y) / np.bincount(inverse)
+            return x_curve, pchip(unique_x, mean_y, x_curve)
+
+        if method == 'spline':
+            coefficients = self.solve(self.normal.sum(axis=0), self.right.sum(axis=0))
+            u = self.basis(t) @ coefficients
+        else:
+            self.degree = self.select_degree()
+            size = self.degree + 1
+            coefficients = self.solve(self.normal.sum(axis=0)[:size, :size], self.right.sum(axis=0)[:size])
+            u = np.vander(t, size, increasing=True) @ coefficients
+        return x_curve, u * self.y_scale + self.y_centre
+
+    def describe(self):
+        """Short name of the fit for the window, after curve()."""
+        if self.fit['method'] == 'poly':
+            if self.degree is None:
+                return FIT_METHODS['poly']
+            how = "задана" if self.fit['degree'] is not None else "кросс-валидация"
+            return f"{FIT_METHODS['poly']} {self.degree}-й степени ({how})"
+        if self.fit['method'] == 'spline':
+            return f"{FIT_METHODS['spline']}, {self.fit['knots']} узлов"
+        return FIT_METHODS[self.fit['method']]
+
+
+def fit_curve(calibration, axis_points, pixel_x, pixel_y, fit=FIT_SETTINGS):
+    """Fitted curve of points given in pixels, in axis values, as the window fits it; None if it cannot be."""
+    curve_fit = CurveFit(fit, *calibration.ranges(axis_points))
+    curve_fit.extend(*calibration.to_axis(pixel_x, pixel_y))
+    curve = curve_fit.curve(fit['points'])
+    return None if curve is None else calibration.axis_to_data(*curve)
+
+
+def curve_dataset(points, graph_number, curve):
+    """
+    Table of one digitized curve: its points, an array (n, 2) of x, y in axis units, sorted by X with
+    repeated X dropped, and the fitted curve (x, y) beside them.
+    None if there are fewer than 2 distinct X or no curve.
+    """
+    x_column = f'График {graph_number} X'
+    y_column = f'График {graph_number} Y'
+
+    # Create DataFrame sorted by X; points with equal X keep their order
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    current_data = pd.DataFrame(points[np.argsort(points[:, 0], kind='stable')], columns=[x_column, y_column])
+
+    # Remove duplicates and ensure strict increase
+    current_data = current_data.drop_duplicates(subset=[x_column], keep='first')
+    current_data = current_data[current_data[x_column].diff().fillna(1) > 0]
+    if len(current_data) < 2 or curve is None:
+        return None
+
+    x_interp, y_interp = curve
+    interp_data = pd.DataFrame({
+        f'График {graph_number} Интерп. X': x_interp,
+        f'График {graph_number} Интерп. Y': y_interp
+    })
+
+    # Combine data with original first
+    return pd.concat([current_data, interp_data], axis=1)
+
+
+def write_data_sheet(writer, sheet_name, datasets):
+    """Write the datasets side by side to one sheet, with charts of the points and of the fitted curves."""
+    combined_data = pd.concat(datasets, axis=1)
+    combined_data.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    workbook = writer.book
+    worksheet = writer.sheets[sheet_name]
+
+    # Formatting
+    header_format = workbook.add_format({
+        'font_name': 'Times New Roman',
+        'font_size': 10,
+        'bold': True,
+        'align': 'center'
+    })
+    cell_format = workbook.add_format({
+        'font_name': 'Times New Roman',
+        'font_size': 10
+    })
+
+    for col in range(combined_data.shape[1]):
+        worksheet.write(0, col, combined_data.columns[col], header_format)
+        worksheet.set_column(col, col, None, cell_format)
+
+    # Create two separate charts
+    raw_chart = workbook.add_chart({'type': 'scatter', 'subtype': 'straight'})
+    interp_chart = workbook.add_chart({'type': 'scatter', 'subtype': 'smooth'})
+
+    # Get actual data length
+    max_row = len(combined_data)
+
+    # Plot all raw data points with proper ranges
+    for i in range(0, combined_data.shape[1], 4):
+        # Raw data series (original points)
+        raw_chart.add_series({
+            'name': f'График {i // 4 + 1} (исходный)',
+            'categories': [sheet_name, 1, i, max_row, i],  # X-values
+            'values': [sheet_name, 1, i + 1, max_row, i + 1],  # Y-values
+            'marker': {
+                'type': 'circle',
+                'size': 5,
+                'border': {'color': 'black'},
+                'fill': {'color': '#4F81BD'}  # Blue color for visibility
+            },
+            'line': {'none': True}
+        })
+
+    # Plot all interpolated curves with separate ranges
+    for i in range(2, combined_data.shape[1], 4):
+        # Interpolated data series
+        interp_chart.add_series({
+            'name': f'График {i // 4 + 1} (интерполяция)',
+            'categories': [sheet_name, 1, i, max_row, i],  # X-values
+            'values': [sheet_name, 1, i + 1, max_row, i + 1],  # Y-values
+            'marker': {'type': 'none'},
+            'line': {'width': 1.5, 'color': '#C0504D'}  # Red color for contrast
+        })
+
+    # Configure charts independently
+    raw_chart.set_title({'name': 'Исходные данные', 'name_font': {'name': 'Times New Roman', 'size': 14}})
+    raw_chart.set_x_axis({'name': 'X', 'name_font': {'name': 'Times New Roman', 'size': 12}})
+    raw_chart.set_y_axis({'name': 'Y', 'name_font': {'name': 'Times New Roman', 'size': 12}})
+    raw_chart.set_legend({'position': 'bottom', 'font': {'name': 'Times New Roman'}})
+
+    interp_chart.set_title(
+        {'name': 'Интерполированные данные', 'name_font': {'name': 'Times New Roman', 'size': 14}})
+    interp_chart.set_x_axis({'name': 'X', 'name_font': {'name': 'Times New Roman', 'size': 12}})
+    interp_chart.set_y_axis({'name': 'Y', 'name_font': {'name': 'Times New Roman', 'size': 12}})
+    interp_chart.set_legend({'position': 'bottom', 'font': {'name': 'Times New Roman'}})
+
+    # Insert charts with proper spacing
+    worksheet.insert_chart('D2', raw_chart, {'x_offset': 25, 'y_offset': 10, 'x_scale': 1.5, 'y_scale': 1.5})
+    worksheet.insert_chart('D20', interp_chart,
+                           {'x_offset': 25, 'y_offset': 10, 'x_scale': 1.5, 'y_scale': 1.5})
+
+
+def save_workbook(save_path, sheets):
+    """Save {sheet name: [datasets]} to one workbook, a data sheet with charts per entry."""
+    with pd.ExcelWriter(save_path, engine='xlsxwriter') as writer:
+        for sheet_name, datasets in sheets.items():
+            write_data_sheet(writer, sheet_name, datasets)
+
+
+def write_project(project_path, project):
+    """
+    Save a project: image path, the 4 axis points and their calibration, data points,
+    auto-traced curves and fit settings, as JSON.
+    """
+    project = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in project.items()}
+    project['calibration'] = project['calibration'].to_dict()
+    with open(project_path, 'w', encoding='utf-8') as f:
+        json.dump(project, f, ensure_ascii=False, indent=1)
+
+
+def read_project(project_path):
+    """Load a project saved by write_project, with its Calibration. ValueError if it has no axes or bad fit settings."""
+    with open(project_path, encoding='utf-8') as f:
+        project = json.load(f)
+    if len(project.get('axis_points', [])) != 4:
+        raise ValueError("в проекте не заданы оси")
+    if 'calibration' in project:
+        project['calibration'] = Calibration.from_dict(project['calibration'])
+    else:
+        # Projects saved before the calibration matrix hold the interpolation arrays
+        project['calibration'] = Calibration.aligned(*(project[key] for key in
+                                                       ('x_axis_xp', 'x_axis_fp', 'y_axis_xp', 'y_axis_fp')))
+    project['axis_points'] = [tuple(point) for point in project['axis_points']]
+    project['data_points'] = [tuple(point) for point in project.get('data_points', [])]
+    project.setdefault('traces', [])
+    project['fit'] = {**FIT_SETTINGS, **project.get('fit', {})}
+    check_fit(project['fit'])
+    return project
+
+
+def digitize_image(image_path, project):
+    """
+    Digitize one image without the GUI, with the calibration of the project: every curve auto-traced
+    in the project is traced again in its colour, starting from the point clicked on it, and becomes
+    one graph. Points placed by hand belong to the project's own image and are not used.
+    Returns the list of datasets, as finish_digitizing makes them.
+    """
+    with open_image_file(image_path) as image:
+        if image.width * image.height > LARGE_IMAGE_PIXELS:
+            pixels = open_raster(image_path)
+        else:
+            pixels = np.asarray(image.convert('RGB'))
+
+    calibration = project['calibration']
+    datasets = []
+    for trace in project['traces']:
+        trace_x, trace_y = trace_curve(pixels, trace['color'], *calibration.columns,
+                                       seed=trace['seed'], tolerance=trace.get('tolerance', TRACE_TOLERANCE))
+        curve = fit_curve(calibration, project['axis_points'], trace_x, trace_y, project['fit'])
+        dataset = curve_dataset(np.column_stack(calibration.to_data(trace_x, trace_y)), len(datasets) + 1, curve)
+        if dataset is not None:
+            datasets.append(dataset)
+    return datasets
+
+
+def sheet_names(image_paths):
+    """Unique sheet names from the image file names: at most 31 characters, none of []:*?/\\ in them."""
+    names = {}
+    used = set()
+    for image_path in image_paths:
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        base_name = re.sub(r'[\[\]:*?/\\]', '_', base_name)[:31] or 'Лист'
+        name = base_name
+        number = 2
+        while name.lower() in used:
+            suffix = f' ({number})'
+            name = base_name[:31 - len(suffix)] + suffix
+            number += 1
+        used.add(name.lower())
+        names[image_path] = name
+    return names
+
+
+def batch_digitize(project_path, paths, output_path, workers=None):
+    """
+    Digitize the given images and every image in the given directories with the calibration and
+    curves of a saved project, on a pool of worker processes (workers=1 works in this process).
+    All results go to one workbook, a sheet per image.
+    """
+    project = read_project(project_path)
+    if not project['traces']:
+        raise ValueError("в проекте нет автотрассированных кривых")
+
+    image_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            image_paths.extend(os.path.join(path, file_name) for file_name in sorted(os.listdir(path))
+                               if file_name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            image_paths.append(path)
+    print(f"Digitizing {len(image_paths)} image(s)")
+
+    results = {}
+    if workers == 1:
+        for image_path in image_paths:
+            try:
+                results[image_path] = digitize_image(image_path, project)
+                print(f"Digitized: {image_path}")
+            except Exception as e:
+                print(f"Error processing image {image_path}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(digitize_image, image_path, project): image_path
+                       for image_path in image_paths}
+            for future in as_completed(futures):
+                image_path = futures[future]
+                try:
+                    results[image_path] = future.result()
+                    print(f"Digitized: {image_path}")
+                except Exception as e:
+                    print(f"Error processing image {image_path}: {e}")
+
+    # Sheets in the order of the images, whatever order the workers finished in
+    done = [image_path for image_path in image_paths if results.get(image_path)]
+    for image_path in image_paths:
+        if image_path in results and not results[image_path]:
+            print(f"No curves found: {image_path}")
+    if not done:
+        print("Nothing to save")
+        return
+    names = sheet_names(done)
+    save_workbook(output_path, {names[image_path]: results[image_path] for image_path in done})
+    print(f"Saved: {output_path}")
+
+
 class GraphDigitizer:
     def __init__(self, root):
         self.root = root
@@ -36,10 +866,24 @@ class GraphDigitizer:
 
         # Create scope area (right sidebar)
         self.scope_frame = tk.Frame(self.root)
-        self.scope_label = tk.Label(self.scope_frame)
+        # One image for the magnifier, repainted in place on every update
+        self.scope_photo = ImageTk.PhotoImage('RGB', (SCOPE_SIZE, SCOPE_SIZE))
+        self.scope_label = tk.Label(self.scope_frame, image=self.scope_photo)
         self.scope_label.pack(pady=10)
+        self.scope_position = None
+        self.scope_scheduled = False
+        self.view_scheduled = False
+        self.preview_scheduled = False
         self.scope_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=10)
 
+        # Everything but the markers, cached after each full redraw; markers are blitted over it
+        self.background = None
+        # The background with the markers but not the fit line, so a new fit line is drawn without the markers;
+        # markers added since it was cached are kept in pending_markers
+        self.marker_layer = None
+        self.pending_markers = []
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
         # Data storage
         self.reset_program()
 
@@ -48,24 +892,35 @@ class GraphDigitizer:
         self.fig.canvas.mpl_connect('button_press_event', self.on_click)
         self.root.geometry("1280x1024")
         self.canvas.mpl_connect('motion_notify_event', self.show_scope)
+        # Zoom with the mouse wheel, pan with the middle button held down
+        self.canvas.mpl_connect('scroll_event', self.zoom)
+        self.canvas.mpl_connect('button_release_event', self.end_pan)
 
     def reset_program(self):
         """Reset all variables and UI to initial state"""
         self.image_path = None
         self.image = None
+        self.scope_source = None
+        self.raster = None
+        self.tile_artist = None
+        self.pan_start = None
+        self.trace_pending = False
+        # (first, last, color, seed) of each auto-traced curve: its indices in data_points, undone as
+        # a whole, and what is needed to trace it again on other images
+        self.traces = []
         self.points = []
         self.axis_points = []
         self.data_points = []
         self.datasets = []
         self.current_graph_number = 1
-        self.x_axis_xp = np.array([])
-        self.x_axis_fp = np.array([])
-        self.y_axis_xp = np.array([])
-        self.y_axis_fp = np.array([])
+        self.fit = dict(FIT_SETTINGS)
+        self.calibration = None
+        # Live fit of the points of the current graph and its curve in image pixels
+        self.curve_fit = None
+        self.preview = ([], [])
 
         # Reset matplotlib display
-        self.ax.clear()
-        self.ax.axis('off')
+        self.clear_axes()
         self.ax.set_title("Для выбора картинки нажмите 'Загрузить изображение'")
         self.canvas.draw()
 
@@ -73,6 +928,8 @@ class GraphDigitizer:
         if hasattr(self, 'save_button'):
             self.save_button.config(state=tk.DISABLED)
             self.finish_button.config(state=tk.DISABLED)
+            self.fit_method_var.set(FIT_METHODS[self.fit['method']])
+            self.fit_label.config(text="")
 
     def load_application_icon(self):
         """Handle application icon loading with fallback"""
@@ -113,6 +970,37 @@ class GraphDigitizer:
                                        command=self.cancel_last_selection)
         self.cancel_button.pack(side=tk.LEFT, padx=5)
 
+        self.trace_button = tk.Button(control_frame, text="Автотрассировка",
+                                      command=self.start_trace)
+        self.trace_button.pack(side=tk.LEFT, padx=5)
+
+        self.full_view_button = tk.Button(control_frame, text="Весь вид",
+                                          command=self.reset_view)
+        self.full_view_button.pack(side=tk.LEFT, padx=5)
+
+        # Axis scales and the kind of calibration, read when the axes are set
+        self.x_log_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(control_frame, text="Лог. X", variable=self.x_log_var).pack(side=tk.LEFT, padx=5)
+        self.y_log_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(control_frame, text="Лог. Y", variable=self.y_log_var).pack(side=tk.LEFT, padx=5)
+        self.perspective_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(control_frame, text="Перспектива", variable=self.perspective_var).pack(side=tk.LEFT, padx=5)
+
+        # Fit of the curve, previewed over the image as points are added
+        self.fit_method_var = tk.StringVar(value=FIT_METHODS[FIT_SETTINGS['method']])
+        tk.OptionMenu(control_frame, self.fit_method_var, *FIT_METHODS.values(),
+                      command=self.change_fit_method).pack(side=tk.LEFT, padx=5)
+        self.fit_label = tk.Label(control_frame, text="")
+        self.fit_label.pack(side=tk.LEFT, padx=5)
+
+        self.save_project_button = tk.Button(control_frame, text="Сохранить проект",
+                                             command=self.save_project)
+        self.save_project_button.pack(side=tk.LEFT, padx=5)
+
+        self.open_project_button = tk.Button(control_frame, text="Открыть проект",
+                                             command=self.open_project)
+        self.open_project_button.pack(side=tk.LEFT, padx=5)
+
     def new_image_session(self):
         """Start new session with confirmation"""
         if self.datasets or self.data_points:
@@ -131,109 +1019,473 @@ class GraphDigitizer:
             filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.webp")]
         )
         if self.image_path:
-            self.image = Image.open(self.image_path)
+            self.open_image(self.image_path)
+
+    def open_image(self, image_path):
+        """Open and show the image; the session must be reset before."""
+        self.image_path = image_path
+        if self.image_path:
+            self.image = open_image_file(self.image_path)
+            if self.image.width * self.image.height > LARGE_IMAGE_PIXELS:
+                # Large-image mode: the pixels stay on disk and are read only where they are shown
+                self.raster = open_raster(self.image_path)
+            else:
+                # Decoded and converted once, so the magnifier only crops and resizes
+                self.scope_source = self.image.convert('RGB')
             self.refresh_plot()
-            self.ax.set_title(f"Установите оси для графика {self.current_graph_number}")
+            self.set_title(f"Установите оси для графика {self.current_graph_number}")
 
-    def refresh_plot(self):
+    def set_title(self, title):
+        # The title is part of the cached background, so it needs a full redraw
+        self.ax.set_title(title)
+        self.canvas.draw_idle()
+
+    def clear_axes(self):
+        """Clear the axes and create the marker artists, which are updated instead of plotted per point."""
         self.ax.clear()
         self.ax.axis('off')
-        if self.image:
+        # Animated artists are left out of canvas.draw(); on_draw and the blitting methods draw them
+        self.axis_line, = self.ax.plot([], [], 'r-', animated=True)
+        self.axis_marker, = self.ax.plot([], [], 'ro', animated=True)
+        self.data_marker, = self.ax.plot([], [], 'bo', animated=True)
+        self.fit_line, = self.ax.plot([], [], '-', color='orange', linewidth=1.5, animated=True)
+        self.new_marker, = self.ax.plot([], [], animated=True)
+        self.artists = (self.axis_line, self.axis_marker, self.data_marker)
+
+    def refresh_plot(self):
+        """Draw the image; this is the only place it is drawn, markers are blitted over it."""
+        self.clear_axes()
+        if self.raster is not None:
+            overview, self.overview_step = raster_overview(self.raster)
+            height, width = overview.shape[:2]
+            # Extents are in full-resolution pixels, so clicks and calibration use those whatever is shown
+            self.ax.imshow(overview, extent=(-0.5, width * self.overview_step - 0.5,
+                                             height * self.overview_step - 0.5, -0.5))
+            self.tile_artist = self.ax.imshow(np.zeros((1, 1, 3), dtype=np.uint8), visible=False)
+        elif self.image:
             self.ax.imshow(self.image)
-        for point in self.axis_points:
-            self.ax.plot(point[0], point[1], 'ro')
+        if self.image:
+            self.full_view()
+            # Markers must not change the view set by the image
+            self.ax.autoscale(False)
         self.canvas.draw()
         self.show_scope(None)
 
+    def full_view(self):
+        self.ax.set_xlim(-0.5, self.image.width - 0.5)
+        self.ax.set_ylim(self.image.height - 0.5, -0.5)
+
+    def reset_view(self):
+        if self.image:
+            self.full_view()
+            self.view_changed()
+
+    def update_tile(self):
+        """In large-image mode, read the visible part of the raster at about screen resolution."""
+        if self.raster is None:
+            return
+        height, width = self.raster.shape[:2]
+        x_min, x_max = sorted(self.ax.get_xlim())
+        y_min, y_max = sorted(self.ax.get_ylim())
+        left, right = max(0, int(x_min + 0.5)), min(width, math.ceil(x_max + 0.5))
+        top, bottom = max(0, int(y_min + 0.5)), min(height, math.ceil(y_max + 0.5))
+
+        # Raster pixels per screen pixel; the overview is enough once it is as detailed
+        step = max(1, int(min((right - left) / self.ax.bbox.width, (bottom - top) / self.ax.bbox.height)))
+        if step >= self.overview_step or right <= left or bottom <= top:
+            self.tile_artist.set_visible(False)
+            return
+
+        tile = np.ascontiguousarray(self.raster[top:bottom:step, left:right:step])
+        self.tile_artist.set_data(tile)
+        self.tile_artist.set_extent((left - 0.5, left + tile.shape[1] * step - 0.5,
+                                     top + tile.shape[0] * step - 0.5, top - 0.5))
+        self.tile_artist.set_visible(True)
+
+    def view_changed(self):
+        """Redraw after a zoom or pan, at most once per display frame."""
+        if not self.view_scheduled:
+            self.view_scheduled = True
+            self.root.after(SCOPE_FRAME_MS, self.redraw_view)
+
+    def redraw_view(self):
+        self.view_scheduled = False
+        self.update_tile()
+        # The image is part of the cached background, so a new view needs a full redraw
+        self.canvas.draw()
+
+    def zoom(self, event):
+        """Zoom in or out around the cursor with the mouse wheel."""
+        if not self.image or event.inaxes != self.ax:
+            return
+        scale = 1 / ZOOM_STEP if event.button == 'up' else ZOOM_STEP
+        x_left, x_right = self.ax.get_xlim()
+        y_bottom, y_top = self.ax.get_ylim()
+        if scale > 1 and (abs(x_right - x_left) * scale >= self.image.width or
+                          abs(y_top - y_bottom) * scale >= self.image.height):
+            self.full_view()
+        else:
+            self.ax.set_xlim(event.xdata + (x_left - event.xdata) * scale, event.xdata + (x_right - event.xdata) * scale)
+            self.ax.set_ylim(event.ydata + (y_bottom - event.ydata) * scale, event.ydata + (y_top - event.ydata) * scale)
+        self.view_changed()
+
+    def pan(self, event):
+        """Move the view with the mouse while the middle button is held down."""
+        x, y, (x_left, x_right), (y_bottom, y_top) = self.pan_start
+        # Data units per screen pixel
+        dx = (event.x - x) * (x_right - x_left) / self.ax.bbox.width
+        dy = (event.y - y) * (y_top - y_bottom) / self.ax.bbox.height
+        self.ax.set_xlim(x_left - dx, x_right - dx)
+        self.ax.set_ylim(y_bottom - dy, y_top - dy)
+        self.view_changed()
+
+    def end_pan(self, event):
+        self.pan_start = None
+
+    def update_artists(self):
+        """Set the data of the marker artists from axis_points and data_points."""
+        self.axis_marker.set_data([point[0] for point in self.axis_points], [point[1] for point in self.axis_points])
+        if len(self.axis_points) == 4:
+            (x1, y1), (x2, y2), (x3, y3), (x4, y4) = self.axis_points
+            # Both axis lines in one artist, split by NaN
+            self.axis_line.set_data([x1, x2, np.nan, x3, x4], [y1, y2, np.nan, y3, y4])
+        else:
+            self.axis_line.set_data([], [])
+        self.data_marker.set_data([point[0] for point in self.data_points], [point[1] for point in self.data_points])
+        self.fit_line.set_data(*self.preview)
+
+    def on_draw(self, event):
+        """After a full redraw, cache it as the background and draw the markers over it."""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.update_artists()
+        self.draw_markers()
+
+    def draw_markers(self):
+        """Draw all markers, cache the result as the marker layer and draw the fit line over it."""
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        self.marker_layer = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.pending_markers = []
+        self.ax.draw_artist(self.fit_line)
+
+    def redraw_markers(self):
+        """Redraw all markers over the cached background, without drawing the image again."""
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.update_artists()
+        self.canvas.restore_region(self.background)
+        self.draw_markers()
+        self.canvas.blit(self.fig.bbox)
+
+    def redraw_fit_line(self):
+        """
+        Replace the fit line over the cached marker layer, drawing only the markers added since it was cached,
+        so a new preview costs the same whatever the point count.
+        """
+        if self.marker_layer is None:
+            self.redraw_markers()
+            return
+        self.canvas.restore_region(self.marker_layer)
+        for x, y, kind in self.pending_markers:
+            self.new_marker.update_from(kind)
+            self.new_marker.set_data([x], [y])
+            self.ax.draw_artist(self.new_marker)
+        self.marker_layer = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.pending_markers = []
+        self.fit_line.set_data(*self.preview)
+        self.ax.draw_artist(self.fit_line)
+        self.canvas.blit(self.fig.bbox)
+
+    def marker_bbox(self, x, y):
+        """Box around a marker at (x, y) in whole display pixels, with room for its edge."""
+        pixel_x, pixel_y = self.ax.transData.transform((x, y))
+        radius = self.data_marker.get_markersize() * self.fig.dpi / 72 + 2
+        return Bbox.from_extents(np.floor(pixel_x - radius), np.floor(pixel_y - radius),
+                                 np.ceil(pixel_x + radius), np.ceil(pixel_y + radius))
+
+    def add_marker(self, x, y, kind):
+        """Draw one new marker styled like the `kind` artist and blit only around it, whatever the point count."""
+        self.new_marker.update_from(kind)
+        self.new_marker.set_data([x], [y])
+        self.ax.draw_artist(self.new_marker)
+        self.canvas.blit(self.marker_bbox(x, y))
+        self.pending_markers.append((x, y, kind))
+
+    def erase_marker(self, x, y):
+        """
+        Remove the marker at (x, y) from the screen: restore the background around it and redraw
+        the markers and lines overlapping that box, clipped to it.
+        """
+        if self.background is None:
+            return
+        # The marker layer still holds the marker; the next preview draws all markers again
+        self.marker_layer = None
+        self.update_artists()
+        bbox = self.marker_bbox(x, y)
+        height = self.fig.bbox.height
+        # The saved region is addressed from the top left corner of the figure, with the right and bottom
+        # edges included, as Agg clips markers. Lines are clipped a pixel short of those edges
+        self.canvas.restore_region(self.background, bbox=(bbox.x0, height - bbox.y1, bbox.x1, height - bbox.y0),
+                                   xy=(0, 0))
+        line_bbox = Bbox.from_extents(bbox.x0, bbox.y0 - 1, bbox.x1 + 1, bbox.y1)
+        for artist in self.artists + (self.fit_line,):
+            clip_box = artist.get_clip_box()
+            redrawn = bbox if artist.get_linestyle() == 'None' else line_bbox
+            visible = Bbox.intersection(redrawn, clip_box) if clip_box is not None else redrawn
+            if visible is None:
+                continue
+            artist.set_clip_box(visible)
+            self.ax.draw_artist(artist)
+            artist.set_clip_box(clip_box)
+        self.canvas.blit(line_bbox)
+
     def show_scope(self, event):
-        if self.image and (event is None or event.xdata and event.ydata):
-            x = int(event.xdata) if event else self.image.width // 2
-            y = int(event.ydata) if event else self.image.height // 2
+        """Remember where the cursor is and update the magnifier at most once per display frame."""
+        if self.pan_start is not None and event is not None:
+            self.pan(event)
+            return
+        if not self.image:
+            return
+        if event is None:
+            self.scope_position = (self.image.width // 2, self.image.height // 2)
+            self.update_scope()
+            return
+        if event.xdata is None or event.ydata is None:
+            return
 
-            start_x = max(0, x - 50)
-            start_y = max(0, y - 50)
-            end_x = min(self.image.width, x + 50)
-            end_y = min(self.image.height, y + 50)
+        self.scope_position = (int(event.xdata), int(event.ydata))
+        if not self.scope_scheduled:
+            self.scope_scheduled = True
+            self.root.after(SCOPE_FRAME_MS, self.update_scope)
 
-            scope_image = self.image.crop((start_x, start_y, end_x, end_y))
-            scope_image = scope_image.resize((200, 200), Image.BILINEAR)
+    def update_scope(self):
+        """Draw the magnifier at the last cursor position, repainting the same PhotoImage."""
+        self.scope_scheduled = False
+        if (self.scope_source is None and self.raster is None) or self.scope_position is None:
+            return
 
-            draw = ImageDraw.Draw(scope_image)
-            draw.line((100, 0, 100, 200), fill='red')
-            draw.line((0, 100, 200, 100), fill='red')
+        scope_image = self.scope_crop(*self.scope_position)
+        scope_image = scope_image.resize((SCOPE_SIZE, SCOPE_SIZE), Image.BILINEAR)
+
+        draw = ImageDraw.Draw(scope_image)
+        draw.line((SCOPE_SIZE // 2, 0, SCOPE_SIZE // 2, SCOPE_SIZE), fill='red')
+        draw.line((0, SCOPE_SIZE // 2, SCOPE_SIZE, SCOPE_SIZE // 2), fill='red')
+
+        self.scope_photo.paste(scope_image)
+
+    def scope_crop(self, x, y):
+        """Pixels around (x, y); areas outside the image come out black, so the cursor stays in the middle."""
+        box = (x - SCOPE_RADIUS, y - SCOPE_RADIUS, x + SCOPE_RADIUS, y + SCOPE_RADIUS)
+        if self.raster is None:
+            return self.scope_source.crop(box)
+
+        # Only the pixels around the cursor are read from the raster
+        height, width = self.raster.shape[:2]
+        crop = np.zeros((2 * SCOPE_RADIUS, 2 * SCOPE_RADIUS, 3), dtype=np.uint8)
+        left, top = max(0, box[0]), max(0, box[1])
+        right, bottom = min(width, box[2]), min(height, box[3])
+        if right > left and bottom > top:
+            crop[top - box[1]:bottom - box[1], left - box[0]:right - box[0]] = self.raster[top:bottom, left:right]
+        return Image.fromarray(crop)
+
+    def axis_values(self, points):
+        """Positions along the axes of points given as (x, y) pixels."""
+        pixels = np.array(points, dtype=float).reshape(-1, 2)
+        return self.calibration.to_axis(pixels[:, 0], pixels[:, 1])
+
+    def reset_fit(self):
+        """Start the live fit over from the current calibration, fit settings and points."""
+        self.curve_fit = None
+        if self.calibration is not None:
+            self.curve_fit = CurveFit(self.fit, *self.calibration.ranges(self.axis_points))
+            self.curve_fit.extend(*self.axis_values(self.data_points))
+        self.fit_changed()
+
+    def change_fit_method(self, name):
+        self.fit = {**self.fit, 'method': next(method for method, text in FIT_METHODS.items() if text == name)}
+        self.reset_fit()
+
+    def fit_changed(self):
+        """Update the fit preview at most once per display frame, however many points changed."""
+        if not self.preview_scheduled:
+            self.preview_scheduled = True
+            self.root.after(SCOPE_FRAME_MS, self.update_preview)
+
+    def update_preview(self):
+        """Draw the fitted curve of the current points over the image."""
+        self.preview_scheduled = False
+        curve = self.curve_fit.curve(PREVIEW_POINTS) if self.curve_fit is not None else None
+        if curve is None:
+            self.preview = ([], [])
+            self.fit_label.config(text="")
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self.preview = self.calibration.to_pixels(*curve)
+            self.fit_label.config(text=self.curve_fit.describe())
+        self.redraw_fit_line()
 
-            photo = ImageTk.PhotoImage(scope_image)
-            self.scope_label.config(image=photo)
-            self.scope_label.image = photo
+    def save_project(self):
+        """Save the axis calibration, the points of the current graph and the fit settings to a project file."""
+        if len(self.axis_points) < 4:
+            messagebox.showwarning("Сохранение проекта", "Сначала установите оси!")
+            return
+        project_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Проект оцифровки", "*.json"), ("All files", "*.*")]
+        )
+        if not project_path:
+            return
+
+        write_project(project_path, {
+            'image_path': self.image_path,
+            'axis_points': self.axis_points,
+            'calibration': self.calibration,
+            'data_points': self.data_points,
+            'traces': [{'points': [first, last], 'color': [float(value) for value in color],
+                        'seed': list(seed), 'tolerance': TRACE_TOLERANCE}
+                       for first, last, color, seed in self.traces],
+            'fit': self.fit,
+        })
+        messagebox.showinfo("Успех", f"Проект сохранен в:\n{project_path}")
+
+    def open_project(self):
+        """Open a project: its image with the saved calibration and points, ready to add more or finish."""
+        if self.datasets or self.data_points:
+            if not messagebox.askyesno("Открыть проект", "Текущие данные будут потеряны! Продолжить?"):
+                return
+        project_path = filedialog.askopenfilename(
+            filetypes=[("Проект оцифровки", "*.json"), ("All files", "*.*")]
+        )
+        if not project_path:
+            return
+        try:
+            project = read_project(project_path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось открыть проект: {str(e)}")
+            return
+
+        image_path = project.get('image_path')
+        if not image_path or not os.path.exists(image_path):
+            messagebox.showinfo("Открыть проект", "Изображение проекта не найдено, выберите его")
+            image_path = filedialog.askopenfilename(
+                filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.webp")]
+            )
+            if not image_path:
+                return
+
+        self.reset_program()
+        self.open_image(image_path)
+        self.axis_points = project['axis_points']
+        self.calibration = project['calibration']
+        self.data_points = project['data_points']
+        self.traces = [(*trace['points'], tuple(trace['color']), tuple(trace['seed'])) for trace in project['traces']]
+        self.fit = project['fit']
+        self.fit_method_var.set(FIT_METHODS[self.fit['method']])
+        self.reset_fit()
+
+        self.finish_button.config(state=tk.NORMAL)
+        self.redraw_markers()
+        self.set_title(f"Определите точки для графика {self.current_graph_number}")
 
     def on_click(self, event):
         if event.inaxes != self.ax:
             return
 
+        if event.button == 2:  # Middle button: pan
+            self.pan_start = (event.x, event.y, self.ax.get_xlim(), self.ax.get_ylim())
+            return
+
         if event.button == 3:  # Right-click
             self.cancel_last_selection()
             return
 
         if len(self.axis_points) < 4:
             self.handle_axis_selection(event)
+        elif self.trace_pending:
+            self.handle_trace(event)
         else:
             self.handle_data_selection(event)
 
     def handle_axis_selection(self, event):
         self.axis_points.append((event.xdata, event.ydata))
-        self.ax.plot(event.xdata, event.ydata, 'ro')
+        self.add_marker(event.xdata, event.ydata, self.axis_marker)
         self.update_axis_stage()
-        self.canvas.draw()
 
     def update_axis_stage(self):
         if len(self.axis_points) == 2:
-            self.ax.set_title("Теперь Y1, Y2")
+            if self.perspective_var.get():
+                self.set_title("Еще 2 точки с известными X и Y")
+            else:
+                self.set_title("Теперь Y1, Y2")
         elif len(self.axis_points) == 4:
             if self.define_axes():
-                self.ax.set_title(f"Определите точки для графика {self.current_graph_number}")
+                self.set_title(f"Определите точки для графика {self.current_graph_number}")
                 self.finish_button.config(state=tk.NORMAL)
                 self.plot_axis_lines()
+                self.reset_fit()
             else:
                 self.axis_points = []
-                self.refresh_plot()
+                self.redraw_markers()
 
     def plot_axis_lines(self):
-        self.ax.plot(
-            [self.axis_points[0][0], self.axis_points[1][0]],
-            [self.axis_points[0][1], self.axis_points[1][1]], 'r-'
-        )
-        self.ax.plot(
-            [self.axis_points[2][0], self.axis_points[3][0]],
-            [self.axis_points[2][1], self.axis_points[3][1]], 'r-'
-        )
-        self.canvas.draw()
+        # The axis lines are drawn by update_artists once all 4 axis points are set
+        self.redraw_markers()
 
     def handle_data_selection(self, event):
         self.data_points.append((event.xdata, event.ydata))
-        self.ax.plot(event.xdata, event.ydata, 'bo')
-        self.canvas.draw()
+        self.add_marker(event.xdata, event.ydata, self.data_marker)
+        self.curve_fit.extend(*self.calibration.to_axis(event.xdata, event.ydata))
+        self.fit_changed()
+
+    def start_trace(self):
+        """Wait for a click on a curve to trace it automatically."""
+        if len(self.axis_points) < 4:
+            messagebox.showwarning("Автотрассировка", "Сначала установите оси!")
+            return
+        self.trace_pending = True
+        self.set_title("Щелкните по кривой для автотрассировки")
+
+    def handle_trace(self, event):
+        """Trace the curve under the click across the calibrated X range and add its points."""
+        self.trace_pending = False
+        pixels = self.raster if self.raster is not None else np.asarray(self.scope_source)
+        color = curve_color(pixels, int(event.xdata + 0.5), int(event.ydata + 0.5))
+        trace_x, trace_y = trace_curve(pixels, color, *self.calibration.columns,
+                                       seed=(event.xdata, event.ydata))
+        if not len(trace_x):
+            messagebox.showwarning("Автотрассировка", "Кривая этого цвета не найдена!")
+            return
+
+        first = len(self.data_points)
+        self.data_points.extend(zip(trace_x.tolist(), trace_y.tolist()))
+        self.curve_fit.extend(*self.calibration.to_axis(trace_x, trace_y))
+        self.fit_changed()
+        self.traces.append((first, len(self.data_points), color, (event.xdata, event.ydata)))
+        self.redraw_markers()
+        self.set_title(f"Найдено точек: {len(trace_x)}. Нажмите 'Точки выбраны' или отмените трассировку")
 
     def define_axes(self):
+        """Ask the values at the 4 calibration clicks and fit the pixel-to-axis transform."""
+        x_log = self.x_log_var.get()
+        y_log = self.y_log_var.get()
         try:
-            # X-axis calibration
-            x_pairs = [
-                (self.axis_points[0][0], self.get_axis_value("X1", self.axis_points[0][0], True)),
-                (self.axis_points[1][0], self.get_axis_value("X2", self.axis_points[1][0], True))
-            ]
-            x_sorted = sorted(x_pairs, key=lambda x: x[0])
-            self.x_axis_xp = np.array([x[0] for x in x_sorted])
-            self.x_axis_fp = np.array([x[1] for x in x_sorted])
-
-            # Y-axis calibration
-            y_pairs = [
-                (self.axis_points[2][1], self.get_axis_value("Y1", self.axis_points[2][1], False)),
-                (self.axis_points[3][1], self.get_axis_value("Y2", self.axis_points[3][1], False))
-            ]
-            y_sorted = sorted(y_pairs, key=lambda y: y[0])
-            self.y_axis_xp = np.array([y[0] for y in y_sorted])
-            self.y_axis_fp = np.array([y[1] for y in y_sorted])
+            if self.perspective_var.get():
+                # Perspective: 4 points anywhere on the plot (grid corners, say), both values known at each
+                values = [(self.get_axis_value(f"X{number}", x, True), self.get_axis_value(f"Y{number}", y, False))
+                          for number, (x, y) in enumerate(self.axis_points, start=1)]
+                self.calibration = Calibration.fit(self.axis_points, values, projective=True,
+                                                   x_log=x_log, y_log=y_log)
+            else:
+                x_values = [self.get_axis_value("X1", self.axis_points[0][0], True),
+                            self.get_axis_value("X2", self.axis_points[1][0], True)]
+                y_values = [self.get_axis_value("Y1", self.axis_points[2][1], False),
+                            self.get_axis_value("Y2", self.axis_points[3][1], False)]
+                self.calibration = Calibration.from_axis_points(self.axis_points, x_values, y_values,
+                                                                x_log, y_log)
             return True
-        except (TypeError, ValueError):
+        except (TypeError, ValueError) as e:
+            messagebox.showwarning("Калибровка осей", f"Оси не установлены: {str(e)}")
             return False
 
     def get_axis_value(self, label, pixel_value, is_x):
@@ -244,24 +1496,21 @@ class GraphDigitizer:
                 return value
             messagebox.showwarning("Ошибка", "Введите корректное число!")
 
-    def pixel_to_actual(self, pixel_x, pixel_y):
-        try:
-            x = np.interp(pixel_x, self.x_axis_xp, self.x_axis_fp)
-            y = np.interp(pixel_y, self.y_axis_xp, self.y_axis_fp)
-            return round(x, 5), round(y, 5)
-        except ValueError as e:
-            messagebox.showerror("Ошибка", f"Ошибка преобразования: {str(e)}")
-            return None, None
-
     def cancel_last_selection(self):
         if len(self.axis_points) < 4:
             if self.axis_points:
-                self.axis_points.pop()
-                self.refresh_plot()
+                self.erase_marker(*self.axis_points.pop())
+        elif self.traces and self.traces[-1][1] == len(self.data_points):
+            # An auto-traced curve is undone as a whole
+            first = self.traces.pop()[0]
+            self.curve_fit.remove(len(self.data_points) - first)
+            del self.data_points[first:]
+            self.fit_changed()
         else:
             if self.data_points:
-                self.data_points.pop()
-                self.refresh_plot()
+                self.erase_marker(*self.data_points.pop())
+                self.curve_fit.remove(1)
+                self.fit_changed()
         self.refresh_buttons_state()
 
     def refresh_buttons_state(self):
@@ -270,65 +1519,30 @@ class GraphDigitizer:
 
     def finish_digitizing(self):
         try:
-            # Convert and sort points
-            raw_points = [self.pixel_to_actual(x, y) for x, y in self.data_points]
-            clean_points = [(x, y) for x, y in raw_points if x is not None and y is not None]
-
-            # Add explicit sorting before DataFrame creation
-            clean_points = sorted(clean_points, key=lambda point: point[0])  # <-- NEW LINE
+            # Convert all points at once; points the transform cannot place (off to infinity) are dropped
+            pixels = np.array(self.data_points, dtype=float).reshape(-1, 2)
+            x, y = self.calibration.to_data(pixels[:, 0], pixels[:, 1])
+            valid = np.isfinite(x) & np.isfinite(y)
+            clean_points = np.column_stack([x[valid], y[valid]])
 
-            if not clean_points:
+            if not len(clean_points):
                 messagebox.showwarning("Пустые данные", "Нет корректных точек для обработки!")
                 return
 
-            # Create DataFrame and ensure sorted ascending X values
-            current_data = pd.DataFrame(
-                clean_points,
-                columns=[f'График {self.current_graph_number} X',
-                         f'График {self.current_graph_number} Y']
-            ).sort_values(by=f'График {self.current_graph_number} X', ascending=True)
-
-            # Remove duplicates and ensure strict increase
-            current_data = current_data.drop_duplicates(
-                subset=[f'График {self.current_graph_number} X'],
-                keep='first'
-            )
-            current_data = current_data[
-                current_data[f'График {self.current_graph_number} X'].diff().fillna(1) > 0
-                ]
-
-            if len(current_data) < 2:
+            # The saved curve is the one previewed
+            curve = self.curve_fit.curve(self.fit['points'])
+            if curve is not None:
+                curve = self.calibration.axis_to_data(*curve)
+            combined = curve_dataset(clean_points, self.current_graph_number, curve)
+            if combined is None:
                 messagebox.showwarning("Мало точек", "Нужно как минимум 2 уникальные точки по X!")
                 return
-
-            x_orig = current_data[f'График {self.current_graph_number} X'].values
-            y_orig = current_data[f'График {self.current_graph_number} Y'].values
-
-            # Polynomial regression (degree 2-5 based on points)
-            max_degree = min(5, len(x_orig) - 1)
-            degree = max(2, max_degree)  # Minimum 2nd degree polynomial
-
-            coeffs = np.polyfit(x_orig, y_orig, deg=degree)
-            poly = np.poly1d(coeffs)
-
-            # Generate smooth curve
-            x_interp = np.linspace(x_orig.min(), x_orig.max(), 100)
-            y_interp = poly(x_interp)
-
-            # Create output DataFrames
-            interp_data = pd.DataFrame({
-                f'График {self.current_graph_number} Интерп. X': x_interp,
-                f'График {self.current_graph_number} Интерп. Y': y_interp
-            })
-
-            # Combine data with original first
-            combined = pd.concat([current_data, interp_data], axis=1)
             self.datasets.append(combined)
 
             # Update UI
             # Update UI
             self.current_graph_number += 1
-            self.ax.set_title("Оцифровано! Сохраните или добавьте еще график")
+            self.set_title("Оцифровано! Сохраните или добавьте еще график")
             self.save_button.config(state=tk.NORMAL)
 
             # New code: Ask about axis retention
@@ -341,21 +1555,20 @@ class GraphDigitizer:
             if keep_axes:
                 # Keep axis calibration, clear only data points
                 self.data_points = []
+                self.traces = []
+                self.reset_fit()
                 # Redraw existing axis lines
                 self.plot_axis_lines()
-                self.ax.set_title(f"Определите точки для графика {self.current_graph_number} (те же оси)")
+                self.set_title(f"Определите точки для графика {self.current_graph_number} (те же оси)")
             else:
                 # Full reset
                 self.axis_points = []
-                self.x_axis_xp = np.array([])
-                self.x_axis_fp = np.array([])
-                self.y_axis_xp = np.array([])
-                self.y_axis_fp = np.array([])
+                self.calibration = None
                 self.data_points = []
-                self.refresh_plot()
-                self.ax.set_title(f"Установите оси для графика {self.current_graph_number}")
-
-            self.refresh_plot()
+                self.traces = []
+                self.reset_fit()
+                self.redraw_markers()
+                self.set_title(f"Установите оси для графика {self.current_graph_number}")
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка обработки: {str(e)}")
@@ -365,8 +1578,6 @@ class GraphDigitizer:
             messagebox.showwarning("Пустые данные", "Нет данных для сохранения!")
             return
 
-        combined_data = pd.concat(self.datasets, axis=1)
-
         save_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
@@ -374,78 +1585,7 @@ class GraphDigitizer:
         if not save_path:
             return
 
-        with pd.ExcelWriter(save_path, engine='xlsxwriter') as writer:
-            combined_data.to_excel(writer, sheet_name='Данные', index=False)
-
-            workbook = writer.book
-            worksheet = writer.sheets['Данные']
-
-            # Formatting
-            header_format = workbook.add_format({
-                'font_name': 'Times New Roman',
-                'font_size': 10,
-                'bold': True,
-                'align': 'center'
-            })
-            cell_format = workbook.add_format({
-                'font_name': 'Times New Roman',
-                'font_size': 10
-            })
-
-            for col in range(combined_data.shape[1]):
-                worksheet.write(0, col, combined_data.columns[col], header_format)
-                worksheet.set_column(col, col, None, cell_format)
-
-            # Create two separate charts
-            raw_chart = workbook.add_chart({'type': 'scatter', 'subtype': 'straight'})
-            interp_chart = workbook.add_chart({'type': 'scatter', 'subtype': 'smooth'})
-
-            # Get actual data length
-            max_row = len(combined_data)
-
-            # Plot all raw data points with proper ranges
-            for i in range(0, combined_data.shape[1], 4):
-                # Raw data series (original points)
-                raw_chart.add_series({
-                    'name': f'График {i // 4 + 1} (исходный)',
-                    'categories': ['Данные', 1, i, max_row, i],  # X-values
-                    'values': ['Данные', 1, i + 1, max_row, i + 1],  # Y-values
-                    'marker': {
-                        'type': 'circle',
-                        'size': 5,
-                        'border': {'color': 'black'},
-                        'fill': {'color': '#4F81BD'}  # Blue color for visibility
-                    },
-                    'line': {'none': True}
-                })
-
-            # Plot all interpolated curves with separate ranges
-            for i in range(2, combined_data.shape[1], 4):
-                # Interpolated data series
-                interp_chart.add_series({
-                    'name': f'График {i // 4 + 1} (интерполяция)',
-                    'categories': ['Данные', 1, i, max_row, i],  # X-values
-                    'values': ['Данные', 1, i + 1, max_row, i + 1],  # Y-values
-                    'marker': {'type': 'none'},
-                    'line': {'width': 1.5, 'color': '#C0504D'}  # Red color for contrast
-                })
-
-            # Configure charts independently
-            raw_chart.set_title({'name': 'Исходные данные', 'name_font': {'name': 'Times New Roman', 'size': 14}})
-            raw_chart.set_x_axis({'name': 'X', 'name_font': {'name': 'Times New Roman', 'size': 12}})
-            raw_chart.set_y_axis({'name': 'Y', 'name_font': {'name': 'Times New Roman', 'size': 12}})
-            raw_chart.set_legend({'position': 'bottom', 'font': {'name': 'Times New Roman'}})
-
-            interp_chart.set_title(
-                {'name': 'Интерполированные данные', 'name_font': {'name': 'Times New Roman', 'size': 14}})
-            interp_chart.set_x_axis({'name': 'X', 'name_font': {'name': 'Times New Roman', 'size': 12}})
-            interp_chart.set_y_axis({'name': 'Y', 'name_font': {'name': 'Times New Roman', 'size': 12}})
-            interp_chart.set_legend({'position': 'bottom', 'font': {'name': 'Times New Roman'}})
-
-            # Insert charts with proper spacing
-            worksheet.insert_chart('D2', raw_chart, {'x_offset': 25, 'y_offset': 10, 'x_scale': 1.5, 'y_scale': 1.5})
-            worksheet.insert_chart('D20', interp_chart,
-                                   {'x_offset': 25, 'y_offset': 10, 'x_scale': 1.5, 'y_scale': 1.5})
+        save_workbook(save_path, {DATA_SHEET: self.datasets})
 
         messagebox.showinfo("Успех", f"Данные сохранены в:\n{save_path}")
 
@@ -462,21 +1602,43 @@ class GraphDigitizer:
             )
             if keep_axes:
                 self.data_points = []
+                self.traces = []
+                self.reset_fit()
                 self.plot_axis_lines()
-                self.ax.set_title(f"Определите точки для графика {self.current_graph_number} (те же оси)")
+                self.set_title(f"Определите точки для графика {self.current_graph_number} (те же оси)")
             else:
                 self.axis_points = []
-                self.x_axis_xp = np.array([])
-                self.x_axis_fp = np.array([])
-                self.y_axis_xp = np.array([])
-                self.y_axis_fp = np.array([])
+                self.calibration = None
                 self.data_points = []
-                self.refresh_plot()
-                self.ax.set_title(f"Установите оси для графика {self.current_graph_number}")
+                self.traces = []
+                self.reset_fit()
+                self.redraw_markers()
+                self.set_title(f"Установите оси для графика {self.current_graph_number}")
         else:
             self.new_image_session()
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot digitizer. Without arguments the window opens; "
+                                                 "with a project and images, they are digitized without it.")
+    parser.add_argument('project', nargs='?', help="project file (.json) saved from the window, with the axes "
+                                                   "and auto-traced curves to apply")
+    parser.add_argument('images', nargs='*', help="images or directories of them")
+    parser.add_argument('-o', '--output', default='digitized.xlsx', help="workbook to save (default: digitized.xlsx)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if not args.project:
+        root = tk.Tk()
+        app = GraphDigitizer(root)
+        root.mainloop()
+        return
+    if not args.images:
+        parser.error("give images or directories to digitize")
+    batch_digitize(args.project, args.images, args.output, args.workers)
+
+
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = GraphDigitizer(root)
-    root.mainloop()
\ No newline at end of file
+    # Worker processes of the batch mode start the frozen executable again
+    multiprocessing.freeze_support()
+    main()
\ No newline at end of file
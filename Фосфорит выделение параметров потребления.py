@@ -1,57 +1,184 @@
 import pandas as pd
+import numpy as np
 import os
 
-def process_excel(file_path):
+# Phase labels of each group; process_excel replaces their values with the group mean
+PHASE_GROUPS = {
+    'I': ('Ia', 'Ib', 'Ic'),
+    'U': ('Ubc', 'Uca', 'Uab'),
+}
+
+# Labels of active power, reactive power and power factor, in the raw layout and in the
+# parameter_type column written by parse_excel
+POWER_LABELS = {'P': 'P', 'Q': 'Q', 'cosf': 'cosf'}
+LONG_POWER_LABELS = {'P': 'P', 'Q': 'Q', 'cosf': 'cos'}
+
+STATISTICS = ('mean', 'min', 'max', 'imbalance')
+
+
+def to_float(cells):
+    """Convert an array of cells (numbers or comma-decimal strings) to floats, NaN where not a number."""
+    text = pd.Series(cells, dtype=object).astype(str).str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(text, errors='coerce').to_numpy(dtype=float)
+
+
+def cell_labels(df):
+    """Stripped text of every cell, used to find the label cells and to read their values."""
+    return df.astype(str).apply(lambda column: column.str.strip()).to_numpy(dtype=object)
+
+
+def find_label(labels, label):
+    """
+    Locate the cell holding label in every row.
+    Returns a mask of rows that have it and the column of its value: the first non-blank cell after
+    the label, the token that followed it when the row was read as a string.
+    """
+    width = labels.shape[1]
+    blank = pd.isna(labels) | (labels == 'nan') | (labels == '')
+    # First non-blank column after each cell, width where there is none
+    next_filled = np.full(labels.shape, width)
+    for column in range(width - 2, -1, -1):
+        next_filled[:, column] = np.where(blank[:, column + 1], next_filled[:, column + 1], column + 1)
+
+    is_label = labels == label
+    value_column = next_filled[np.arange(len(labels)), is_label.argmax(axis=1)]
+    # A label with nothing after it has no value
+    found = is_label.any(axis=1) & (value_column < width)
+    return found, np.minimum(value_column, width - 1)
+
+
+def label_values(labels, group):
+    """
+    Values next to each label of the group, one column per label and NaN where a row lacks the label
+    or its value is not a number. Also returns the columns the values were read from.
+    """
+    rows_index = np.arange(len(labels))
+    value_columns = []
+    values = []
+    for label in group:
+        found, value_column = find_label(labels, label)
+        value_columns.append(value_column)
+        values.append(np.where(found, to_float(labels[rows_index, value_column]), np.nan))
+    return np.column_stack(values), np.column_stack(value_columns)
+
+
+def phase_averages(df, phase_groups=PHASE_GROUPS):
+    """
+    Average every phase group over all rows at once.
+    Returns {name: (rows, value_columns, averages)} for the rows that contain all labels of the group
+    with numeric values.
+    """
+    # Labels need at least one column for their values after them
+    if df.shape[1] < 2:
+        return {}
+
+    labels = cell_labels(df)
+    averages = {}
+    for name, group in phase_groups.items():
+        values, value_columns = label_values(labels, group)
+        rows = np.flatnonzero(~np.isnan(values).any(axis=1))
+        averages[name] = (rows, value_columns[rows], values[rows].mean(axis=1))
+    return averages
+
+
+def group_statistics(values, statistics=STATISTICS):
+    """
+    Statistics of a (rows, phases) array, computed for all rows at once.
+    A row missing any phase gets NaN. imbalance is the largest deviation from the mean, in percent of it.
+    """
+    result = {}
+    mean = values.mean(axis=1)
+    if 'mean' in statistics:
+        result['mean'] = mean
+    if 'min' in statistics:
+        result['min'] = values.min(axis=1)
+    if 'max' in statistics:
+        result['max'] = values.max(axis=1)
+    if 'imbalance' in statistics:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['imbalance'] = np.abs(values - mean[:, None]).max(axis=1) / np.abs(mean) * 100
+    return result
+
+
+def power_statistics(p, q, cosf, voltage=None, current=None):
+    """
+    Complete active power, reactive power and power factor from whatever is measured.
+    Where P is missing it is taken as sqrt(3)*U*I*cosf from the mean line voltage and phase current,
+    so it is in the units of U times I. Q comes from P and cosf where it is missing, and cosf from P and Q.
+    """
+    if voltage is not None and current is not None:
+        apparent = np.sqrt(3) * voltage * current
+        p = np.where(np.isnan(p), apparent * cosf, p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        phi = np.arccos(np.clip(cosf, -1, 1))
+        q = np.where(np.isnan(q), p * np.tan(phi), q)
+        cosf = np.where(np.isnan(cosf), p / np.hypot(p, q), cosf)
+    return {'P': p, 'Q': q, 'cosf': cosf}
+
+
+def phase_statistics(df, phase_groups=PHASE_GROUPS, statistics=STATISTICS, power=True):
+    """
+    Compute the statistics of every phase group (columns like I_mean, U_imbalance) and, with power=True,
+    P, Q and cosf, in one vectorized pass.
+
+    df is either the long format written by parse_excel (one row per parameter; rows are grouped by
+    object_name and time_of_measurement, and repeated parameters of one type are averaged) or the raw
+    layout read with pd.read_excel(header=None), where a label cell is followed by its value and the
+    result has one row per sheet row.
+    """
+    if {'parameter_type', 'value'}.issubset(df.columns):
+        wide = df.pivot_table(index=['object_name', 'time_of_measurement'], columns='parameter_type',
+                              values='value', aggfunc='mean')
+
+        def values_of(group):
+            return wide.reindex(columns=list(group)).to_numpy(dtype=float)
+
+        power_labels = LONG_POWER_LABELS
+        index = wide.index
+    else:
+        labels = cell_labels(df) if df.shape[1] >= 2 else np.empty((len(df), 2), dtype=object)
+
+        def values_of(group):
+            return label_values(labels, group)[0]
+
+        power_labels = POWER_LABELS
+        index = df.index
+
+    result = {}
+    for name, group in phase_groups.items():
+        for statistic, values in group_statistics(values_of(group), statistics).items():
+            result[f'{name}_{statistic}'] = values
+
+    if power:
+        p, q, cosf = (values_of([power_labels[key]])[:, 0] for key in ('P', 'Q', 'cosf'))
+        if not (np.isnan(p).all() and np.isnan(q).all() and np.isnan(cosf).all()):
+            voltage = values_of(phase_groups['U']).mean(axis=1) if 'U' in phase_groups else None
+            current = values_of(phase_groups['I']).mean(axis=1) if 'I' in phase_groups else None
+            result.update(power_statistics(p, q, cosf, voltage, current))
+
+    return pd.DataFrame(result, index=index)
+
+
+def process_excel(file_path, verbose=False):
     try:
         # Read the Excel file
         df = pd.read_excel(file_path, header=None)
 
-        # Print the first few rows to understand the structure
-        print("Debugging: First few rows of the file:")
-        print(df.head())
-
-        # Temporary storage for averaging
-        temp_data = {}
-
-        # Iterate through each row in the DataFrame
-        for index, row in df.iterrows():
-            # Join the row into a string for easier parsing
-            row_str = " ".join(str(cell) for cell in row if pd.notna(cell))
-
-            # Debug: Print the row string
-            print(f"Debugging: Row {index}: {row_str}")
-
-            # Extract individual values for averaging
-            if "Ia" in row_str or "Ib" in row_str or "Ic" in row_str:
-                parts = row_str.split()
-                if len(parts) >= 4:  # Ensure there are enough values
-                    # Extract Ia, Ib, Ic values
-                    ia = float(parts[parts.index("Ia") + 1].replace(",", "."))
-                    ib = float(parts[parts.index("Ib") + 1].replace(",", "."))
-                    ic = float(parts[parts.index("Ic") + 1].replace(",", "."))
-                    iavg = (ia + ib + ic) / 3
-                    print(f"Debugging: Calculated Iavg = {iavg}")
-
-                    # Replace Ia, Ib, Ic with Iavg
-                    df.loc[index, df.columns[parts.index("Ia") + 1]] = iavg
-                    df.loc[index, df.columns[parts.index("Ib") + 1]] = iavg
-                    df.loc[index, df.columns[parts.index("Ic") + 1]] = iavg
-
-            # Extract individual values for Ubc, Uca, Uab averaging
-            if "Ubc" in row_str or "Uca" in row_str or "Uab" in row_str:
-                parts = row_str.split()
-                if len(parts) >= 4:  # Ensure there are enough values
-                    # Extract Ubc, Uca, Uab values
-                    ubc = float(parts[parts.index("Ubc") + 1].replace(",", "."))
-                    uca = float(parts[parts.index("Uca") + 1].replace(",", "."))
-                    uab = float(parts[parts.index("Uab") + 1].replace(",", "."))
-                    uavg = (ubc + uca + uab) / 3
-                    print(f"Debugging: Calculated Uavg = {uavg}")
-
-                    # Replace Ubc, Uca, Uab with Uavg
-                    df.loc[index, df.columns[parts.index("Ubc") + 1]] = uavg
-                    df.loc[index, df.columns[parts.index("Uca") + 1]] = uavg
-                    df.loc[index, df.columns[parts.index("Uab") + 1]] = uavg
+        if verbose:
+            # Print the first few rows to understand the structure
+            print("Debugging: First few rows of the file:")
+            print(df.head())
+
+        # Replace the phase values with their average, all rows in one assignment per group
+        cells = df.to_numpy(dtype=object, copy=True)
+        for name, (rows, value_columns, average) in phase_averages(df).items():
+            cells[rows[:, None], value_columns] = average[:, None]
+
+            if verbose:
+                for row, value in zip(rows, average):
+                    print(f"Debugging: Row {row}: Calculated {name}avg = {value}")
+
+        df = pd.DataFrame(cells, index=df.index, columns=df.columns)
 
         # Save the processed data to a new Excel file
         output_file_path = os.path.join(os.path.dirname(file_path), "processed_" + os.path.basename(file_path))
@@ -61,6 +188,21 @@ def process_excel(file_path):
     except Exception as e:
         print(f"Error processing file {file_path}: {e}")
 
-# Example usage
-file_path = r'C:\Users\stazher3\Desktop\Выгрузка Фосфорит\Выгрузка Фосфорит (улучшенная)\РПТ 12 о.xlsx'  # Replace with the actual path
-process_excel(file_path)
\ No newline at end of file
+
+def process_directory(directory, verbose=False):
+    """Process every .xlsx file in the directory, skipping results of a previous run."""
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.xlsx') and not file_name.startswith('processed_'):
+            process_excel(os.path.join(directory, file_name), verbose=verbose)
+
+
+if __name__ == "__main__":
+    # Example usage
+    file_path = r'C:\Users\stazher3\Desktop\Выгрузка Фосфорит\Выгрузка Фосфорит (улучшенная)\РПТ 12 о.xlsx'  # Replace with the actual path
+    process_excel(file_path)
+
+    # Or process every export in a folder
+    # process_directory(r'')
+
+    # Mean, min, max, imbalance and power for every measurement of parsed exports
+    # statistics = phase_statistics(pd.read_excel(r''))
@@ -1,9 +1,156 @@
 import pandas as pd
 import re
 import os
+import time
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+try:
+    import pyarrow  # Needed only for the parquet and feather outputs
+except ImportError:
+    pyarrow = None
+
+# Initialize patterns for object names, time of measurement, and parameters
+object_name_pattern = re.compile(r'^([A-Za-zА-Яа-я]+\s*-?\d+).*')  # Object names (e.g., "Ввод-1")
+time_pattern = re.compile(r'\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2}\.\d{3}')  # Timestamps
+cosf_pattern = re.compile(r'^cosf\s+.*')  # Special pattern for cosf parameters
+parameter_pattern = re.compile(
+    r'^[A-Za-zА-Яа-я]+\s+[A-Za-zА-Яа-я]+\s+.*\s+\d+\.?\d*\s*[A-Za-zА-Яа-я]*')  # Parameter rows
+
+# All four patterns folded into one alternation, tried in the same order as the row loop:
+# object name, timestamp anywhere in the row, cosf parameter, regular parameter
+row_kind_pattern = (
+    r'^(?:(?P<object_name>[A-Za-zА-Яа-я]+\s*-?\d+)'
+    r'|(?=(?s:.*?)(?P<time>\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2}\.\d{3}))'
+    r'|(?P<cosf>cosf\s)'
+    r'|(?P<parameter>[A-Za-zА-Яа-я]+\s+[A-Za-zА-Яа-я]+\s+.*\s+\d+\.?\d*\s*[A-Za-zА-Яа-я]*))'
+)
+
+# Strings that pd.read_excel reads as NaN by default
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+# Manifest of already parsed inputs, kept in the output directory
+MANIFEST_NAME = 'manifest.json'
+
+# Output formats of process_directory and their file extensions
+OUTPUT_FORMATS = {'xlsx': '.xlsx', 'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+# Consolidated dataset: one part per input file inside this folder of the output directory
+DATASET_DIRECTORY = 'dataset'
+
+TIME_FORMAT = '%d.%m.%Y %H:%M:%S.%f'
+
+RESULT_COLUMNS = ['object_name', 'time_of_measurement', 'parameter_type', 'parameter_name', 'value', 'unit']
+
+
+def read_row_strings(file_path):
+    """
+    Stream the first sheet in read-only mode and return every row joined into one string,
+    formatted the same way as " ".join(str(cell) ...) over a pd.read_excel(header=None) frame.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = wb.worksheets[0]
+        rows = []
+        # Per-column state needed to reproduce the dtype pandas would infer
+        numeric_only = []
+        all_integral = []
+        filled = []
+        for row in sheet.iter_rows(values_only=True):
+            values = []
+            for col, value in enumerate(row):
+                if col == len(numeric_only):
+                    numeric_only.append(True)
+                    all_integral.append(True)
+                    filled.append(0)
+                if value is None or (isinstance(value, str) and (value in NA_STRINGS or value in ERROR_CODES)):
+                    values.append(None)
+                    continue
+                if isinstance(value, float):
+                    if value.is_integer():
+                        value = int(value)
+                    else:
+                        all_integral[col] = False
+                elif isinstance(value, bool) or not isinstance(value, int):
+                    numeric_only[col] = False
+                filled[col] += 1
+                values.append(value)
+            rows.append(values)
+    finally:
+        wb.close()
+
+    # Trailing empty rows are dropped by pandas and would not match any pattern anyway
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+
+    # A column holding only numbers becomes float64 when it has gaps or fractions, so its
+    # integers print as "12.0"; otherwise numbers print as they were read
+    as_float = [
+        numeric_only[col] and (filled[col] < len(rows) or not all_integral[col])
+        for col in range(len(numeric_only))
+    ]
+    return [
+        " ".join(str(float(value)) if as_float[col] else str(value)
+                 for col, value in enumerate(values) if value is not None)
+        for values in rows
+    ]
 
 
 def parse_excel(file_path):
+    try:
+        row_str = pd.Series(read_row_strings(file_path), dtype=object)
+        if row_str.empty:
+            return pd.DataFrame()
+
+        # Classify every row in one regex pass
+        kinds = row_str.str.extract(row_kind_pattern)
+        is_object = kinds['object_name'].notna()
+        is_time = kinds['time'].notna()
+        is_cosf = kinds['cosf'].notna()
+        is_parameter = kinds['parameter'].notna()
+
+        # Carry the latest object name and timestamp forward to the rows below them
+        current_object = kinds['object_name'].str.strip().where(is_object).ffill()
+        current_time = kinds['time'].str.strip().where(is_time).ffill()
+
+        is_data = is_cosf | is_parameter
+        if not is_data.any():
+            return pd.DataFrame()
+
+        parts = row_str[is_data].str.split()
+        cosf = is_cosf[is_data]
+        result_df = pd.DataFrame({
+            'object_name': current_object[is_data],
+            'time_of_measurement': current_time[is_data],
+            # cosf rows have no unit, so the value is the last token instead of the one before it
+            'parameter_type': parts.str[0].mask(cosf, 'cos'),
+            'parameter_name': parts.str[1:-1].str.join(' ').where(cosf, parts.str[1:-2].str.join(' ')),
+            'value': parts.str[-1].where(cosf, parts.str[-2]),
+            'unit': parts.str[-1].mask(cosf, '-'),
+        }, columns=RESULT_COLUMNS).reset_index(drop=True)
+
+        # Rows seen before the first object name or timestamp keep None, as the row loop did. The columns
+        # are rebuilt from lists so pandas infers their dtype as for the row loop's list of dicts
+        for column in ('object_name', 'time_of_measurement'):
+            values = result_df[column].astype(object).where(result_df[column].notna(), None)
+            result_df[column] = pd.Series(values.tolist(), index=result_df.index)
+
+        result_df['value'] = pd.to_numeric(result_df['value'].str.replace(',', '.', regex=False),
+                                           errors='coerce')
+        return result_df
+
+    except Exception as e:
+        print(f"Error parsing file {file_path}: {e}")
+        return pd.DataFrame()
+
+
+def parse_excel_legacy(file_path):
     try:
         # Read the Excel file
         df = pd.read_excel(file_path, header=None)
@@ -85,32 +232,246 @@ def parse_excel(file_path):
         return pd.DataFrame()
 
 
-def process_directory(input_directory, output_directory):
+def file_signature(file_path, stat=None):
+    """Size, modification time and SHA-256 of a file, as stored in the manifest."""
+    stat = stat or os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def load_manifest(output_directory):
+    manifest_path = os.path.join(output_directory, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(output_directory, manifest):
+    # Write to a temporary file first so an interrupted run never leaves a broken manifest
+    manifest_path = os.path.join(output_directory, MANIFEST_NAME)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def is_unchanged(entry, file_path, stat, output_file_path):
+    """Check a file against its manifest entry, hashing it only when size or mtime changed."""
+    if (not entry or entry['size'] != stat.st_size or entry['output'] != output_file_path
+            or not os.path.exists(output_file_path)):
+        return False
+    if entry['mtime'] == stat.st_mtime_ns:
+        return True
+    # Touched but possibly not modified (e.g. copied back from an archive)
+    if entry['sha256'] != file_signature(file_path, stat)['sha256']:
+        return False
+    # Remember the new mtime so the file is not hashed again on the next run
+    entry['mtime'] = stat.st_mtime_ns
+    return True
+
+
+def typed_columns(parsed_data):
+    """Parsed rows with time_of_measurement as datetime and value as float, for the columnar formats."""
+    return parsed_data.assign(
+        time_of_measurement=pd.to_datetime(parsed_data['time_of_measurement'], format=TIME_FORMAT, errors='coerce'),
+        value=parsed_data['value'].astype(float),
+    )
+
+
+def save_parsed(parsed_data, output_file_path, output_format):
+    if output_format == 'xlsx':
+        parsed_data.to_excel(output_file_path, index=False)
+    elif output_format == 'csv':
+        typed_columns(parsed_data).to_csv(output_file_path, index=False)
+    elif output_format == 'parquet':
+        typed_columns(parsed_data).to_parquet(output_file_path, index=False)
+    elif output_format == 'feather':
+        typed_columns(parsed_data).to_feather(output_file_path)
+
+
+def read_parsed(file_path):
+    """Read back one file written by save_parsed with its column types."""
+    extension = os.path.splitext(file_path)[1]
+    if extension == '.parquet':
+        return pd.read_parquet(file_path)
+    if extension == '.feather':
+        return pd.read_feather(file_path)
+    if extension == '.csv':
+        return pd.read_csv(file_path, parse_dates=['time_of_measurement'], dtype={'value': float})
+    return pd.read_excel(file_path)
+
+
+def load_dataset(output_directory, output_format='parquet'):
+    """Load the consolidated dataset written by process_directory(..., consolidate=True) as one DataFrame."""
+    dataset_directory = os.path.join(output_directory, DATASET_DIRECTORY)
+    parts = [read_parsed(entry.path) for entry in sorted(os.scandir(dataset_directory), key=lambda e: e.name)
+             if entry.name.endswith(OUTPUT_FORMATS[output_format])]
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
+
+
+def remove_stale_parts(output_directory, input_names):
+    """Delete the parts of the consolidated dataset whose input file is no longer among input_names."""
+    current = {os.path.splitext(file_name)[0] for file_name in input_names}
+    extensions = tuple(OUTPUT_FORMATS.values())
+    with os.scandir(os.path.join(output_directory, DATASET_DIRECTORY)) as entries:
+        for entry in entries:
+            base_name, extension = os.path.splitext(entry.name)
+            if extension in extensions and base_name not in current:
+                os.remove(entry.path)
+                print(f"Removed part of a deleted input: {entry.path}")
+
+
+def output_path(output_directory, file_name, output_format='xlsx', consolidate=False):
+    base_name = os.path.splitext(file_name)[0]
+    if consolidate:
+        return os.path.join(output_directory, DATASET_DIRECTORY, base_name + OUTPUT_FORMATS[output_format])
+    return os.path.join(output_directory, f"parsed_{base_name}{OUTPUT_FORMATS[output_format]}")
+
+
+def process_file(file_path, output_directory, output_format='xlsx', consolidate=False):
+    """Parse one export and save it; returns the manifest entry for the file, or None if nothing was parsed."""
+    signature = file_signature(file_path)
+    file_name = os.path.basename(file_path)
+    parsed_data = parse_excel(file_path)
+
+    # Save the parsed data to a new file in the output directory
+    if not parsed_data.empty:
+        if consolidate:
+            # A part of the dataset, replaced as a whole when its source changes
+            parsed_data.insert(0, 'source_file', file_name)
+        output_file_path = output_path(output_directory, file_name, output_format, consolidate)
+        save_parsed(parsed_data, output_file_path, output_format)
+        print(f"Parsed data saved to: {output_file_path}")
+        signature['output'] = output_file_path
+        return signature
+
+    # Not recorded in the manifest, so the file is retried on the next run
+    print(f"No data parsed from file: {file_path}")
+    return None
+
+
+def process_directory(input_directory, output_directory, workers=1, incremental=True,
+                      output_format='xlsx', consolidate=False):
+    """
+    Parse every .xlsx export in input_directory into output_directory.
+
+    workers > 1 parses files in a process pool (None uses every core). With incremental=True
+    files whose size, mtime or content hash match the manifest from the previous run are skipped.
+    output_format is one of OUTPUT_FORMATS; csv, parquet and feather store time_of_measurement as
+    datetime and value as float. With consolidate=True each file becomes a part of one dataset
+    (see load_dataset) instead of a separate parsed_ file.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of: {', '.join(OUTPUT_FORMATS)}")
+    if output_format in ('parquet', 'feather') and pyarrow is None:
+        raise ImportError(f"Output format '{output_format}' requires pyarrow")
+
     # Ensure the output directory exists
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
+    os.makedirs(os.path.join(output_directory, DATASET_DIRECTORY) if consolidate else output_directory,
+                exist_ok=True)
+
+    manifest = load_manifest(output_directory) if incremental else {}
+
+    # Collect the Excel files that are new or changed since the last run
+    pending = []
+    skipped = 0
+    input_names = set()
+    with os.scandir(input_directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.xlsx') or not entry.is_file():
+                continue
+            input_names.add(entry.name)
+            expected_output = output_path(output_directory, entry.name, output_format, consolidate)
+            if incremental and is_unchanged(manifest.get(entry.name), entry.path, entry.stat(), expected_output):
+                skipped += 1
+                continue
+            pending.append(entry.path)
+
+    if skipped:
+        print(f"Skipped {skipped} unchanged file(s)")
+
+    # Inputs deleted or renamed since the last run: forget them, and drop their parts of the dataset
+    for file_name in set(manifest) - input_names:
+        del manifest[file_name]
+    if consolidate:
+        remove_stale_parts(output_directory, input_names)
+
+    def record(file_path, result):
+        # The same handling in this process and in the pool: a failed file is reported and left out
+        # of the manifest, and the others go on
+        file_name = os.path.basename(file_path)
+        try:
+            entry = result()
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+            entry = None
+        if entry is not None:
+            manifest[file_name] = entry
+        else:
+            manifest.pop(file_name, None)
+
+    try:
+        if workers == 1 or len(pending) < 2:
+            for file_path in pending:
+                print(f"Processing file: {file_path}")
+                record(file_path, lambda: process_file(file_path, output_directory, output_format, consolidate))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(process_file, file_path, output_directory, output_format, consolidate):
+                           file_path for file_path in pending}
+                for future in as_completed(futures):
+                    record(futures[future], future.result)
+    finally:
+        # Record whatever finished, even if the run was interrupted
+        if incremental:
+            save_manifest(output_directory, manifest)
+
+
+def benchmark_parse(file_path, repeat=3):
+    """
+    Time the row-by-row parser against the streaming one on the same file and check that
+    they produce the same rows.
+    """
+    timings = {}
+    results = {}
+    for name, parser in (('legacy', parse_excel_legacy), ('stream', parse_excel)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[name] = parser(file_path)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f"{name}: {best:.3f} s, {len(results[name])} rows")
 
-    # Process all Excel files in the input directory
-    for file_name in os.listdir(input_directory):
-        if file_name.endswith('.xlsx'):
-            file_path = os.path.join(input_directory, file_name)
-            print(f"Processing file: {file_path}")
+    # The legacy parser keeps values as comma-decimal strings
+    expected = results['legacy']
+    if not expected.empty:
+        expected = expected.assign(value=pd.to_numeric(expected['value'].str.replace(',', '.', regex=False),
+                                                       errors='coerce'))
+    pd.testing.assert_frame_equal(expected, results['stream'], check_dtype=False)
+    print(f"Results are identical, speedup: {timings['legacy'] / timings['stream']:.1f}x")
+    return timings
 
-            # Parse the Excel file
-            parsed_data = parse_excel(file_path)
 
-            # Save the parsed data to a new Excel file in the output directory
-            if not parsed_data.empty:
-                output_file_path = os.path.join(output_directory, f"parsed_{file_name}")
-                parsed_data.to_excel(output_file_path, index=False)
-                print(f"Parsed data saved to: {output_file_path}")
-            else:
-                print(f"No data parsed from file: {file_path}")
+if __name__ == "__main__":
+    # Example usage
+    input_directory = r''
+    output_directory = r''
 
+    # Process all Excel files in the directory, skipping the ones parsed on a previous run
+    process_directory(input_directory, output_directory, workers=os.cpu_count())
 
-# Example usage
-input_directory = r''
-output_directory = r''
+    # Or collect everything into one typed dataset and load it back in one call
+    # process_directory(input_directory, output_directory, workers=os.cpu_count(),
+    #                   output_format='parquet', consolidate=True)
+    # measurements = load_dataset(output_directory, 'parquet')
 
-# Process all Excel files in the directory
-process_directory(input_directory, output_directory)
+    # Compare both parsers on one export
+    # benchmark_parse(r'')